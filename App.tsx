@@ -1,5 +1,5 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { HashRouter as Router, Routes, Route, Navigate, Outlet } from 'react-router-dom';
 import { Language, Platform, User, SortOption, Activity, Admin, SystemConfig, BankAccount, Transaction } from './types';
 import { TRANSLATIONS } from './constants';
@@ -288,10 +288,26 @@ const App: React.FC = () => {
         }
     };
 
+    // Idempotency key of the withdrawal attempt that has not been confirmed yet.
+    // Resubmitting the same amount/account (e.g. after a timeout) reuses it, so the
+    // server replays the first debit instead of creating a second one.
+    const pendingWithdraw = useRef<{ amount: number; accountId: string; key: string } | null>(null);
+
     const handleWithdraw = async (amount: number, accountId: string) => {
         if (!user) return;
+        const pending = pendingWithdraw.current;
+        if (!pending || pending.amount !== amount || pending.accountId !== accountId) {
+            pendingWithdraw.current = { amount, accountId, key: crypto.randomUUID() };
+        }
         try {
-            const updatedUser = await api.withdraw(user.id, amount, accountId);
+            const result = await api.withdraw(user.id, amount, accountId, pendingWithdraw.current!.key);
+            // Confirmed: the next withdrawal is a new attempt with a new key
+            pendingWithdraw.current = null;
+            const updatedUser = {
+                ...user,
+                balance: result.balance,
+                transactions: [result.transaction, ...(user.transactions || [])]
+            };
             setUser(updatedUser);
             checkUnread(updatedUser);
             alert("Penarikan Berhasil Diajukan!");
@@ -333,8 +349,8 @@ const App: React.FC = () => {
         // 4. Execute API in background
         (async () => {
             try {
-                const finalUserFromBackend = await api.likeTask(user.id, platformId);
-                setUser(finalUserFromBackend);
+                // Backend returns a lightweight ack; the optimistic state is final
+                await api.likeTask(user.id, platformId);
             } catch (e: any) {
                 console.error("Background like failed:", e);
                 // Rollback on error
@@ -0,0 +1,174 @@
+"""
+分析统计引擎
+时间戳列以数组形式一次性解析，用 NumPy 按任意时间范围、粒度 (hour/day/week) 和时区分桶计数/求和，
+不在 Python 循环中逐行解析 ISO 字符串
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+
+GRANULARITIES = ("hour", "day", "week")
+DEFAULT_TZ = "Asia/Jakarta"
+# 单次查询最多返回的桶数
+MAX_BUCKETS = 2000
+
+_RANGE_PATTERN = re.compile(r"^(\d+)([hdw])$")
+_RANGE_UNITS = {"h": timedelta(hours=1), "d": timedelta(days=1), "w": timedelta(weeks=1)}
+
+
+def parse_range(value: str) -> timedelta:
+    """解析时间范围参数，如 "24h" / "30d" / "12w" """
+    match = _RANGE_PATTERN.match(value.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid range: {value}")
+    return int(match.group(1)) * _RANGE_UNITS[match.group(2)]
+
+
+def parse_tz(name: str) -> ZoneInfo:
+    """解析 IANA 时区名，如 "Asia/Jakarta" / "UTC" """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def _digits(chars: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """把定长 ASCII 矩阵的 [start, stop) 列当作十进制数字解析"""
+    value = np.zeros(len(chars), dtype=np.int64)
+    for i in range(start, stop):
+        value = value * 10 + (chars[:, i].astype(np.int64) - 48)
+    return value
+
+
+def parse_timestamps(values: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    将 ISO 时间字符串数组解析为 UTC datetime64[us] 数组
+    只取前 19 个字符 (YYYY-MM-DDTHH:MM:SS) 按字节矩阵整列计算，精度截断到秒 (桶边界都是整点，不影响分桶)；
+    空值解析为 NaT (与其它列保持对齐，分桶时被忽略)
+    PostgREST 返回的 timestamptz 均为 UTC (+00:00)，不解析偏移量
+    """
+    raw = np.array([v or "" for v in values], dtype="S19")
+    if raw.size == 0:
+        return np.empty(0, dtype="datetime64[us]")
+    chars = raw.view(np.uint8).reshape(-1, 19)
+
+    missing = chars[:, 0] == 0
+    present = ~missing
+    if not ((chars[present, 4] == ord("-")) & (chars[present, 7] == ord("-"))
+            & np.isin(chars[present, 10], (ord("T"), ord(" ")))).all():
+        raise ValueError("Timestamps must be ISO 8601 (YYYY-MM-DDTHH:MM:SS...)")
+
+    year, month, day = _digits(chars, 0, 4), _digits(chars, 5, 7), _digits(chars, 8, 10)
+    # 公历日期 -> 1970-01-01 起的天数 (Howard Hinnant 的 days_from_civil)
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+    seconds = days * 86400 + _digits(chars, 11, 13) * 3600 + _digits(chars, 14, 16) * 60 + _digits(chars, 17, 19)
+
+    result = seconds.astype("datetime64[s]").astype("datetime64[us]")
+    result[missing] = np.datetime64("NaT")
+    return result
+
+
+def _to_datetime64(dt: datetime) -> np.datetime64:
+    return np.datetime64(dt.astimezone(timezone.utc).replace(tzinfo=None), "us")
+
+
+def _floor_local(dt: datetime, granularity: str) -> datetime:
+    """按本地时间对齐到桶起点 (周从周一开始)"""
+    if granularity == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def _step_local(dt: datetime, granularity: str, steps: int = 1) -> datetime:
+    """前后移动 steps 个桶的本地起点 (按日历推进，跨夏令时也对齐到本地零点/整点)"""
+    if granularity == "hour":
+        # 整点在 UTC 上推进，避免夏令时切换时出现重复/缺失的本地小时
+        return (dt.astimezone(timezone.utc) + timedelta(hours=steps)).astimezone(dt.tzinfo)
+    days = (7 if granularity == "week" else 1) * steps
+    naive = dt.replace(tzinfo=None) + timedelta(days=days)
+    return naive.replace(tzinfo=dt.tzinfo)
+
+
+@dataclass
+class Buckets:
+    """一组连续的时间桶: edges 比 labels 多一个 (最后一个是结束边界)"""
+    labels: list[str]
+    edges: np.ndarray  # UTC datetime64[us]，单调递增
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def start(self) -> np.datetime64:
+        return self.edges[0]
+
+    @property
+    def end(self) -> np.datetime64:
+        return self.edges[-1]
+
+
+_BUCKET_SIZES = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+
+def make_buckets(end: datetime, span: timedelta, granularity: str, tz: ZoneInfo) -> Buckets:
+    """
+    生成以 end 所在桶结尾、覆盖 span 的连续时间桶，桶边界按 tz 的本地时间对齐
+    例如 span=30d、granularity=day 得到包含今天在内的 30 个自然日
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+
+    count = -(-span // _BUCKET_SIZES[granularity])  # 向上取整
+    if count > MAX_BUCKETS:
+        raise ValueError(f"Too many buckets (max {MAX_BUCKETS})")
+
+    last = _floor_local(end.astimezone(tz), granularity)
+    first = _step_local(last, granularity, 1 - count)
+    starts = [_step_local(first, granularity, i) for i in range(count + 1)]
+
+    fmt = "%Y-%m-%dT%H:00" if granularity == "hour" else "%Y-%m-%d"
+    return Buckets(
+        labels=[s.strftime(fmt) for s in starts[:-1]],
+        edges=np.array([_to_datetime64(s) for s in starts], dtype="datetime64[us]"),
+    )
+
+
+def bucket_counts(timestamps: np.ndarray, buckets: Buckets, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    一次遍历完成分桶: searchsorted 定位每个时间戳所在的桶，bincount 计数 (或按 weights 求和)
+    不在 [start, end) 内的时间戳 (以及 NaT) 被忽略
+    """
+    n = len(buckets)
+    if timestamps.size == 0:
+        return np.zeros(n, dtype=float if weights is not None else np.int64)
+
+    idx = np.searchsorted(buckets.edges, timestamps, side="right") - 1
+    mask = (idx >= 0) & (idx < n)
+    if weights is not None:
+        return np.bincount(idx[mask], weights=np.asarray(weights, dtype=float)[mask], minlength=n)
+    return np.bincount(idx[mask], minlength=n)
+
+
+def series(buckets: Buckets, **columns: np.ndarray) -> list[dict]:
+    """将各列的分桶结果组装为图表数据 [{"date": label, col: value, ...}, ...]"""
+    rows = []
+    for i, label in enumerate(buckets.labels):
+        row = {"date": label}
+        for name, values in columns.items():
+            value = values[i]
+            row[name] = int(value) if np.issubdtype(values.dtype, np.integer) else float(value)
+        rows.append(row)
+    return rows
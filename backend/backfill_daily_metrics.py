@@ -0,0 +1,32 @@
+"""
+回填/重算每日统计汇总表 daily_metrics
+
+汇总表由数据库触发器增量维护。首次上线 (已有历史数据) 或怀疑统计漂移时运行本脚本，
+它会调用数据库函数 rebuild_daily_metrics 按原始数据重算指定日期范围 (UTC+7 自然日)。
+重算期间的新写入可能被重复计入，建议在低峰期运行。
+
+使用方法:
+    cd backend
+    python backfill_daily_metrics.py                          # 全部历史
+    python backfill_daily_metrics.py 2024-01-01               # 从某天至今
+    python backfill_daily_metrics.py 2024-01-01 2024-01-31    # 指定范围 (含两端)
+"""
+
+import sys
+from datetime import date
+
+from database import get_supabase_client
+
+
+def backfill_daily_metrics(start=None, end=None):
+    db = get_supabase_client()
+    res = db.rpc("rebuild_daily_metrics", {"p_from": start, "p_to": end}).execute()
+    written = res.data or 0
+    target = f"{start or 'beginning'} .. {end or 'today'}"
+    print(f"Daily metrics rebuilt for {target}. Days written: {written}")
+    return written
+
+
+if __name__ == "__main__":
+    args = [date.fromisoformat(a).isoformat() for a in sys.argv[1:3]]
+    backfill_daily_metrics(*args)
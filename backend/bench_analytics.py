@@ -0,0 +1,91 @@
+"""
+分析分桶压测: 旧的逐行循环 vs analytics 模块 (NumPy 向量化)
+
+生成 --rows 条近 30 天内的合成 ISO 时间戳 (与 PostgREST 返回格式一致)，
+分别用旧接口的 to_7_date 循环和 analytics.parse_timestamps + bucket_counts 按 UTC+7 自然日分桶，
+核对两者结果一致并输出耗时。不连接数据库。
+
+使用方法:
+    cd backend
+    python bench_analytics.py --rows 1000000
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import analytics
+
+
+def synthetic_rows(n, now, days=30, seed=42):
+    """生成 n 行 {"created_at": ISO 字符串, "amount": 负数金额}"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(now.astimezone(timezone.utc).replace(tzinfo=None), "us") - np.timedelta64(days, "D")
+    offsets = rng.integers(0, days * 86400 * 10**6, size=n).astype("timedelta64[us]")
+    stamps = np.datetime_as_string(start + offsets, unit="us")
+    amounts = -rng.integers(50000, 500000, size=n)
+    return [{"created_at": s + "+00:00", "amount": int(a)} for s, a in zip(stamps, amounts)]
+
+
+def legacy_bucket(rows, now):
+    """旧版 get_analytics 的分桶方式 (逐行 fromisoformat)"""
+    tz_plus_7 = timezone(timedelta(hours=7))
+    today_date = now.astimezone(tz_plus_7).date()
+    start_date = today_date - timedelta(days=29)
+    trends = {(start_date + timedelta(days=i)).isoformat(): {"count": 0, "amount": 0} for i in range(30)}
+
+    def to_7_date(iso_str):
+        if not iso_str: return None
+        if iso_str.endswith('Z'): iso_str = iso_str[:-1] + '+00:00'
+        try:
+            return datetime.fromisoformat(iso_str).astimezone(tz_plus_7).date().isoformat()
+        except:
+            return None
+
+    for r in rows:
+        day = to_7_date(r.get("created_at"))
+        if day in trends:
+            trends[day]["count"] += 1
+            trends[day]["amount"] += abs(float(r.get("amount", 0)))
+    days = sorted(trends)
+    return [trends[d]["count"] for d in days], [trends[d]["amount"] for d in days]
+
+
+def vectorized_bucket(rows, now):
+    buckets = analytics.make_buckets(now, timedelta(days=30), "day", analytics.parse_tz("Asia/Jakarta"))
+    ts = analytics.parse_timestamps([r["created_at"] for r in rows])
+    amounts = np.abs(np.array([r["amount"] for r in rows], dtype=float))
+    return analytics.bucket_counts(ts, buckets).tolist(), analytics.bucket_counts(ts, buckets, amounts).tolist()
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析分桶压测")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="合成行数")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    rows = synthetic_rows(args.rows, now)
+
+    (legacy_counts, legacy_amounts), legacy_time = timed(legacy_bucket, rows, now)
+    (vec_counts, vec_amounts), vec_time = timed(vectorized_bucket, rows, now)
+
+    same = legacy_counts == vec_counts and np.allclose(legacy_amounts, vec_amounts)
+    print(f"rows:        {args.rows}")
+    print(f"legacy loop: {legacy_time:.3f}s")
+    print(f"vectorized:  {vec_time:.3f}s ({legacy_time / vec_time:.1f}x)")
+    print(f"bucketed:    {sum(vec_counts)} rows in {len(vec_counts)} days")
+    print("RESULT:", "MATCH" if same else "MISMATCH")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+并发领取任务压测 (验证不超卖)
+
+创建一个库存为 --stock 的临时平台和 --users 个临时用户，所有用户同时领取该任务，
+然后核对: 成功数 == 库存、剩余库存 == 0、user_tasks 行数 == 库存。
+--legacy 模式按旧接口的 "读库存 -> 插入 -> 写回 库存-1" 流程执行，用于对比超卖现象。
+脚本结束时删除临时数据。
+
+使用方法:
+    cd backend
+    python bench_claim.py --stock 50 --users 500
+    python bench_claim.py --stock 50 --users 500 --legacy
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter
+
+from supabase import acreate_client
+
+from config import get_settings
+
+
+async def claim_atomic(db, user_id, platform_id):
+    res = await db.rpc("claim_task", {"p_user_id": user_id, "p_platform_id": platform_id}).execute()
+    return (res.data or {}).get("status", "error")
+
+
+async def claim_legacy(db, user_id, platform_id):
+    """旧版 start_task 的读-改-写流程 (存在竞态)"""
+    platform = (await db.table("platforms").select("*").eq("id", platform_id).execute()).data[0]
+    if platform.get("remaining_qty", 0) <= 0:
+        return "sold_out"
+    existing = await db.table("user_tasks").select("id").eq("user_id", user_id).eq("platform_id", platform_id).execute()
+    if existing.data:
+        return "already_taken"
+    await db.table("user_tasks").insert({
+        "user_id": user_id,
+        "platform_id": platform_id,
+        "platform_name": platform["name"],
+        "logo_url": platform["logo_url"],
+        "reward_amount": platform["reward_amount"],
+        "status": "ongoing",
+    }).execute()
+    await db.table("platforms").update({"remaining_qty": platform["remaining_qty"] - 1}).eq("id", platform_id).execute()
+    return "ok"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="并发领取任务压测")
+    parser.add_argument("--stock", type=int, default=50, help="临时平台的库存")
+    parser.add_argument("--users", type=int, default=500, help="并发领取的用户数")
+    parser.add_argument("--legacy", action="store_true", help="使用旧的读-改-写流程")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    db = await acreate_client(settings.supabase_url, settings.supabase_service_role_key)
+
+    run_id = uuid.uuid4().hex[:8]
+    platform = (await db.table("platforms").insert({
+        "name": f"bench-claim-{run_id}",
+        "download_link": "https://example.com",
+        "reward_amount": 1,
+        "total_qty": args.stock,
+        "remaining_qty": args.stock,
+        "status": "offline",
+    }).execute()).data[0]
+
+    users = (await db.table("users").insert([
+        {
+            "email": f"bench-{run_id}-{i}@example.com",
+            "password": "x",
+            "referral_code": f"B{run_id}{i}"[:20],
+        }
+        for i in range(args.users)
+    ]).execute()).data
+    user_ids = [u["id"] for u in users]
+
+    claim = claim_legacy if args.legacy else claim_atomic
+    try:
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(claim(db, uid, platform["id"]) for uid in user_ids),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+
+        counts = Counter(o if isinstance(o, str) else "error" for o in outcomes)
+        remaining = (await db.table("platforms").select("remaining_qty").eq("id", platform["id"]).execute()).data[0]["remaining_qty"]
+        rows = (await db.table("user_tasks").select("id", count="exact").eq("platform_id", platform["id"]).execute()).count
+
+        print(f"mode:            {'legacy' if args.legacy else 'claim_task'}")
+        print(f"claims:          {len(user_ids)} in {elapsed:.2f}s ({len(user_ids) / elapsed:.1f}/s)")
+        print(f"outcomes:        {dict(counts)}")
+        print(f"stock:           {args.stock}")
+        print(f"remaining_qty:   {remaining}")
+        print(f"user_tasks rows: {rows}")
+
+        oversold = rows > args.stock or counts["ok"] > args.stock or remaining < 0
+        drift = rows != args.stock - remaining
+        print("RESULT:", "OVERSOLD" if oversold else ("INCONSISTENT" if drift else "OK"))
+        return 1 if (oversold or drift) else 0
+    finally:
+        # user_tasks 随平台级联删除
+        await db.table("platforms").delete().eq("id", platform["id"]).execute()
+        await db.table("users").delete().in_("id", user_ids).execute()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
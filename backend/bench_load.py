@@ -0,0 +1,88 @@
+"""
+并发压测脚本: /api/initial-data 与 /api/users/{id}
+
+用于对比同步 Supabase 客户端与异步数据访问层在单个 worker 下的并发能力。
+
+使用方法:
+    cd backend
+    uvicorn main:app --workers 1 --port 8000
+    python bench_load.py --user-id <用户UUID> --requests 400 --concurrency 1 10 50
+
+在改动前后的提交上各运行一次 (同样 --workers 1)，比较吞吐 (req/s) 和 p95 延迟。
+同步客户端下并发数提高时吞吐基本不变 (请求在事件循环中排队)，
+异步客户端下吞吐应随并发数近似线性增长，直到 PostgREST 成为瓶颈。
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, total: int, concurrency: int):
+    """以固定并发数请求同一个端点，返回 (耗时, 延迟列表, 失败数)"""
+    latencies = []
+    failures = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(path)
+
+    async def worker():
+        nonlocal failures
+        while True:
+            try:
+                p = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                resp = await client.get(p)
+                if resp.status_code >= 400:
+                    failures += 1
+            except httpx.HTTPError:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, failures
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="RuangGamer API 并发压测")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--user-id", required=True, help="用于 /api/users/{id} 的用户 UUID")
+    parser.add_argument("--requests", type=int, default=400, help="每个端点每档并发的请求总数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    endpoints = ["/api/initial-data", f"/api/users/{args.user_id}"]
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        # 预热，避免首个请求的客户端初始化影响结果
+        for path in endpoints:
+            await client.get(path)
+
+        print(f"{'endpoint':<40} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'fail':>5}")
+        for path in endpoints:
+            for conc in args.concurrency:
+                elapsed, latencies, failures = await run_endpoint(client, path, args.requests, conc)
+                print(
+                    f"{path[:40]:<40} {conc:>5} {args.requests / elapsed:>9.1f} "
+                    f"{statistics.median(latencies) * 1000:>9.1f} {percentile(latencies, 95) * 1000:>9.1f} {failures:>5}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
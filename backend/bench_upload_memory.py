@@ -0,0 +1,144 @@
+"""
+凭证上传内存压测
+
+模拟 --uploads 个并发的 --size MB 图片上传 (默认 50 个 8 MB)，对比两种处理方式的峰值内存:
+- legacy: 旧接口的 await file.read() 整个读进内存再上传
+- stream: uploads.store_upload 按块检查并流式上传
+上传文件与 multipart 解析结果一致 (starlette UploadFile + 超过 1MB 落盘的 SpooledTemporaryFile)；
+Storage 用进程内的 httpx transport 代替，按块消费请求体 (httpx.MockTransport 会先把请求体整个读进内存，不能用)。
+每种方式在独立子进程中运行，分别报告 Python 分配峰值 (tracemalloc) 和进程 RSS 峰值。
+--duplicate 让所有上传内容相同，用于验证按内容去重 (并发的第一轮和之后的第二轮都只应有一次实际上传)。
+
+使用方法:
+    cd backend
+    python bench_upload_memory.py
+    python bench_upload_memory.py --uploads 50 --size 8 --duplicate
+    python bench_upload_memory.py --mode stream     # 只运行一种方式
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+from starlette.datastructures import Headers, UploadFile
+
+from uploads import CHUNK_SIZE, StorageUploader, store_upload
+
+
+BUCKET = "proofs"
+MAX_BYTES = 10 * 1024 * 1024
+JPEG_HEADER = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+
+
+def make_upload(index: int, size: int, duplicate: bool) -> UploadFile:
+    """生成一个落盘的上传文件 (与 Starlette 解析 multipart 得到的对象相同)"""
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(JPEG_HEADER)
+    written = len(JPEG_HEADER)
+    block = (b"%08d" % (0 if duplicate else index)) * (CHUNK_SIZE // 8)
+    while written < size:
+        piece = block[: size - written]
+        spool.write(piece if duplicate else os.urandom(len(piece)))
+        written += len(piece)
+    spool.seek(0)
+    return UploadFile(file=spool, filename=f"proof-{index}.jpg", headers=Headers({"content-type": "image/jpeg"}))
+
+
+class FakeStorage(httpx.AsyncBaseTransport):
+    """进程内 Storage: HEAD 判断对象是否存在，POST 按块消费请求体"""
+
+    def __init__(self):
+        self.objects: set[str] = set()
+        self.uploads = 0
+        self.bytes_received = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "HEAD":
+            return httpx.Response(200 if path in self.objects else 404)
+        async for chunk in request.stream:
+            self.bytes_received += len(chunk)
+        self.objects.add(path)
+        self.uploads += 1
+        return httpx.Response(200, json={"Key": path})
+
+
+async def upload_legacy(file: UploadFile, client: httpx.AsyncClient, index: int) -> None:
+    """旧接口: 整个文件读进内存后一次性上传"""
+    content = await file.read()
+    response = await client.post(
+        f"http://storage.local/storage/v1/object/{BUCKET}/legacy-{index}.jpg",
+        content=content,
+        headers={"Content-Type": file.content_type},
+    )
+    response.raise_for_status()
+
+
+async def run(mode: str, uploads: int, size: int, duplicate: bool) -> None:
+    files = [make_upload(i, size, duplicate) for i in range(uploads)]
+    storage = FakeStorage()
+    client = httpx.AsyncClient(transport=storage)
+    uploader = StorageUploader("http://storage.local", "bench-key", client=client)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == "legacy":
+        await asyncio.gather(*(upload_legacy(f, client, i) for i, f in enumerate(files)))
+    else:
+        await asyncio.gather(*(store_upload(f, uploader, BUCKET, MAX_BYTES) for f in files))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if duplicate and mode == "stream":
+        # 再上传一轮相同内容: 应全部命中已有对象
+        for f in files:
+            await f.seek(0)
+        before = storage.uploads
+        await asyncio.gather(*(store_upload(f, uploader, BUCKET, MAX_BYTES) for f in files))
+        print(f"dedup second round: {storage.uploads - before} new uploads")
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"mode:             {mode}")
+    print(f"uploads:          {uploads} x {size / 1024 / 1024:.0f} MB in {elapsed:.2f}s")
+    print(f"storage received: {storage.uploads} objects, {storage.bytes_received / 1024 / 1024:.0f} MB")
+    print(f"python peak:      {peak / 1024 / 1024:.1f} MB")
+    print(f"rss growth:       {(peak_rss - baseline_rss) / 1024:.1f} MB (peak rss {peak_rss / 1024:.1f} MB)")
+
+    await client.aclose()
+    for f in files:
+        await f.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="凭证上传内存压测")
+    parser.add_argument("--uploads", type=int, default=50, help="并发上传数")
+    parser.add_argument("--size", type=int, default=8, help="每个文件的大小 (MB)")
+    parser.add_argument("--duplicate", action="store_true", help="所有上传内容相同")
+    parser.add_argument("--mode", choices=["legacy", "stream"], help="只运行一种方式 (默认两种各在子进程中运行)")
+    args = parser.parse_args()
+    size = args.size * 1024 * 1024
+
+    if args.mode:
+        asyncio.run(run(args.mode, args.uploads, size, args.duplicate))
+        return 0
+
+    for mode in ("legacy", "stream"):
+        command = [sys.executable, __file__, "--mode", mode, "--uploads", str(args.uploads), "--size", str(args.size)]
+        if args.duplicate:
+            command.append("--duplicate")
+        subprocess.run(command, check=True)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+-- ============================================
+-- 后台用户搜索压测 (合成 100 万用户)
+-- 在独立的 bench_users 表上对比无索引 / 有 trigram 索引时后台搜索接口所用查询
+-- (email/phone/referral_code 三列 OR ILIKE '%词%') 的执行计划和耗时，不触碰 users 表
+-- 使用方法: psql "$DATABASE_URL" -f bench_user_search.sql
+-- ============================================
+\timing on
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+DROP TABLE IF EXISTS bench_users;
+CREATE TABLE bench_users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(50),
+    referral_code VARCHAR(20) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+INSERT INTO bench_users (email, phone, referral_code, created_at)
+SELECT
+    'player' || g || '_' || substr(md5(g::TEXT), 1, 6) || '@example.com',
+    '08' || lpad((abs(hashtext(g::TEXT)) % 10000000000)::TEXT, 10, '0'),
+    upper(substr(md5('r' || g), 1, 6)),
+    NOW() - (g || ' seconds')::INTERVAL
+FROM generate_series(1, 1000000) AS g;
+
+CREATE INDEX ON bench_users (created_at DESC);
+ANALYZE bench_users;
+
+-- 取一个真实存在的手机号/邮箱片段作为搜索词
+SELECT substr(phone, 4, 6) AS phone_part, substr(email, 3, 8) AS email_part
+FROM bench_users OFFSET 500000 LIMIT 1 \gset
+
+\echo '== 无索引: 子串搜索 (邮箱片段)'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM bench_users
+WHERE email ILIKE '%' || :'email_part' || '%' OR phone ILIKE '%' || :'email_part' || '%' OR referral_code ILIKE '%' || :'email_part' || '%'
+ORDER BY created_at DESC LIMIT 20;
+
+\echo '== 无索引: 子串搜索 (手机号片段)'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM bench_users
+WHERE email ILIKE '%' || :'phone_part' || '%' OR phone ILIKE '%' || :'phone_part' || '%' OR referral_code ILIKE '%' || :'phone_part' || '%'
+ORDER BY created_at DESC LIMIT 20;
+
+CREATE INDEX bench_users_email_trgm ON bench_users USING GIN (email gin_trgm_ops);
+CREATE INDEX bench_users_phone_trgm ON bench_users USING GIN (phone gin_trgm_ops);
+CREATE INDEX bench_users_referral_code_trgm ON bench_users USING GIN (referral_code gin_trgm_ops);
+ANALYZE bench_users;
+
+\echo '== 有索引: 子串搜索 (邮箱片段，BitmapOr over trigram GIN)'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM bench_users
+WHERE email ILIKE '%' || :'email_part' || '%' OR phone ILIKE '%' || :'email_part' || '%' OR referral_code ILIKE '%' || :'email_part' || '%'
+ORDER BY created_at DESC LIMIT 20;
+
+\echo '== 有索引: 子串搜索 (手机号片段)'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM bench_users
+WHERE email ILIKE '%' || :'phone_part' || '%' OR phone ILIKE '%' || :'phone_part' || '%' OR referral_code ILIKE '%' || :'phone_part' || '%'
+ORDER BY created_at DESC LIMIT 20;
+
+DROP TABLE bench_users;
@@ -0,0 +1,82 @@
+"""
+进程内缓存
+LRU + TTL 淘汰，带命中/未命中统计，供各路由缓存热点数据
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# 所有已创建的缓存，按名称登记，用于统计接口
+_registry: dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    LRU + TTL 缓存
+    超过 maxsize 时淘汰最久未使用的条目，条目超过 ttl 秒视为过期
+    只在事件循环线程中使用，不需要加锁
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 30.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取条目，过期或不存在时返回 default"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入条目，可单独指定 ttl"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """删除单个条目"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空全部条目"""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """命中统计，用于评估容量和 TTL"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def cache_stats() -> list[dict]:
+    """返回所有缓存的统计信息"""
+    return [cache.stats() for cache in _registry.values()]
@@ -1,9 +1,9 @@
 
 import json
-from database import get_db
+from database import get_supabase_client
 
 def capture_stats():
-    db = get_db()
+    db = get_supabase_client()
     stats = {}
     
     tables = ["system_config", "users", "platforms", "activities", "user_tasks", "transactions", "messages", "admins"]
@@ -1,12 +1,12 @@
 
 import sys
 import os
-from database import get_db
+from database import get_supabase_client
 
 def check_status():
     print("Checking database connection...")
     try:
-        db = get_db()
+        db = get_supabase_client()
         print("Connection successful.")
     except Exception as e:
         print(f"Connection failed: {e}")
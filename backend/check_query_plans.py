@@ -0,0 +1,120 @@
+"""
+热点查询执行计划检查
+
+对后台列表、分析接口、用户历史和消息计数等热点查询的 SQL 形状执行 EXPLAIN，
+任一查询的执行计划中没有用到为它建立的索引即失败 (退出码 1)，用于确认索引覆盖了这些查询。
+(只检查"没有顺序扫描"不够: 关闭顺序扫描后，规划器可能改为全量扫描某个无关索引再逐行过滤)
+
+本地库数据量很小时规划器本来就会选顺序扫描，因此检查时关闭 enable_seqscan，
+让规划器在有可用索引路径时一定选择索引。
+
+需要配置 DATABASE_URL，并先建库 (database_schema.sql) 和执行迁移 (python migrate.py)。
+
+使用方法:
+    cd backend
+    python check_query_plans.py
+    python check_query_plans.py --verbose   # 打印每个查询的执行计划
+"""
+
+import argparse
+import json
+import sys
+import uuid
+
+import psycopg
+
+from config import get_settings
+
+
+USER_ID = str(uuid.uuid4())
+
+# (名称, 预期使用的索引, SQL, 参数)
+HOT_QUERIES = [
+    ("admin users list", "idx_users_created_at",
+     "SELECT * FROM users ORDER BY created_at DESC LIMIT 20", ()),
+    ("today registrations", "idx_users_created_at",
+     "SELECT COUNT(*) FROM users WHERE created_at >= NOW() - INTERVAL '1 day'", ()),
+    ("user search count", "idx_users_phone_trgm",
+     "SELECT COUNT(*) FROM users WHERE email ILIKE %s OR phone ILIKE %s OR referral_code ILIKE %s",
+     ("%0812%", "%0812%", "%0812%")),
+    ("pending withdrawals list", "idx_transactions_withdraw_created",
+     "SELECT * FROM transactions WHERE type = 'withdraw' ORDER BY created_at DESC LIMIT 20", ()),
+    ("analytics withdrawals", "idx_transactions_type_status_created",
+     "SELECT amount, created_at FROM transactions "
+     "WHERE type = 'withdraw' AND status = 'success' AND created_at >= NOW() - INTERVAL '30 days'", ()),
+    ("user transactions page", "idx_transactions_user_date_id",
+     "SELECT * FROM transactions WHERE user_id = %s ORDER BY date DESC, id DESC LIMIT 21", (USER_ID,)),
+    ("pending tasks queue", "idx_user_tasks_reviewing_submission",
+     "SELECT * FROM user_tasks WHERE status = 'reviewing' ORDER BY submission_time DESC", ()),
+    ("pending tasks count", "idx_user_tasks_reviewing_submission",
+     "SELECT COUNT(*) FROM user_tasks WHERE status = 'reviewing'", ()),
+    ("audit history list", "idx_user_tasks_audited_updated",
+     "SELECT * FROM user_tasks WHERE status IN ('completed', 'rejected') ORDER BY updated_at DESC LIMIT 20", ()),
+    ("analytics tasks completed", "idx_user_tasks_status_submission",
+     "SELECT submission_time FROM user_tasks "
+     "WHERE status = 'completed' AND submission_time >= NOW() - INTERVAL '30 days'", ()),
+    ("analytics tasks claimed", "idx_user_tasks_start_time",
+     "SELECT start_time FROM user_tasks WHERE start_time >= NOW() - INTERVAL '30 days'", ()),
+    ("user tasks page", "idx_user_tasks_user_start_id",
+     "SELECT * FROM user_tasks WHERE user_id = %s ORDER BY start_time DESC, id DESC LIMIT 21", (USER_ID,)),
+    ("unread message count", "idx_messages_user_unread",
+     "SELECT COUNT(*) FROM messages WHERE user_id = %s AND read IS FALSE", (USER_ID,)),
+    ("user messages page", "idx_messages_user_date_id",
+     "SELECT * FROM messages WHERE user_id = %s ORDER BY date DESC, id DESC LIMIT 21", (USER_ID,)),
+    ("admin messages feed", "idx_messages_date_id",
+     "SELECT * FROM admin_message_feed ORDER BY date DESC, id DESC LIMIT 20", ()),
+]
+
+
+def used_indexes(plan: dict) -> set[str]:
+    """递归收集执行计划中用到的索引名 (Index Scan / Index Only Scan / Bitmap Index Scan)"""
+    found = {plan["Index Name"]} if plan.get("Index Name") else set()
+    for child in plan.get("Plans", []):
+        found |= used_indexes(child)
+    return found
+
+
+def node_summary(plan: dict) -> str:
+    """计划树的节点类型概要，如 Limit > Index Scan (idx_x)"""
+    label = plan["Node Type"]
+    if plan.get("Index Name"):
+        label += f" ({plan['Index Name']})"
+    children = plan.get("Plans", [])
+    return label + (" > " + " | ".join(node_summary(c) for c in children) if children else "")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="热点查询执行计划检查")
+    parser.add_argument("--verbose", action="store_true", help="打印每个查询的执行计划")
+    args = parser.parse_args()
+
+    database_url = get_settings().database_url
+    if not database_url:
+        print("DATABASE_URL is not configured")
+        return 1
+
+    failures = 0
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("SET enable_seqscan = off")
+        cur = psycopg.ClientCursor(conn)
+        for name, index, query, params in HOT_QUERIES:
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            result = cur.fetchone()[0]
+            if isinstance(result, str):
+                result = json.loads(result)
+            plan = result[0]["Plan"]
+
+            bad = index not in used_indexes(plan)
+            failures += bad
+            print(f"{'NO INDEX' if bad else 'ok':<9} {name:<28} {node_summary(plan)}")
+            if bad:
+                print(f"{'':<9} expected {index}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use their index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,8 @@ class Settings(BaseSettings):
     supabase_url: str = ""
     supabase_anon_key: str = ""
     supabase_service_role_key: str = ""
+    # Postgres 直连串 (迁移和执行计划检查脚本使用，应用本身通过 Supabase 客户端访问)
+    database_url: str = ""
     
     # JWT 配置
     secret_key: str = "your-secret-key-change-in-production"
@@ -23,6 +25,33 @@ class Settings(BaseSettings):
     # CORS 配置
     cors_origins: str = "*"
     
+    # 用户资料缓存 (进程内 LRU + TTL；失效不跨进程，多 worker 时 TTL 即资料的最大陈旧时间)
+    profile_cache_size: int = 10000
+    profile_cache_ttl: int = 30  # 秒
+    
+    # 目录类接口缓存 (任务列表)
+    catalog_cache_ttl: int = 15  # 秒
+    # /api/initial-data 快照的兜底刷新周期 (快照由任务/活动写操作主动重建)
+    initial_data_snapshot_max_age: int = 60  # 秒
+    # 系统配置注册表的兜底刷新周期 (update_config 会主动失效)
+    config_registry_ttl: int = 60  # 秒
+    # 点赞数写缓冲: 定期写回周期，以及触发提前写回的累积点赞数
+    like_flush_interval: int = 5  # 秒
+    like_flush_max_pending: int = 500
+    # 后台用户搜索结果页缓存
+    user_search_cache_ttl: int = 10  # 秒
+    # 后台仪表盘统计缓存
+    dashboard_stats_ttl: int = 10  # 秒
+    # 后台分页列表总数: 规划器估算不低于阈值时直接返回近似值，否则取精确值；同一过滤条件的总数缓存时长
+    count_exact_threshold: int = 10000
+    count_cache_ttl: int = 15  # 秒
+    # 平台 logo / 活动图片等内联 base64 图片外置到的 Storage bucket (需为 public)
+    media_bucket: str = "media"
+    # 凭证图片上传的字节上限
+    upload_max_bytes: int = 10 * 1024 * 1024
+    # 后台任务 (如全员广播) 每批处理的用户数
+    job_chunk_size: int = 1000
+    
     # Facebook CAPI 配置
     fb_access_token: str = ""
     fb_pixel_id: str = ""
@@ -0,0 +1,76 @@
+"""
+分页总数策略
+后台列表翻页时不再每页都对大表做 count(*):
+- 先用规划器估算 (PostgREST count=planned，即 EXPLAIN 的行数估计，不扫描表)
+- 估算值不低于阈值时直接返回估算值，并标记为近似
+- 估算值低于阈值 (结果集较小) 时取精确总数；当前页不满一页时可直接推出精确总数
+- 同一过滤条件的总数短时间缓存，翻页只查询数据
+"""
+
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from cache import TTLCache
+from config import get_settings
+
+
+# fetch(count) -> (当前页行, 总数)；count 为 None / "planned" / "exact"
+Fetch = Callable[[Optional[str]], Awaitable[tuple[list, Optional[int]]]]
+
+
+class CountStrategy:
+    """
+    一类列表的总数策略
+    缓存键由调用方给出 (不含页码的过滤条件)，缓存值为 (总数, 是否近似)
+    """
+
+    def __init__(self, name: str, exact_threshold: int, ttl: float):
+        self.exact_threshold = exact_threshold
+        self.cache = TTLCache(f"count:{name}", maxsize=256, ttl=ttl)
+
+    async def page(self, key: Hashable, fetch: Fetch, start: int, per_page: int) -> tuple[list, int, bool]:
+        """
+        查询一页数据并给出总数，返回 (当前页行, 总数, 是否近似)
+        缓存命中时只查询数据；未命中时数据和估算值一次往返取回，必要时再取一次精确总数
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            rows, _ = await fetch(None)
+            total, approximate = cached
+        else:
+            rows, estimate = await fetch("planned")
+            if self._known(rows, start, per_page):
+                total, approximate = start + len(rows), False
+            elif estimate is not None and estimate >= self.exact_threshold:
+                total, approximate = estimate, True
+            else:
+                _, total = await fetch("exact")
+                total, approximate = total or 0, False
+            self.cache.set(key, (total, approximate))
+
+        # 当前页本身能推出精确总数时以它为准 (纠正缓存或估算的偏差)
+        if self._known(rows, start, per_page):
+            return rows, start + len(rows), False
+        if approximate and total < start + len(rows):
+            total = start + len(rows)
+        return rows, total, approximate
+
+    @staticmethod
+    def _known(rows: list, start: int, per_page: int) -> bool:
+        """不满一页 (且不是越过末尾的空页) 时，总数就是 start + 本页行数"""
+        return len(rows) < per_page and (bool(rows) or start == 0)
+
+    def clear(self) -> None:
+        """数据变化导致总数失效时调用"""
+        self.cache.clear()
+
+
+def count_strategy(name: str) -> CountStrategy:
+    """按全局配置创建总数策略"""
+    settings = get_settings()
+    return CountStrategy(name, exact_threshold=settings.count_exact_threshold, ttl=settings.count_cache_ttl)
+
+
+async def fetch_page(query: Any, start: int, end: int) -> tuple[list, Optional[int]]:
+    """执行 PostgREST 分页查询 (select 时已带上 count 参数)，返回 (当前页行, 总数)"""
+    result = await query.range(start, end).execute()
+    return result.data or [], result.count
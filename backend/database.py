@@ -2,32 +2,56 @@
 Supabase 数据库连接管理
 """
 
-from supabase import create_client, Client
+import asyncio
+from typing import Optional
+
+from supabase import create_client, acreate_client, Client, AsyncClient
 from functools import lru_cache
 from config import get_settings
 
 
-@lru_cache()
-def get_supabase_client() -> Client:
-    """
-    获取 Supabase 客户端实例
-    使用 lru_cache 确保单例模式
-    """
+def _require_credentials():
+    """检查 Supabase 配置并返回 (url, key)"""
     settings = get_settings()
-    
+
     if not settings.supabase_url or not settings.supabase_service_role_key:
         raise ValueError(
             "Supabase 配置缺失。请在 .env 文件中设置 SUPABASE_URL 和 SUPABASE_SERVICE_ROLE_KEY"
         )
-    
-    return create_client(
-        settings.supabase_url,
-        settings.supabase_service_role_key
-    )
+
+    return settings.supabase_url, settings.supabase_service_role_key
+
+
+@lru_cache()
+def get_supabase_client() -> Client:
+    """
+    获取同步 Supabase 客户端实例
+    仅供命令行脚本使用 (check_db_status.py 等)，路由中请使用 get_db
+    """
+    url, key = _require_credentials()
+    return create_client(url, key)
+
+
+_async_client: Optional[AsyncClient] = None
+_async_client_lock = asyncio.Lock()
+
+
+async def get_async_supabase_client() -> AsyncClient:
+    """
+    获取异步 Supabase 客户端实例 (进程内单例)
+    所有请求共享同一个 httpx 连接池，PostgREST 调用不会阻塞事件循环
+    """
+    global _async_client
+    if _async_client is None:
+        async with _async_client_lock:
+            if _async_client is None:
+                url, key = _require_credentials()
+                _async_client = await acreate_client(url, key)
+    return _async_client
 
 
-def get_db() -> Client:
+async def get_db() -> AsyncClient:
     """
     依赖注入函数，用于 FastAPI 路由
     """
-    return get_supabase_client()
+    return await get_async_supabase_client()
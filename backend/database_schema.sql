@@ -1,6 +1,7 @@
 -- ============================================
 -- RuangGamer 数据库架构
 -- 使用 Supabase PostgreSQL
+-- 建库基线；之后的增量变更 (如大表上的索引) 见 migrations/，由 python migrate.py 执行
 -- ============================================
 
 -- 启用 UUID 扩展
@@ -247,3 +248,1003 @@ CREATE TRIGGER update_activities_updated_at
 -- 公开读取策略（平台和活动）
 -- CREATE POLICY "Public can read platforms" ON platforms FOR SELECT USING (true);
 -- CREATE POLICY "Public can read activities" ON activities FOR SELECT USING (true);
+
+-- ============================================
+-- 12. 用户计数列 (触发器维护)
+-- 用户资料直接读取这些列，避免每次请求 count(*) 扫描
+-- ============================================
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unread_msg_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS tx_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS ongoing_task_count INTEGER NOT NULL DEFAULT 0;
+
+-- 语句级触发器 + 过渡表：批量插入/更新时每个用户只更新一次
+CREATE OR REPLACE FUNCTION sync_user_unread_msg_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users u SET unread_msg_count = u.unread_msg_count + d.delta
+        FROM (SELECT user_id, COUNT(*) AS delta FROM new_rows WHERE read IS FALSE GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE users u SET unread_msg_count = GREATEST(u.unread_msg_count - d.delta, 0)
+        FROM (SELECT user_id, COUNT(*) AS delta FROM old_rows WHERE read IS FALSE GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE users u SET unread_msg_count = GREATEST(u.unread_msg_count + d.delta, 0)
+        FROM (
+            SELECT user_id, SUM(delta) AS delta FROM (
+                SELECT user_id, 1 AS delta FROM new_rows WHERE read IS FALSE
+                UNION ALL
+                SELECT user_id, -1 AS delta FROM old_rows WHERE read IS FALSE
+            ) x GROUP BY user_id HAVING SUM(delta) <> 0
+        ) d
+        WHERE u.id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_user_tx_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users u SET tx_count = u.tx_count + d.delta
+        FROM (SELECT user_id, COUNT(*) AS delta FROM new_rows GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE users u SET tx_count = GREATEST(u.tx_count - d.delta, 0)
+        FROM (SELECT user_id, COUNT(*) AS delta FROM old_rows GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_user_ongoing_task_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users u SET ongoing_task_count = u.ongoing_task_count + d.delta
+        FROM (SELECT user_id, COUNT(*) AS delta FROM new_rows WHERE status = 'ongoing' GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE users u SET ongoing_task_count = GREATEST(u.ongoing_task_count - d.delta, 0)
+        FROM (SELECT user_id, COUNT(*) AS delta FROM old_rows WHERE status = 'ongoing' GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE users u SET ongoing_task_count = GREATEST(u.ongoing_task_count + d.delta, 0)
+        FROM (
+            SELECT user_id, SUM(delta) AS delta FROM (
+                SELECT user_id, 1 AS delta FROM new_rows WHERE status = 'ongoing'
+                UNION ALL
+                SELECT user_id, -1 AS delta FROM old_rows WHERE status = 'ongoing'
+            ) x GROUP BY user_id HAVING SUM(delta) <> 0
+        ) d
+        WHERE u.id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 过渡表触发器每个只能对应一种事件，因此分别创建
+DROP TRIGGER IF EXISTS messages_unread_count_ins ON messages;
+CREATE TRIGGER messages_unread_count_ins AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_unread_msg_count();
+DROP TRIGGER IF EXISTS messages_unread_count_upd ON messages;
+CREATE TRIGGER messages_unread_count_upd AFTER UPDATE ON messages
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_unread_msg_count();
+DROP TRIGGER IF EXISTS messages_unread_count_del ON messages;
+CREATE TRIGGER messages_unread_count_del AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_unread_msg_count();
+
+DROP TRIGGER IF EXISTS transactions_tx_count_ins ON transactions;
+CREATE TRIGGER transactions_tx_count_ins AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_tx_count();
+DROP TRIGGER IF EXISTS transactions_tx_count_del ON transactions;
+CREATE TRIGGER transactions_tx_count_del AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_tx_count();
+
+DROP TRIGGER IF EXISTS user_tasks_ongoing_count_ins ON user_tasks;
+CREATE TRIGGER user_tasks_ongoing_count_ins AFTER INSERT ON user_tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_ongoing_task_count();
+DROP TRIGGER IF EXISTS user_tasks_ongoing_count_upd ON user_tasks;
+CREATE TRIGGER user_tasks_ongoing_count_upd AFTER UPDATE ON user_tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_ongoing_task_count();
+DROP TRIGGER IF EXISTS user_tasks_ongoing_count_del ON user_tasks;
+CREATE TRIGGER user_tasks_ongoing_count_del AFTER DELETE ON user_tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_ongoing_task_count();
+
+-- 回填/修复计数 (p_user_id 为空时处理全部用户)，返回被修正的行数
+-- 用法: SELECT refresh_user_counters();  或 python repair_counters.py
+CREATE OR REPLACE FUNCTION refresh_user_counters(p_user_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    fixed INTEGER;
+BEGIN
+    WITH actual AS (
+        SELECT
+            u.id,
+            (SELECT COUNT(*) FROM messages m WHERE m.user_id = u.id AND m.read IS FALSE) AS unread_msg_count,
+            (SELECT COUNT(*) FROM transactions t WHERE t.user_id = u.id) AS tx_count,
+            (SELECT COUNT(*) FROM user_tasks ut WHERE ut.user_id = u.id AND ut.status = 'ongoing') AS ongoing_task_count
+        FROM users u
+        WHERE p_user_id IS NULL OR u.id = p_user_id
+    )
+    UPDATE users u SET
+        unread_msg_count = a.unread_msg_count,
+        tx_count = a.tx_count,
+        ongoing_task_count = a.ongoing_task_count
+    FROM actual a
+    WHERE u.id = a.id
+      AND (u.unread_msg_count, u.tx_count, u.ongoing_task_count)
+          IS DISTINCT FROM (a.unread_msg_count, a.tx_count, a.ongoing_task_count);
+
+    GET DIAGNOSTICS fixed = ROW_COUNT;
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 13. 系统配置批量保存
+-- 一次调用写入全部配置项并递增 config_version，在同一事务中完成
+-- ============================================
+CREATE OR REPLACE FUNCTION save_system_config(p_items JSONB)
+RETURNS BIGINT AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    INSERT INTO system_config (key, value)
+    SELECT item->>'key', item->'value'
+    FROM jsonb_array_elements(p_items) AS item
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW();
+
+    INSERT INTO system_config (key, value) VALUES ('config_version', '1')
+    ON CONFLICT (key) DO UPDATE
+        SET value = to_jsonb(COALESCE((system_config.value #>> '{}')::BIGINT, 0) + 1),
+            updated_at = NOW()
+    RETURNING (value #>> '{}')::BIGINT INTO new_version;
+
+    RETURN new_version;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 14. 原子领取任务
+-- 条件扣减库存 (remaining_qty > 0) 与插入 user_tasks 在同一事务完成，
+-- UNIQUE(user_id, platform_id) 作为重复领取的最终判定，一次调用返回结果
+-- 返回: {"status": "ok", "task": {...}} 或 status 为
+--       already_taken / sold_out / platform_not_found / user_not_found
+-- ============================================
+CREATE OR REPLACE FUNCTION claim_task(p_user_id UUID, p_platform_id UUID)
+RETURNS JSONB AS $$
+DECLARE
+    v_platform platforms%ROWTYPE;
+    v_task user_tasks%ROWTYPE;
+BEGIN
+    -- 快速路径：已领取时不去锁平台行
+    IF EXISTS (SELECT 1 FROM user_tasks WHERE user_id = p_user_id AND platform_id = p_platform_id) THEN
+        RETURN jsonb_build_object('status', 'already_taken');
+    END IF;
+
+    BEGIN
+        UPDATE platforms SET remaining_qty = remaining_qty - 1
+        WHERE id = p_platform_id AND remaining_qty > 0
+        RETURNING * INTO v_platform;
+
+        IF NOT FOUND THEN
+            IF EXISTS (SELECT 1 FROM platforms WHERE id = p_platform_id) THEN
+                RETURN jsonb_build_object('status', 'sold_out');
+            END IF;
+            RETURN jsonb_build_object('status', 'platform_not_found');
+        END IF;
+
+        INSERT INTO user_tasks (user_id, platform_id, platform_name, logo_url, reward_amount, status, start_time)
+        VALUES (p_user_id, p_platform_id, v_platform.name, v_platform.logo_url, v_platform.reward_amount, 'ongoing', NOW())
+        RETURNING * INTO v_task;
+    EXCEPTION
+        -- 异常块回滚子事务，上面的库存扣减一并撤销
+        WHEN unique_violation THEN
+            RETURN jsonb_build_object('status', 'already_taken');
+        WHEN foreign_key_violation THEN
+            RETURN jsonb_build_object('status', 'user_not_found');
+    END;
+
+    RETURN jsonb_build_object('status', 'ok', 'task', to_jsonb(v_task));
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 15. 点赞关系表 + 点赞数批量累加
+-- 点赞关系写入 user_likes (主键保证每人每任务一次)，
+-- platforms.likes 由后端内存缓冲定期调用 apply_like_increments 批量累加
+-- ============================================
+CREATE TABLE IF NOT EXISTS user_likes (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    platform_id UUID NOT NULL REFERENCES platforms(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (user_id, platform_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_likes_platform_id ON user_likes(platform_id);
+
+-- 从旧的 users.liked_task_ids 数组回填 (忽略已删除的平台和非法 ID)
+INSERT INTO user_likes (user_id, platform_id)
+SELECT u.id, p.id
+FROM users u
+CROSS JOIN LATERAL unnest(u.liked_task_ids) AS liked(task_id)
+JOIN platforms p ON p.id::TEXT = liked.task_id
+ON CONFLICT DO NOTHING;
+
+-- 记录一次点赞，返回 liked / already_liked / user_not_found / platform_not_found
+-- 只写关系行，不触碰 platforms 行 (避免热门任务的行锁争用)
+CREATE OR REPLACE FUNCTION like_platform(p_user_id UUID, p_platform_id UUID)
+RETURNS TEXT AS $$
+BEGIN
+    INSERT INTO user_likes (user_id, platform_id) VALUES (p_user_id, p_platform_id)
+    ON CONFLICT DO NOTHING;
+
+    IF FOUND THEN
+        RETURN 'liked';
+    END IF;
+    RETURN 'already_liked';
+EXCEPTION
+    WHEN foreign_key_violation THEN
+        IF EXISTS (SELECT 1 FROM users WHERE id = p_user_id) THEN
+            RETURN 'platform_not_found';
+        END IF;
+        RETURN 'user_not_found';
+END;
+$$ LANGUAGE plpgsql;
+
+-- 批量累加点赞数，p_items: [{"platform_id": "...", "delta": 3}, ...]
+-- 返回更新的平台数 (已删除的平台被忽略)
+CREATE OR REPLACE FUNCTION apply_like_increments(p_items JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE platforms p SET likes = COALESCE(p.likes, 0) + d.delta
+    FROM (
+        SELECT platform_id, SUM(delta) AS delta
+        FROM jsonb_to_recordset(p_items) AS x(platform_id UUID, delta INTEGER)
+        GROUP BY platform_id
+    ) d
+    WHERE p.id = d.platform_id;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 以关系表为准重算点赞数 (缓冲进程异常退出丢失增量后可运行)
+CREATE OR REPLACE FUNCTION refresh_platform_likes()
+RETURNS INTEGER AS $$
+DECLARE
+    fixed INTEGER;
+BEGIN
+    UPDATE platforms p SET likes = a.likes
+    FROM (
+        SELECT p2.id, COUNT(ul.user_id) AS likes
+        FROM platforms p2 LEFT JOIN user_likes ul ON ul.platform_id = p2.id
+        GROUP BY p2.id
+    ) a
+    WHERE p.id = a.id AND p.likes IS DISTINCT FROM a.likes;
+
+    GET DIAGNOSTICS fixed = ROW_COUNT;
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 16. 原子提现扣款 (幂等)
+-- 条件扣减余额 (balance >= 金额) 与插入提现流水在同一事务完成；
+-- 客户端传入 idempotency_key 时，同一用户重复提交只会扣款一次，重试直接返回首次结果
+-- 返回: {"status": "ok", "balance": 新余额, "transaction": {...}, "replayed": bool} 或 status 为
+--       user_not_found / phone_required / invalid_account / insufficient_balance
+-- ============================================
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_user_idempotency_key
+    ON transactions(user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION request_withdrawal(
+    p_user_id UUID,
+    p_account_id UUID,
+    p_amount DECIMAL,
+    p_idempotency_key VARCHAR DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_phone VARCHAR;
+    v_account bank_accounts%ROWTYPE;
+    v_balance DECIMAL;
+    v_tx transactions%ROWTYPE;
+BEGIN
+    -- 重试: 返回首次提交的结果
+    IF p_idempotency_key IS NOT NULL THEN
+        SELECT * INTO v_tx FROM transactions
+        WHERE user_id = p_user_id AND idempotency_key = p_idempotency_key;
+        IF FOUND THEN
+            SELECT balance INTO v_balance FROM users WHERE id = p_user_id;
+            RETURN jsonb_build_object('status', 'ok', 'balance', v_balance, 'transaction', to_jsonb(v_tx), 'replayed', TRUE);
+        END IF;
+    END IF;
+
+    SELECT phone INTO v_phone FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'user_not_found');
+    END IF;
+    IF v_phone IS NULL OR v_phone = '' THEN
+        RETURN jsonb_build_object('status', 'phone_required');
+    END IF;
+
+    SELECT * INTO v_account FROM bank_accounts WHERE id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'invalid_account');
+    END IF;
+
+    BEGIN
+        UPDATE users SET balance = balance - p_amount
+        WHERE id = p_user_id AND balance >= p_amount
+        RETURNING balance INTO v_balance;
+
+        IF NOT FOUND THEN
+            RETURN jsonb_build_object('status', 'insufficient_balance');
+        END IF;
+
+        INSERT INTO transactions (user_id, type, amount, description, status, date, idempotency_key)
+        VALUES (
+            p_user_id, 'withdraw', -p_amount,
+            'Withdraw to ' || v_account.bank_name || ' (' || v_account.account_number || ')',
+            'pending', NOW(), p_idempotency_key
+        )
+        RETURNING * INTO v_tx;
+    EXCEPTION
+        -- 同一 key 的并发请求: 撤销本次扣款，返回先完成的那一次
+        WHEN unique_violation THEN
+            SELECT * INTO v_tx FROM transactions
+            WHERE user_id = p_user_id AND idempotency_key = p_idempotency_key;
+            SELECT balance INTO v_balance FROM users WHERE id = p_user_id;
+            RETURN jsonb_build_object('status', 'ok', 'balance', v_balance, 'transaction', to_jsonb(v_tx), 'replayed', TRUE);
+    END;
+
+    RETURN jsonb_build_object('status', 'ok', 'balance', v_balance, 'transaction', to_jsonb(v_tx), 'replayed', FALSE);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 17. 批量审核任务 (批准发放奖励 + 三级推荐佣金 / 拒绝)
+-- 一条语句完成: 条件更新任务状态、递归 CTE 沿 users.referrer_id 取各任务最多 len(p_rates) 级上线、
+-- 按用户汇总后一次性累加余额、批量写入 task_reward / referral_bonus 流水
+-- 只有尚未 completed 的任务会被批准或拒绝，重复批准不会重复入账
+-- p_items: [{"task_id": "...", "user_id": "...", "status": "completed" | "rejected"}, ...]
+-- 返回: {"results": [{"task_id", "user_id", "status", "amount", "platform_name", "email", "phone"}, ...],
+--        "credited_user_ids": [...]}
+--       每项 status 为 completed / rejected / already_completed / not_found / invalid_status
+-- ============================================
+DROP FUNCTION IF EXISTS approve_task(UUID, UUID, NUMERIC[]);
+
+CREATE OR REPLACE FUNCTION audit_tasks(
+    p_items JSONB,
+    p_rates NUMERIC[] DEFAULT ARRAY[0.20, 0.10, 0.05]
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    WITH RECURSIVE items AS (
+        SELECT e.idx, x.task_id, x.user_id, x.status
+        FROM jsonb_array_elements(p_items) WITH ORDINALITY AS e(item, idx)
+        CROSS JOIN LATERAL jsonb_to_record(e.item) AS x(task_id UUID, user_id UUID, status TEXT)
+    ),
+    -- 同一任务出现多次时只按第一次处理
+    targets AS (
+        SELECT DISTINCT ON (task_id) task_id, user_id, status
+        FROM items
+        WHERE status IN ('completed', 'rejected')
+        ORDER BY task_id, idx
+    ),
+    changed AS (
+        UPDATE user_tasks ut SET status = t.status
+        FROM targets t
+        WHERE ut.id = t.task_id AND ut.user_id = t.user_id AND ut.status <> 'completed'
+        RETURNING ut.id AS task_id, ut.user_id, ut.status, ut.reward_amount, ut.platform_name
+    ),
+    approved AS (
+        SELECT c.task_id, c.user_id, c.reward_amount, u.email, u.referrer_id
+        FROM changed c JOIN users u ON u.id = c.user_id
+        WHERE c.status = 'completed'
+    ),
+    upline(task_id, user_id, level) AS (
+        SELECT a.task_id, a.referrer_id, 1
+        FROM approved a
+        WHERE a.referrer_id IS NOT NULL
+        UNION ALL
+        SELECT up.task_id, u.referrer_id, up.level + 1
+        FROM upline up JOIN users u ON u.id = up.user_id
+        WHERE u.referrer_id IS NOT NULL AND up.level < array_length(p_rates, 1)
+    ),
+    credits(user_id, amount, type, description) AS (
+        SELECT a.user_id, a.reward_amount, 'task_reward', 'Task Reward'
+        FROM approved a
+        UNION ALL
+        SELECT up.user_id, ROUND(a.reward_amount * p_rates[up.level], 2), 'referral_bonus',
+               'Komisi Level ' || up.level || ' dari ' || COALESCE(a.email, a.user_id::TEXT)
+        FROM upline up JOIN approved a ON a.task_id = up.task_id
+        WHERE ROUND(a.reward_amount * p_rates[up.level], 2) > 0
+    ),
+    credited AS (
+        UPDATE users u SET
+            balance = u.balance + c.amount,
+            total_earnings = u.total_earnings + c.amount
+        FROM (SELECT user_id, SUM(amount) AS amount FROM credits GROUP BY user_id) c
+        WHERE u.id = c.user_id
+        RETURNING u.id
+    ),
+    logged AS (
+        INSERT INTO transactions (user_id, type, amount, description, status)
+        SELECT user_id, type, amount, description, 'success' FROM credits
+    )
+    SELECT jsonb_build_object(
+        'results', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'task_id', i.task_id,
+                'user_id', i.user_id,
+                'status', CASE
+                    WHEN i.status NOT IN ('completed', 'rejected') OR i.status IS NULL THEN 'invalid_status'
+                    WHEN c.task_id IS NOT NULL THEN c.status
+                    -- 存在但未被更新: 任务此前已是 completed
+                    WHEN ut.id IS NOT NULL THEN 'already_completed'
+                    ELSE 'not_found'
+                END,
+                'amount', c.reward_amount,
+                'platform_name', c.platform_name,
+                'email', u.email,
+                'phone', u.phone
+            ) ORDER BY i.idx)
+            FROM items i
+            LEFT JOIN changed c ON c.task_id = i.task_id AND c.user_id = i.user_id
+            LEFT JOIN user_tasks ut ON ut.id = i.task_id AND ut.user_id = i.user_id
+            LEFT JOIN users u ON u.id = i.user_id AND c.status = 'completed'
+        ), '[]'::JSONB),
+        'credited_user_ids', COALESCE((SELECT jsonb_agg(id) FROM credited), '[]'::JSONB)
+    ) INTO v_result;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 18. 批量审核提现
+-- 一条语句完成: 只更新仍为 pending 的提现流水，
+-- 拒绝的提现按用户汇总后一次性退回余额，并批量写入 withdraw_refund 流水
+-- p_items: [{"transaction_id": "...", "status": "success" | "failed"}, ...]
+-- 返回: {"results": [{"transaction_id", "user_id", "status", "amount"}, ...], "refunded_user_ids": [...]}
+--       每项 status 为 success / failed / already_success / already_failed / not_found / invalid_status
+-- ============================================
+ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_type_check;
+ALTER TABLE transactions ADD CONSTRAINT transactions_type_check
+    CHECK (type IN ('task_reward', 'referral_bonus', 'withdraw', 'withdraw_refund', 'system_bonus', 'admin_gift', 'vip_bonus'));
+
+CREATE OR REPLACE FUNCTION audit_withdrawals(p_items JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    WITH items AS (
+        SELECT e.idx, x.transaction_id, x.status
+        FROM jsonb_array_elements(p_items) WITH ORDINALITY AS e(item, idx)
+        CROSS JOIN LATERAL jsonb_to_record(e.item) AS x(transaction_id UUID, status TEXT)
+    ),
+    -- 同一流水出现多次时只按第一次处理
+    targets AS (
+        SELECT DISTINCT ON (transaction_id) transaction_id, status
+        FROM items
+        WHERE status IN ('success', 'failed')
+        ORDER BY transaction_id, idx
+    ),
+    changed AS (
+        UPDATE transactions t SET status = tg.status
+        FROM targets tg
+        WHERE t.id = tg.transaction_id AND t.type = 'withdraw' AND t.status = 'pending'
+        RETURNING t.id, t.user_id, t.amount, t.status
+    ),
+    refunds AS (
+        SELECT id, user_id, ABS(amount) AS amount FROM changed WHERE status = 'failed'
+    ),
+    refunded AS (
+        UPDATE users u SET balance = u.balance + r.amount
+        FROM (SELECT user_id, SUM(amount) AS amount FROM refunds GROUP BY user_id) r
+        WHERE u.id = r.user_id
+        RETURNING u.id
+    ),
+    logged AS (
+        INSERT INTO transactions (user_id, type, amount, description, status)
+        SELECT user_id, 'withdraw_refund', amount, 'Refund: Withdraw Rejected (' || id || ')', 'success'
+        FROM refunds
+    )
+    SELECT jsonb_build_object(
+        'results', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'transaction_id', i.transaction_id,
+                'user_id', COALESCE(c.user_id, t.user_id),
+                'status', CASE
+                    WHEN i.status IS NULL OR i.status NOT IN ('success', 'failed') THEN 'invalid_status'
+                    WHEN c.id IS NOT NULL THEN c.status
+                    -- 语句内读取的是更新前的快照
+                    WHEN t.id IS NOT NULL THEN 'already_' || t.status
+                    ELSE 'not_found'
+                END,
+                'amount', ABS(COALESCE(c.amount, t.amount))
+            ) ORDER BY i.idx)
+            FROM items i
+            LEFT JOIN changed c ON c.id = i.transaction_id
+            LEFT JOIN transactions t ON t.id = i.transaction_id AND t.type = 'withdraw'
+        ), '[]'::JSONB),
+        'refunded_user_ids', COALESCE((SELECT jsonb_agg(id) FROM refunded), '[]'::JSONB)
+    ) INTO v_result;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 19. 后台任务 (jobs)
+-- 长耗时的管理操作 (如全员广播) 写入 jobs 表，由后端分批执行；
+-- 每批由一个数据库函数在单个事务内处理并推进游标，进程崩溃后从游标处继续，不重复不遗漏
+-- ============================================
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    kind VARCHAR(50) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    payload JSONB NOT NULL DEFAULT '{}',
+    last_user_id UUID,           -- 游标: 已处理到的最后一个 users.id (按 id 顺序分批)
+    processed INTEGER DEFAULT 0,
+    total INTEGER,
+    error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status) WHERE status IN ('pending', 'running');
+
+DROP TRIGGER IF EXISTS update_jobs_updated_at ON jobs;
+CREATE TRIGGER update_jobs_updated_at
+    BEFORE UPDATE ON jobs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- 执行广播任务的下一批: 为游标之后的 p_chunk_size 个用户 (仅限任务创建前注册的用户)
+-- 批量插入消息；payload.amount > 0 时批量加余额并写入 admin_gift 流水。返回更新后的 jobs 行
+-- payload: {"title": "...", "content": "...", "amount": 0, "broadcast_id": "..." (可选)}
+CREATE OR REPLACE FUNCTION run_broadcast_chunk(p_job_id UUID, p_chunk_size INTEGER DEFAULT 1000)
+RETURNS JSONB AS $$
+DECLARE
+    v_job jobs%ROWTYPE;
+    v_amount DECIMAL;
+    v_ids UUID[];
+    v_last UUID;
+    v_count INTEGER;
+BEGIN
+    -- 行锁: 多个 worker 同时恢复同一任务时串行执行，游标不会重复推进
+    SELECT * INTO v_job FROM jobs WHERE id = p_job_id FOR UPDATE;
+    IF NOT FOUND OR v_job.status IN ('completed', 'failed') THEN
+        RETURN to_jsonb(v_job);
+    END IF;
+
+    IF v_job.total IS NULL THEN
+        SELECT COUNT(*) INTO v_job.total FROM users WHERE created_at <= v_job.created_at;
+    END IF;
+
+    v_amount := COALESCE((v_job.payload->>'amount')::DECIMAL, 0);
+
+    SELECT COALESCE(array_agg(id ORDER BY id), '{}') INTO v_ids
+    FROM (
+        SELECT id FROM users
+        WHERE created_at <= v_job.created_at
+          AND (v_job.last_user_id IS NULL OR id > v_job.last_user_id)
+        ORDER BY id
+        LIMIT p_chunk_size
+    ) batch;
+
+    v_count := cardinality(v_ids);
+    v_last := v_ids[v_count];
+
+    -- 关联了 broadcasts 行的任务只负责发放金额，消息在读取时合并 (见第 20 节)
+    IF NOT v_job.payload ? 'broadcast_id' THEN
+        INSERT INTO messages (user_id, title, content, reward_amount)
+        SELECT uid, v_job.payload->>'title', v_job.payload->>'content', v_amount
+        FROM unnest(v_ids) AS uid;
+    END IF;
+
+    IF v_amount > 0 THEN
+        UPDATE users SET balance = balance + v_amount
+        WHERE id = ANY(v_ids);
+
+        INSERT INTO transactions (user_id, type, amount, description, status)
+        SELECT uid, 'admin_gift', v_amount, v_job.payload->>'title', 'success'
+        FROM unnest(v_ids) AS uid;
+    END IF;
+
+    UPDATE jobs SET
+        status = CASE WHEN v_count < p_chunk_size THEN 'completed' ELSE 'running' END,
+        last_user_id = COALESCE(v_last, last_user_id),
+        processed = processed + v_count,
+        total = v_job.total,
+        finished_at = CASE WHEN v_count < p_chunk_size THEN NOW() ELSE NULL END
+    WHERE id = p_job_id
+    RETURNING * INTO v_job;
+
+    RETURN to_jsonb(v_job);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 20. 广播消息 (读时合并)
+-- 全员消息只在 broadcasts 存一行，读取消息列表/未读数时与个人消息合并；
+-- 每个用户的广播已读状态是 broadcast_receipts 中的一个时间水位 (read_until 之前的广播均已读)，
+-- 不记录逐条广播的已读回执: 只支持"全部已读"，无法查询某条广播被哪些用户读过
+-- 后台消息动态通过视图 admin_message_feed 同时列出广播 (migrations/0005)
+-- 用户只能看到自己注册之后发出的广播
+-- ============================================
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    title VARCHAR(255) NOT NULL,
+    content TEXT NOT NULL,
+    reward_amount DECIMAL(15, 2),
+    date TIMESTAMPTZ DEFAULT NOW(),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_broadcasts_date ON broadcasts(date DESC);
+
+CREATE TABLE IF NOT EXISTS broadcast_receipts (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    read_until TIMESTAMPTZ NOT NULL
+);
+
+-- 未读广播数 (PostgREST 计算字段: select=*,unread_broadcast_count)
+CREATE OR REPLACE FUNCTION unread_broadcast_count(u users)
+RETURNS INTEGER AS $$
+    SELECT COUNT(*)::INTEGER
+    FROM broadcasts b
+    WHERE b.date >= u.created_at
+      AND b.date > COALESCE((SELECT read_until FROM broadcast_receipts r WHERE r.user_id = u.id), '-infinity');
+$$ LANGUAGE sql STABLE;
+
+-- 用户消息列表: 个人消息 + 广播，按时间倒序分页
+-- 返回: {"messages": [{id, user_id, title, content, reward_amount, read, date, is_broadcast}, ...], "total": n}
+CREATE OR REPLACE FUNCTION user_inbox(p_user_id UUID, p_limit INTEGER DEFAULT 20, p_offset INTEGER DEFAULT 0)
+RETURNS JSONB AS $$
+    WITH inbox AS (
+        SELECT m.id, m.user_id, m.title, m.content, m.reward_amount, m.read, m.date, FALSE AS is_broadcast
+        FROM messages m
+        WHERE m.user_id = p_user_id
+        UNION ALL
+        SELECT b.id, u.id, b.title, b.content, b.reward_amount,
+               b.date <= COALESCE(r.read_until, '-infinity'), b.date, TRUE
+        FROM users u
+        JOIN broadcasts b ON b.date >= u.created_at
+        LEFT JOIN broadcast_receipts r ON r.user_id = u.id
+        WHERE u.id = p_user_id
+    )
+    SELECT jsonb_build_object(
+        'messages', COALESCE((
+            SELECT jsonb_agg(to_jsonb(page) ORDER BY page.date DESC)
+            FROM (SELECT * FROM inbox ORDER BY date DESC LIMIT p_limit OFFSET p_offset) page
+        ), '[]'::JSONB),
+        'total', (SELECT COUNT(*) FROM inbox)
+    );
+$$ LANGUAGE sql STABLE;
+
+-- 全部标记为已读: 个人消息逐行更新，广播只推进水位
+CREATE OR REPLACE FUNCTION mark_inbox_read(p_user_id UUID)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE messages SET read = TRUE WHERE user_id = p_user_id AND read IS FALSE;
+
+    INSERT INTO broadcast_receipts (user_id, read_until)
+    SELECT id, NOW() FROM users WHERE id = p_user_id
+    ON CONFLICT (user_id) DO UPDATE SET read_until = GREATEST(broadcast_receipts.read_until, EXCLUDED.read_until);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 21. 后台仪表盘统计
+-- 一次调用在数据库内聚合全部指标，不再把所有用户余额拉到应用层求和
+-- "今日注册" 按 Asia/Jakarta (UTC+7) 自然日计算
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_pending_withdraw ON transactions(id)
+    WHERE type = 'withdraw' AND status = 'pending';
+-- 待审核计数使用 migrations/0001 的部分索引 idx_user_tasks_reviewing_submission (同时服务待审核队列的排序)
+
+CREATE OR REPLACE FUNCTION admin_dashboard_stats()
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'total_users', u.total_users,
+        'total_balance', u.total_balance,
+        'pending_withdrawals', (SELECT COUNT(*) FROM transactions WHERE type = 'withdraw' AND status = 'pending'),
+        'pending_tasks', (SELECT COUNT(*) FROM user_tasks WHERE status = 'reviewing'),
+        'today_registrations', (
+            SELECT COUNT(*) FROM users
+            WHERE created_at >= date_trunc('day', NOW() AT TIME ZONE 'Asia/Jakarta') AT TIME ZONE 'Asia/Jakarta'
+        )
+    )
+    FROM (SELECT COUNT(*) AS total_users, COALESCE(SUM(balance), 0) AS total_balance FROM users) u;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================
+-- 22. 每日统计汇总 (daily_metrics)
+-- 按 Asia/Jakarta (UTC+7) 自然日汇总，由语句级触发器增量维护，后台分析接口直接读取汇总行
+--   registrations    users.created_at
+--   tasks_claimed    user_tasks.start_time
+--   tasks_completed  user_tasks.submission_time (status = 'completed')
+--   withdraw_amount  transactions.created_at (type = 'withdraw' AND status = 'success')，取绝对值
+-- 首次上线或怀疑漂移时运行 rebuild_daily_metrics (python backfill_daily_metrics.py)
+-- ============================================
+CREATE TABLE IF NOT EXISTS daily_metrics (
+    day DATE PRIMARY KEY,
+    registrations INTEGER NOT NULL DEFAULT 0,
+    tasks_claimed INTEGER NOT NULL DEFAULT 0,
+    tasks_completed INTEGER NOT NULL DEFAULT 0,
+    withdraw_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION metrics_day(ts TIMESTAMPTZ)
+RETURNS DATE AS $$
+    SELECT (ts AT TIME ZONE 'Asia/Jakarta')::DATE;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 累加一组增量，deltas 中各列为 0 的行不会产生写入
+CREATE OR REPLACE FUNCTION apply_daily_metrics(p_deltas JSONB)
+RETURNS VOID AS $$
+    INSERT INTO daily_metrics AS dm (day, registrations, tasks_claimed, tasks_completed, withdraw_amount)
+    SELECT day, SUM(registrations), SUM(tasks_claimed), SUM(tasks_completed), SUM(withdraw_amount)
+    FROM jsonb_to_recordset(p_deltas)
+        AS d(day DATE, registrations INTEGER, tasks_claimed INTEGER, tasks_completed INTEGER, withdraw_amount DECIMAL)
+    WHERE day IS NOT NULL
+    GROUP BY day
+    HAVING SUM(registrations) <> 0 OR SUM(tasks_claimed) <> 0
+        OR SUM(tasks_completed) <> 0 OR SUM(withdraw_amount) <> 0
+    ON CONFLICT (day) DO UPDATE SET
+        registrations = dm.registrations + EXCLUDED.registrations,
+        tasks_claimed = dm.tasks_claimed + EXCLUDED.tasks_claimed,
+        tasks_completed = dm.tasks_completed + EXCLUDED.tasks_completed,
+        withdraw_amount = dm.withdraw_amount + EXCLUDED.withdraw_amount,
+        updated_at = NOW();
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION sync_daily_metrics_users()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_daily_metrics(COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('day', metrics_day(created_at), 'registrations', 1,
+                'tasks_claimed', 0, 'tasks_completed', 0, 'withdraw_amount', 0))
+            FROM new_rows), '[]'));
+    ELSE
+        PERFORM apply_daily_metrics(COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('day', metrics_day(created_at), 'registrations', -1,
+                'tasks_claimed', 0, 'tasks_completed', 0, 'withdraw_amount', 0))
+            FROM old_rows), '[]'));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- user_tasks 的贡献: 领取按 start_time，完成按 submission_time；旧行记负、新行记正
+CREATE OR REPLACE FUNCTION sync_daily_metrics_user_tasks()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_deltas JSONB := '[]';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_deltas := v_deltas || COALESCE((
+            SELECT jsonb_agg(x) FROM (
+                SELECT jsonb_build_object('day', metrics_day(start_time), 'registrations', 0,
+                    'tasks_claimed', 1, 'tasks_completed', 0, 'withdraw_amount', 0) AS x
+                FROM new_rows WHERE start_time IS NOT NULL
+                UNION ALL
+                SELECT jsonb_build_object('day', metrics_day(submission_time), 'registrations', 0,
+                    'tasks_claimed', 0, 'tasks_completed', 1, 'withdraw_amount', 0)
+                FROM new_rows WHERE status = 'completed' AND submission_time IS NOT NULL
+            ) s), '[]');
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_deltas := v_deltas || COALESCE((
+            SELECT jsonb_agg(x) FROM (
+                SELECT jsonb_build_object('day', metrics_day(start_time), 'registrations', 0,
+                    'tasks_claimed', -1, 'tasks_completed', 0, 'withdraw_amount', 0) AS x
+                FROM old_rows WHERE start_time IS NOT NULL
+                UNION ALL
+                SELECT jsonb_build_object('day', metrics_day(submission_time), 'registrations', 0,
+                    'tasks_claimed', 0, 'tasks_completed', -1, 'withdraw_amount', 0)
+                FROM old_rows WHERE status = 'completed' AND submission_time IS NOT NULL
+            ) s), '[]');
+    END IF;
+    PERFORM apply_daily_metrics(v_deltas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_daily_metrics_transactions()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_deltas JSONB := '[]';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_deltas := v_deltas || COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('day', metrics_day(created_at), 'registrations', 0,
+                'tasks_claimed', 0, 'tasks_completed', 0, 'withdraw_amount', ABS(amount)))
+            FROM new_rows WHERE type = 'withdraw' AND status = 'success'), '[]');
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_deltas := v_deltas || COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('day', metrics_day(created_at), 'registrations', 0,
+                'tasks_claimed', 0, 'tasks_completed', 0, 'withdraw_amount', -ABS(amount)))
+            FROM old_rows WHERE type = 'withdraw' AND status = 'success'), '[]');
+    END IF;
+    PERFORM apply_daily_metrics(v_deltas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_daily_metrics_ins ON users;
+CREATE TRIGGER users_daily_metrics_ins AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_users();
+DROP TRIGGER IF EXISTS users_daily_metrics_del ON users;
+CREATE TRIGGER users_daily_metrics_del AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_users();
+
+DROP TRIGGER IF EXISTS user_tasks_daily_metrics_ins ON user_tasks;
+CREATE TRIGGER user_tasks_daily_metrics_ins AFTER INSERT ON user_tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_user_tasks();
+DROP TRIGGER IF EXISTS user_tasks_daily_metrics_upd ON user_tasks;
+CREATE TRIGGER user_tasks_daily_metrics_upd AFTER UPDATE ON user_tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_user_tasks();
+DROP TRIGGER IF EXISTS user_tasks_daily_metrics_del ON user_tasks;
+CREATE TRIGGER user_tasks_daily_metrics_del AFTER DELETE ON user_tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_user_tasks();
+
+DROP TRIGGER IF EXISTS transactions_daily_metrics_ins ON transactions;
+CREATE TRIGGER transactions_daily_metrics_ins AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_transactions();
+DROP TRIGGER IF EXISTS transactions_daily_metrics_upd ON transactions;
+CREATE TRIGGER transactions_daily_metrics_upd AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_transactions();
+DROP TRIGGER IF EXISTS transactions_daily_metrics_del ON transactions;
+CREATE TRIGGER transactions_daily_metrics_del AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_daily_metrics_transactions();
+
+-- 按原始数据重算 [p_from, p_to] 范围内的汇总 (为空时不限)，返回写入的天数
+-- 用法: SELECT rebuild_daily_metrics();  或 python backfill_daily_metrics.py
+CREATE OR REPLACE FUNCTION rebuild_daily_metrics(p_from DATE DEFAULT NULL, p_to DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_from TIMESTAMPTZ := CASE WHEN p_from IS NULL THEN '-infinity'::TIMESTAMPTZ
+                               ELSE p_from::TIMESTAMP AT TIME ZONE 'Asia/Jakarta' END;
+    v_to TIMESTAMPTZ := CASE WHEN p_to IS NULL THEN 'infinity'::TIMESTAMPTZ
+                             ELSE (p_to + 1)::TIMESTAMP AT TIME ZONE 'Asia/Jakarta' END;
+    written INTEGER;
+BEGIN
+    DELETE FROM daily_metrics
+    WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+
+    INSERT INTO daily_metrics (day, registrations, tasks_claimed, tasks_completed, withdraw_amount)
+    SELECT day, SUM(registrations), SUM(tasks_claimed), SUM(tasks_completed), SUM(withdraw_amount)
+    FROM (
+        SELECT metrics_day(created_at) AS day, 1 AS registrations, 0 AS tasks_claimed,
+               0 AS tasks_completed, 0::DECIMAL AS withdraw_amount
+        FROM users WHERE created_at >= v_from AND created_at < v_to
+        UNION ALL
+        SELECT metrics_day(start_time), 0, 1, 0, 0
+        FROM user_tasks WHERE start_time >= v_from AND start_time < v_to
+        UNION ALL
+        SELECT metrics_day(submission_time), 0, 0, 1, 0
+        FROM user_tasks WHERE status = 'completed' AND submission_time >= v_from AND submission_time < v_to
+        UNION ALL
+        SELECT metrics_day(created_at), 0, 0, 0, ABS(amount)
+        FROM transactions WHERE type = 'withdraw' AND status = 'success' AND created_at >= v_from AND created_at < v_to
+    ) raw
+    GROUP BY day;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 23. 后台用户搜索索引
+-- pg_trgm GIN 索引支持 email / phone / referral_code 的 ILIKE '%x%' 子串搜索 (3 个字符以上)
+-- 压测: psql "$DATABASE_URL" -f bench_user_search.sql
+-- ============================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_phone_trgm ON users USING GIN (phone gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_referral_code_trgm ON users USING GIN (referral_code gin_trgm_ops);
+
+-- ============================================
+-- 24. 用户历史记录游标分页
+-- 交易 / 任务 / 消息列表按 (时间, id) 倒序游标翻页，复合索引让每一页都是一次索引定位 + 顺序读取，
+-- 与翻到第几页无关；总数只在客户端需要时 (默认第一页) 计算
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions(user_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_user_tasks_user_start_id ON user_tasks(user_id, start_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_user_date_id ON messages(user_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_broadcasts_date_id ON broadcasts(date DESC, id DESC);
+
+-- 复合索引以 user_id 开头，可替代原有的单列索引
+DROP INDEX IF EXISTS idx_transactions_user_id;
+DROP INDEX IF EXISTS idx_user_tasks_user_id;
+DROP INDEX IF EXISTS idx_messages_user_id;
+
+-- user_inbox 改为游标分页 (替换第 20 节的 OFFSET 版本)
+--   p_before_date / p_before_id  上一页最后一条的 (date, id)，为空时从最新开始
+--   p_offset                     未传游标时的偏移量 (兼容按页码翻页的旧客户端)
+--   p_with_total                 是否计算总数，为 FALSE 时 total 为 null
+-- 两路各自按索引取前 p_limit 条再合并，不展开该用户的全部消息
+DROP FUNCTION IF EXISTS user_inbox(UUID, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION user_inbox(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0,
+    p_before_date TIMESTAMPTZ DEFAULT NULL,
+    p_before_id UUID DEFAULT NULL,
+    p_with_total BOOLEAN DEFAULT TRUE
+)
+RETURNS JSONB AS $$
+    WITH personal AS (
+        SELECT m.id, m.user_id, m.title, m.content, m.reward_amount, m.read, m.date, FALSE AS is_broadcast
+        FROM messages m
+        WHERE m.user_id = p_user_id
+          AND (p_before_date IS NULL OR (m.date, m.id) < (p_before_date, p_before_id))
+        ORDER BY m.date DESC, m.id DESC
+        LIMIT p_limit + p_offset
+    ),
+    broadcast AS (
+        SELECT b.id, u.id AS user_id, b.title, b.content, b.reward_amount,
+               b.date <= COALESCE(r.read_until, '-infinity') AS read, b.date, TRUE AS is_broadcast
+        FROM users u
+        JOIN broadcasts b ON b.date >= u.created_at
+        LEFT JOIN broadcast_receipts r ON r.user_id = u.id
+        WHERE u.id = p_user_id
+          AND (p_before_date IS NULL OR (b.date, b.id) < (p_before_date, p_before_id))
+        ORDER BY b.date DESC, b.id DESC
+        LIMIT p_limit + p_offset
+    )
+    SELECT jsonb_build_object(
+        'messages', COALESCE((
+            SELECT jsonb_agg(to_jsonb(page) ORDER BY page.date DESC, page.id DESC)
+            FROM (
+                SELECT * FROM (SELECT * FROM personal UNION ALL SELECT * FROM broadcast) merged
+                ORDER BY date DESC, id DESC
+                LIMIT p_limit OFFSET p_offset
+            ) page
+        ), '[]'::JSONB),
+        'total', CASE WHEN p_with_total THEN
+            (SELECT COUNT(*) FROM messages WHERE user_id = p_user_id)
+            + (SELECT COUNT(*) FROM users u JOIN broadcasts b ON b.date >= u.created_at WHERE u.id = p_user_id)
+        END
+    );
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,186 @@
+"""
+HTTP 缓存
+预序列化的响应表示 + ETag / If-None-Match 条件请求
+轮询接口命中缓存且内容未变时直接返回 304，不再重建和序列化响应体
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from functools import cached_property, lru_cache
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from cache import TTLCache
+from config import get_settings
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: Any) -> TypeAdapter:
+    """按响应模型缓存 TypeAdapter (构造开销较大)"""
+    return TypeAdapter(model)
+
+
+class Representation:
+    """
+    一个响应的数据及其序列化结果
+    body 与 etag 首次访问时计算一次，之后随缓存条目复用
+    model 与路由的 response_model 一致，保证输出字段与 FastAPI 默认序列化相同
+    给出 version (数据的版本标识) 时 ETag 由它得出，返回 304 不需要序列化响应体
+    """
+
+    def __init__(self, data: Any, model: Any = None, version: Optional[str] = None):
+        self.data = data
+        self.model = model
+        self.version = version
+
+    @cached_property
+    def body(self) -> bytes:
+        if self.model is None:
+            return json.dumps(jsonable_encoder(self.data), ensure_ascii=False, separators=(",", ":")).encode()
+        adapter = _adapter(self.model)
+        return adapter.dump_json(adapter.validate_python(self.data), by_alias=True)
+
+    @cached_property
+    def etag(self) -> str:
+        if self.version is not None:
+            return version_etag(self.version)
+        # 内容哈希：不同 worker 对相同内容给出相同 ETag
+        return f'"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+
+    @cached_property
+    def gzip_body(self) -> bytes:
+        return gzip.compress(self.body, compresslevel=6)
+
+    def prepare(self) -> "Representation":
+        """预先完成序列化和压缩，避免首个请求承担这部分开销"""
+        self.body, self.etag, self.gzip_body
+        return self
+
+
+def version_etag(version: str) -> str:
+    """由版本标识得出 ETag (与 Representation(version=...) 的 ETag 相同)"""
+    return f'"v-{hashlib.blake2b(version.encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """判断请求的 If-None-Match 是否与当前 ETag 匹配 (弱比较)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+# 小于该大小的响应体不压缩
+GZIP_MIN_SIZE = 1024
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _validator_headers(etag: str) -> dict:
+    # no-cache: 允许浏览器缓存，但每次使用前都要带 If-None-Match 重新验证
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+
+def not_modified(etag: str) -> Response:
+    """304 响应 (调用方已确认 If-None-Match 匹配)"""
+    return Response(status_code=304, headers=_validator_headers(etag))
+
+
+def conditional_response(request: Request, rep: Representation) -> Response:
+    """根据 If-None-Match 返回 304 或完整响应 (客户端支持时返回 gzip 压缩体)"""
+    headers = _validator_headers(rep.etag)
+    if etag_matches(request, rep.etag):
+        return not_modified(rep.etag)
+    if len(rep.body) >= GZIP_MIN_SIZE and accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=rep.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=rep.body, media_type="application/json", headers=headers)
+
+
+class Snapshot:
+    """
+    物化快照: 预序列化、预压缩的响应，读取时只是内存访问
+    由对应数据的写操作调用 rebuild 主动重建；
+    max_age 是兜底刷新周期 (多 worker 部署时其它 worker 的写操作无法通知本进程)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        build: Callable[[Any], Awaitable[Any]],
+        model: Any = None,
+        max_age: float = 60.0,
+    ):
+        self.name = name
+        self.build = build
+        self.model = model
+        self.max_age = max_age
+        self._rep: Optional[Representation] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    def _fresh(self) -> bool:
+        return self._rep is not None and time.monotonic() - self._built_at < self.max_age
+
+    async def _rebuild_locked(self, db: Any) -> Representation:
+        rep = Representation(await self.build(db), self.model).prepare()
+        self._rep = rep
+        self._built_at = time.monotonic()
+        self.rebuilds += 1
+        return rep
+
+    async def rebuild(self, db: Any) -> Representation:
+        """重新查询并生成快照"""
+        async with self._lock:
+            return await self._rebuild_locked(db)
+
+    def invalidate(self) -> None:
+        """标记快照过期 (不阻塞)，下一次 get 时重建"""
+        self._built_at = float("-inf")
+
+    async def get(self, db: Any) -> Representation:
+        """读取快照，不存在或超过 max_age 时重建 (并发请求只重建一次)"""
+        if self._fresh():
+            return self._rep
+
+        async with self._lock:
+            if self._fresh():
+                # 等锁期间其它请求已完成重建
+                return self._rep
+            return await self._rebuild_locked(db)
+
+
+# 目录类接口 (任务列表) 的响应缓存
+# 管理端修改对应数据时调用 invalidate_catalog 使其失效
+catalog_cache = TTLCache("catalog", maxsize=32, ttl=get_settings().catalog_cache_ttl)
+
+
+async def cached_representation(
+    key: str,
+    build: Callable[[], Awaitable[Any]],
+    model: Any = None,
+) -> Representation:
+    """读取目录缓存，未命中时调用 build 构建并写入缓存"""
+    rep: Optional[Representation] = catalog_cache.get(key)
+    if rep is None:
+        rep = Representation(await build(), model)
+        catalog_cache.set(key, rep)
+    return rep
+
+
+def invalidate_catalog(*keys: str) -> None:
+    """使指定的目录缓存失效"""
+    for key in keys:
+        catalog_cache.invalidate(key)
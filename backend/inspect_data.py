@@ -1,9 +1,9 @@
 
 import json
-from database import get_db
+from database import get_supabase_client
 
 def inspect_and_seed():
-    db = get_db()
+    db = get_supabase_client()
     
     # 1. Check system_config
     print("\n--- Inspecting system_config ---")
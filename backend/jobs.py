@@ -0,0 +1,165 @@
+"""
+后台任务引擎
+长耗时的管理操作写入 jobs 表后立即返回任务 ID，分批执行；
+每批是一个数据库函数调用 (单事务处理一批并推进游标)，进度全部保存在 jobs 行里。
+
+进程内协程只是加速手段，不是进度的前提: serverless 部署 (Vercel) 中提交任务的请求返回后
+实例可能被冻结或回收，startup 钩子也不保证执行。因此:
+- 进度查询接口 (GET /api/admin/jobs/{id}) 发现任务停滞时由 advance 在请求内推进一批；
+- run_jobs.py 可由定时任务 (cron) 运行，把所有未完成的任务执行到结束。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from config import get_settings
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+
+# 任务类型 -> 执行一批的数据库函数 (参数 p_job_id, p_chunk_size，返回 jobs 行)
+CHUNK_FUNCTIONS = {
+    "broadcast": "run_broadcast_chunk",
+}
+
+# 单批失败后的重试次数与间隔 (秒)，超过后任务标记为 failed
+MAX_CHUNK_RETRIES = 5
+RETRY_DELAY = 2.0
+
+# 任务行超过这么久 (秒) 没有更新，视为没有协程在执行，由进度查询推进
+STALL_AFTER = 10.0
+
+
+def job_to_response(job: dict) -> dict:
+    """jobs 行 -> 进度查询接口的响应"""
+    total = job.get("total")
+    processed = job.get("processed") or 0
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "processed": processed,
+        "total": total,
+        "progress": round(processed / total, 4) if total else (1.0 if job["status"] == "completed" else 0.0),
+        "error": job.get("error"),
+        "createdAt": job.get("created_at"),
+        "finishedAt": job.get("finished_at"),
+    }
+
+
+class JobRunner:
+    """
+    任务执行器
+    同一任务在本进程内只运行一个协程；多 worker、进度查询、cron 同时推进同一任务时由数据库行锁串行化
+    """
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self._tasks: dict[str, asyncio.Task] = {}
+        # 任务类型 -> 每批完成后的回调 (如清理缓存)
+        self._on_chunk: dict[str, Callable[[dict], None]] = {}
+
+    def on_chunk(self, kind: str, callback: Callable[[dict], None]) -> None:
+        """注册每批完成后的回调"""
+        self._on_chunk[kind] = callback
+
+    async def submit(self, db: Any, kind: str, payload: dict) -> dict:
+        """创建任务并开始执行，返回 jobs 行"""
+        if kind not in CHUNK_FUNCTIONS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        result = await db.table("jobs").insert({"kind": kind, "payload": payload}).execute()
+        job = result.data[0]
+        self._spawn(job)
+        return job
+
+    async def get(self, db: Any, job_id: str) -> Optional[dict]:
+        result = await db.table("jobs").select("*").eq("id", job_id).execute()
+        return result.data[0] if result.data else None
+
+    async def advance(self, db: Any, job: dict) -> dict:
+        """
+        在当前请求内推进一个停滞的任务一批 (进度查询时调用)，返回最新的 jobs 行
+        本进程有协程在执行或任务行最近有更新时不做任何事；失败只记录日志，由下一次查询重试
+        """
+        if job["status"] not in ("pending", "running") or not self._stalled(job):
+            return job
+        try:
+            return await self._run_chunk(db, job) or job
+        except Exception as e:
+            logger.warning(f"Job {job['id']} chunk failed during poll: {e}")
+            return job
+
+    def _stalled(self, job: dict) -> bool:
+        task = self._tasks.get(job["id"])
+        if task is not None and not task.done():
+            return False
+        updated_at = job.get("updated_at") or job.get("created_at")
+        if not updated_at:
+            return True
+        updated = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+        return (datetime.now(timezone.utc) - updated).total_seconds() >= STALL_AFTER
+
+    async def resume(self) -> int:
+        """继续执行所有未完成的任务 (应用启动时或 run_jobs.py 调用)，返回恢复的任务数"""
+        db = await get_db()
+        result = await db.table("jobs").select("*").in_("status", ["pending", "running"]).execute()
+        for job in result.data or []:
+            self._spawn(job)
+        if result.data:
+            logger.info(f"Resumed {len(result.data)} background job(s)")
+        return len(result.data or [])
+
+    def _spawn(self, job: dict) -> None:
+        job_id = job["id"]
+        if job_id in self._tasks and not self._tasks[job_id].done():
+            return
+        self._tasks[job_id] = asyncio.create_task(self._run(job))
+
+    async def drain(self) -> None:
+        """等待本进程内所有任务协程结束"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    async def _run_chunk(self, db: Any, job: dict) -> Optional[dict]:
+        """执行一批并触发回调，返回最新的 jobs 行 (任务行已被删除时为 None)"""
+        function = CHUNK_FUNCTIONS[job["kind"]]
+        result = await db.rpc(function, {"p_job_id": job["id"], "p_chunk_size": self.chunk_size}).execute()
+        job = result.data
+        if job and job["kind"] in self._on_chunk:
+            self._on_chunk[job["kind"]](job)
+        return job
+
+    async def _run(self, job: dict) -> None:
+        job_id, kind = job["id"], job["kind"]
+        failures = 0
+        try:
+            db = await get_db()
+            while job["status"] in ("pending", "running"):
+                try:
+                    job = await self._run_chunk(db, job)
+                except Exception as e:
+                    failures += 1
+                    logger.warning(f"Job {job_id} chunk failed ({failures}/{MAX_CHUNK_RETRIES}): {e}")
+                    if failures >= MAX_CHUNK_RETRIES:
+                        await db.table("jobs").update({"status": "failed", "error": str(e)}).eq("id", job_id).execute()
+                        return
+                    await asyncio.sleep(RETRY_DELAY * failures)
+                    continue
+
+                failures = 0
+                if not job:
+                    # 任务行已被删除
+                    return
+
+            logger.info(f"Job {job_id} ({kind}) finished: {job['status']}, {job.get('processed')} processed")
+        except Exception as e:
+            # 任务保持 pending/running，由进度查询、cron 或下次启动继续
+            logger.error(f"Job {job_id} stopped: {e}")
+        finally:
+            self._tasks.pop(job_id, None)
+
+
+job_runner = JobRunner(chunk_size=get_settings().job_chunk_size)
@@ -0,0 +1,99 @@
+"""
+点赞数写缓冲
+点赞接口只记录 user_likes 关系行，platforms.likes 的增量先累积在内存中，
+由后台任务定期 (或积累到一定数量时) 通过 apply_like_increments 一次性写回
+缓冲依赖长期运行的进程 (startup 钩子启动定期写回)；未启动时 (如 serverless 部署不执行 startup 钩子，
+实例随时可能被冻结或回收) 每次点赞直接写入，不经过缓冲
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional
+
+from config import get_settings
+from http_cache import invalidate_catalog
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """
+    点赞增量缓冲
+    只在事件循环线程中使用；flush 失败时增量放回缓冲，下次重试
+    进程异常退出会丢失未写回的增量，可用 refresh_platform_likes 按关系表重算 (python repair_counters.py)
+    """
+
+    def __init__(self, interval: float, max_pending: int):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Counter = Counter()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._get_db: Optional[Callable[[], Awaitable[Any]]] = None
+        self.flushes = 0
+
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    def add(self, platform_id: str, delta: int = 1) -> None:
+        """记录一次点赞增量，积累过多时提前写回"""
+        self._pending[platform_id] += delta
+        if self._get_db is not None and self.pending() >= self.max_pending and not self._lock.locked():
+            asyncio.create_task(self._flush_now())
+
+    async def record(self, db: Any, platform_id: str, delta: int = 1) -> None:
+        """记录一次点赞: 定期写回已启动时进入缓冲，否则立即写入数据库"""
+        if self._task is None:
+            await db.rpc("apply_like_increments", {
+                "p_items": [{"platform_id": platform_id, "delta": delta}],
+            }).execute()
+            invalidate_catalog("tasks")
+            return
+        self.add(platform_id, delta)
+
+    async def flush(self, db: Any) -> int:
+        """把当前缓冲的增量一次性写回数据库，返回写回的点赞数"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, Counter()
+            items = [{"platform_id": pid, "delta": delta} for pid, delta in batch.items()]
+            try:
+                await db.rpc("apply_like_increments", {"p_items": items}).execute()
+            except Exception:
+                # 放回缓冲，与期间新产生的增量合并
+                self._pending.update(batch)
+                raise
+            self.flushes += 1
+            invalidate_catalog("tasks")
+            return sum(batch.values())
+
+    async def _flush_now(self) -> None:
+        try:
+            await self.flush(await self._get_db())
+        except Exception as e:
+            logger.error(f"Like flush failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._flush_now()
+
+    def start(self, get_db: Callable[[], Awaitable[Any]]) -> None:
+        """启动定期写回 (应用启动时调用)"""
+        self._get_db = get_db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止定期写回并写回剩余增量 (应用关闭时调用)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._get_db is not None:
+            await self._flush_now()
+
+
+_settings = get_settings()
+like_buffer = LikeBuffer(interval=_settings.like_flush_interval, max_pending=_settings.like_flush_max_pending)
@@ -19,6 +19,10 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
+from database import get_db
+from like_buffer import like_buffer
+from jobs import job_runner
+from uploads import close_uploader
 from routers import auth, users, tasks, config, admin, activities
 
 
@@ -65,6 +69,20 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+# multipart 表单字段和边界的余量
+UPLOAD_OVERHEAD = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Content-Length 已超过上传上限时在读取请求体之前直接拒绝 (路由内仍会按实际字节数检查)"""
+    if request.method == "POST" and request.url.path.endswith("/tasks/upload"):
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > settings.upload_max_bytes + UPLOAD_OVERHEAD:
+            return JSONResponse(status_code=413, content={"detail": "File too large"})
+    return await call_next(request)
+
+
 # 注册路由
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
@@ -74,6 +92,23 @@ app.include_router(activities.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    """启动点赞数定期写回，继续执行未完成的后台任务"""
+    like_buffer.start(get_db)
+    try:
+        await job_runner.resume()
+    except Exception as e:
+        logger.error(f"Failed to resume background jobs: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """写回剩余的点赞增量，关闭上传连接池"""
+    await like_buffer.stop()
+    await close_uploader()
+
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,76 @@
+"""
+内联图片外置
+平台 logo / 活动图片若是 data:image/...;base64 内联数据，按内容哈希上传到 Storage 并改写为公开 URL，
+避免大段 base64 随每次 /api/tasks、/api/initial-data、/api/activities 响应传输并被复制进 user_tasks
+相同内容只存一份 (路径即 sha256)，重复上传是幂等的
+"""
+
+import base64
+import binascii
+import hashlib
+import re
+from typing import Any, Optional
+
+from config import get_settings
+
+
+DATA_URL = re.compile(r"^data:(image/[\w.+-]+);base64,(.*)$", re.S)
+
+EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/x-icon": "ico",
+    "image/vnd.microsoft.icon": "ico",
+}
+
+# 内容寻址的文件永不变化，可长期缓存
+CACHE_CONTROL = str(365 * 24 * 3600)
+
+
+def is_data_url(value: Optional[str]) -> bool:
+    return bool(value) and value.startswith("data:image")
+
+
+def decode_data_url(value: str) -> tuple[str, bytes]:
+    """data URL -> (MIME 类型, 文件内容)；格式不正确时抛出 ValueError"""
+    match = DATA_URL.match(value)
+    if not match:
+        raise ValueError("Unsupported data URL (expected data:image/...;base64,...)")
+    mime = match.group(1).lower()
+    try:
+        content = base64.b64decode(match.group(2).strip(), validate=True)
+    except binascii.Error:
+        raise ValueError("Invalid base64 image data")
+    if not content:
+        raise ValueError("Empty image data")
+    return mime, content
+
+
+def storage_path(folder: str, mime: str, content: bytes) -> str:
+    """内容寻址路径，如 platforms/3f2a...e1.png"""
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{folder}/{digest}.{EXTENSIONS.get(mime, 'bin')}"
+
+
+async def offload_image(db: Any, value: Optional[str], folder: str) -> Optional[str]:
+    """
+    如果 value 是内联 base64 图片，上传到 Storage 并返回公开 URL；否则原样返回
+    格式不正确的 data URL 抛出 ValueError
+    """
+    if not is_data_url(value):
+        return value
+
+    mime, content = decode_data_url(value)
+    path = storage_path(folder, mime, content)
+    bucket = db.storage.from_(get_settings().media_bucket)
+    await bucket.upload(path, content, {
+        "content-type": mime,
+        "cache-control": CACHE_CONTROL,
+        # 同一内容已存在时覆盖为相同字节，保证幂等
+        "upsert": "true",
+    })
+    return await bucket.get_public_url(path)
@@ -0,0 +1,182 @@
+"""
+数据库迁移
+
+按版本号顺序执行 migrations/ 下的 NNNN_名称.sql，已执行的版本 (及文件校验和) 记录在 schema_migrations 表中，
+每个版本只执行一次。database_schema.sql 仍是建库基线，之后的增量变更 (如大表上的索引) 写成迁移文件。
+
+迁移文件默认在单个事务中执行；文件中包含 "-- migrate: no-transaction" 时逐条语句自动提交执行
+(用于 CREATE INDEX CONCURRENTLY 等不能放在事务中的语句，这类文件的每条语句以分号结尾且不能包含 $$ 函数体)。
+多个进程同时运行时由 advisory lock 串行化。
+
+需要配置 DATABASE_URL (Postgres 直连串，Supabase: Project Settings -> Database -> Connection string)。
+
+使用方法:
+    cd backend
+    python migrate.py              # 执行所有未执行的迁移
+    python migrate.py --status     # 查看各版本状态
+    python migrate.py --dry-run    # 只列出将要执行的迁移
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import psycopg
+
+from config import get_settings
+
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+_FILENAME = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+_NO_TRANSACTION = "-- migrate: no-transaction"
+# advisory lock 键 (任意常量，只要各进程一致)
+_LOCK_KEY = 20250801
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return _NO_TRANSACTION not in self.sql
+
+
+def load_migrations() -> list[Migration]:
+    """读取迁移目录，按版本号排序；文件名不合规或版本号重复时报错"""
+    migrations = {}
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise ValueError(f"Invalid migration filename: {path.name} (expected NNNN_name.sql)")
+        version, name = match.groups()
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {path.name}")
+        migrations[version] = Migration(version, name, path)
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def split_statements(sql: str) -> list[str]:
+    """把 no-transaction 迁移拆成单条语句 (去掉注释行，按行尾分号切分)"""
+    if "$$" in sql:
+        raise ValueError("no-transaction migrations cannot contain $$ bodies")
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+def ensure_table(conn: psycopg.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def applied_versions(conn: psycopg.Connection) -> dict[str, str]:
+    """已执行的版本 -> 执行时的校验和"""
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+
+_CREATE_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+
+
+def created_indexes(sql: str) -> list[str]:
+    """迁移中 CREATE INDEX CONCURRENTLY 的索引名"""
+    return _CREATE_INDEX.findall(sql)
+
+
+def invalid_indexes(conn: psycopg.Connection, names: list[str]) -> list[str]:
+    """
+    names 中处于无效状态的索引
+    CONCURRENTLY 建索引中途失败会留下无效索引 (IF NOT EXISTS 会跳过它)，需要先删除再重跑；
+    只检查本次迁移建立的索引，不受其它 (如他人正在并发创建的) 索引影响
+    """
+    if not names:
+        return []
+    rows = conn.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+    """, (names,)).fetchall()
+    return [r[0] for r in rows]
+
+
+def apply(conn: psycopg.Connection, migration: Migration) -> None:
+    record = "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)"
+    params = (migration.version, migration.name, migration.checksum)
+    if migration.transactional:
+        with conn.transaction():
+            conn.execute(migration.sql)
+            conn.execute(record, params)
+        return
+
+    for statement in split_statements(migration.sql):
+        conn.execute(statement)
+    invalid = invalid_indexes(conn, created_indexes(migration.sql))
+    if invalid:
+        raise RuntimeError(f"Invalid indexes left behind: {', '.join(invalid)} (DROP INDEX them and re-run)")
+    conn.execute(record, params)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument("--status", action="store_true", help="查看各版本状态")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要执行的迁移")
+    args = parser.parse_args()
+
+    database_url = get_settings().database_url
+    if not database_url:
+        print("DATABASE_URL is not configured")
+        return 1
+
+    migrations = load_migrations()
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (_LOCK_KEY,))
+        ensure_table(conn)
+        applied = applied_versions(conn)
+
+        for m in migrations:
+            if m.version in applied and applied[m.version] != m.checksum:
+                print(f"WARNING: {m.path.name} changed after it was applied")
+
+        pending = [m for m in migrations if m.version not in applied]
+        if args.status:
+            for m in migrations:
+                print(f"{m.version}  {m.name:<40} {'applied' if m.version in applied else 'pending'}")
+            return 0
+        if not pending:
+            print("Database is up to date")
+            return 0
+
+        for m in pending:
+            if args.dry_run:
+                print(f"would apply {m.path.name}")
+                continue
+            print(f"applying {m.path.name} ...", flush=True)
+            try:
+                apply(conn, m)
+            except Exception as e:
+                print(f"FAILED {m.path.name}: {e}")
+                return 1
+        if not args.dry_run:
+            print(f"Applied {len(pending)} migration(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
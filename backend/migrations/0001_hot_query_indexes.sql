@@ -0,0 +1,43 @@
+-- ============================================
+-- 0001 热点查询的复合 / 部分索引
+-- 对照后台列表、分析接口和消息计数的实际查询形状建立索引，检查脚本: python check_query_plans.py
+-- migrate: no-transaction (CONCURRENTLY 建索引不锁写，不能在事务中执行)
+-- ============================================
+
+-- 提现: 分析接口 type='withdraw' AND status='success' AND created_at >= ?，
+-- 以及按状态筛选后按时间排序
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_type_status_created
+    ON transactions (type, status, created_at DESC);
+
+-- 提现记录列表: type='withdraw' ORDER BY created_at DESC (不限状态)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_withdraw_created
+    ON transactions (created_at DESC) WHERE type = 'withdraw';
+
+-- 分析接口 status='completed' AND submission_time >= ?
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_tasks_status_submission
+    ON user_tasks (status, submission_time DESC);
+
+-- 待审核队列: status='reviewing' ORDER BY submission_time DESC，同时服务仪表盘的待审核计数；
+-- 取代 database_schema.sql 第 21 节早先建立的同条件部分索引 idx_user_tasks_reviewing
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_tasks_reviewing_submission
+    ON user_tasks (submission_time DESC) WHERE status = 'reviewing';
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_tasks_reviewing;
+
+-- 已审核列表: status IN ('completed', 'rejected') ORDER BY updated_at DESC
+-- (status 作前导列时 IN 列表无法直接给出有序结果，用部分索引避免全量排序)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_tasks_audited_updated
+    ON user_tasks (updated_at DESC) WHERE status IN ('completed', 'rejected');
+
+-- 分析接口 start_time >= ?
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_tasks_start_time
+    ON user_tasks (start_time);
+
+-- 未读消息计数与全部已读: user_id = ? AND read IS FALSE
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_user_unread
+    ON messages (user_id) WHERE read IS FALSE;
+
+-- 后台消息动态: ORDER BY date DESC, id DESC (与 broadcasts 的 idx_broadcasts_date_id 合并排序)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_date_id
+    ON messages (date DESC, id DESC);
+
+-- 后台用户列表 / 今日注册使用 database_schema.sql 第 21 节的 idx_users_created_at，这里不重复定义
@@ -0,0 +1,8 @@
+-- ============================================
+-- 0002 内联图片外置用的 public Storage bucket
+-- 名称需与配置 MEDIA_BUCKET (默认 media) 一致；文件按内容哈希命名，只增不改
+-- 历史数据外置: python offload_inline_images.py
+-- ============================================
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('media', 'media', TRUE)
+ON CONFLICT (id) DO UPDATE SET public = TRUE;
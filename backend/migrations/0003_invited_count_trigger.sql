@@ -0,0 +1,66 @@
+-- ============================================
+-- 0003 推荐人邀请计数 (触发器维护)
+-- 注册时不再由接口读取 invited_count 再写回 (并发注册会丢失计数)，
+-- 改为 users 插入/删除时按 referrer_id 原子累加，与第 12 节的计数列同一做法。
+-- referrer_id 只在注册时写入，之后不会修改，因此不在 users 的 UPDATE 上挂触发器
+-- (users 余额更新频繁，避免每次更新都多一次过渡表扫描)
+-- ============================================
+
+CREATE OR REPLACE FUNCTION sync_user_invited_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users u SET invited_count = COALESCE(u.invited_count, 0) + d.delta
+        FROM (SELECT referrer_id, COUNT(*) AS delta FROM new_rows WHERE referrer_id IS NOT NULL GROUP BY referrer_id) d
+        WHERE u.id = d.referrer_id;
+    ELSE
+        UPDATE users u SET invited_count = GREATEST(COALESCE(u.invited_count, 0) - d.delta, 0)
+        FROM (SELECT referrer_id, COUNT(*) AS delta FROM old_rows WHERE referrer_id IS NOT NULL GROUP BY referrer_id) d
+        WHERE u.id = d.referrer_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_invited_count_ins ON users;
+CREATE TRIGGER users_invited_count_ins AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_invited_count();
+DROP TRIGGER IF EXISTS users_invited_count_del ON users;
+CREATE TRIGGER users_invited_count_del AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_invited_count();
+
+-- refresh_user_counters 同时修复 invited_count (python repair_counters.py)
+CREATE OR REPLACE FUNCTION refresh_user_counters(p_user_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    fixed INTEGER;
+BEGIN
+    WITH actual AS (
+        SELECT
+            u.id,
+            (SELECT COUNT(*) FROM messages m WHERE m.user_id = u.id AND m.read IS FALSE) AS unread_msg_count,
+            (SELECT COUNT(*) FROM transactions t WHERE t.user_id = u.id) AS tx_count,
+            (SELECT COUNT(*) FROM user_tasks ut WHERE ut.user_id = u.id AND ut.status = 'ongoing') AS ongoing_task_count,
+            (SELECT COUNT(*) FROM users r WHERE r.referrer_id = u.id) AS invited_count
+        FROM users u
+        WHERE p_user_id IS NULL OR u.id = p_user_id
+    )
+    UPDATE users u SET
+        unread_msg_count = a.unread_msg_count,
+        tx_count = a.tx_count,
+        ongoing_task_count = a.ongoing_task_count,
+        invited_count = a.invited_count
+    FROM actual a
+    WHERE u.id = a.id
+      AND (u.unread_msg_count, u.tx_count, u.ongoing_task_count, u.invited_count)
+          IS DISTINCT FROM (a.unread_msg_count, a.tx_count, a.ongoing_task_count, a.invited_count);
+
+    GET DIAGNOSTICS fixed = ROW_COUNT;
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 修正此前并发注册丢失的计数
+SELECT refresh_user_counters();
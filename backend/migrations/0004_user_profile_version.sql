@@ -0,0 +1,59 @@
+-- ============================================
+-- 0004 用户资料版本号 (GET /api/users/{id} 的 ETag)
+-- profile_version 在用户资料的任何组成部分变化时递增:
+-- users 行本身 (包括第 12 节触发器维护的计数列)、bank_accounts、user_likes。
+-- 未读广播数是读时计算的，不进版本号，由接口与版本号一起组成 ETag。
+-- 接口先只查版本号，与 If-None-Match 一致时直接返回 304，不再查询和序列化完整资料
+-- ============================================
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_profile_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.profile_version = OLD.profile_version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_profile_version ON users;
+CREATE TRIGGER users_profile_version
+    BEFORE UPDATE ON users
+    FOR EACH ROW EXECUTE FUNCTION bump_profile_version();
+
+-- 子表变化时更新所属用户行 (由上面的触发器递增版本号)，每条语句每个用户一次
+CREATE OR REPLACE FUNCTION touch_user_profile()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE users u SET profile_version = u.profile_version
+        WHERE u.id IN (SELECT DISTINCT user_id FROM old_rows);
+    ELSE
+        UPDATE users u SET profile_version = u.profile_version
+        WHERE u.id IN (SELECT DISTINCT user_id FROM new_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bank_accounts_profile_ins ON bank_accounts;
+CREATE TRIGGER bank_accounts_profile_ins AFTER INSERT ON bank_accounts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_user_profile();
+DROP TRIGGER IF EXISTS bank_accounts_profile_upd ON bank_accounts;
+CREATE TRIGGER bank_accounts_profile_upd AFTER UPDATE ON bank_accounts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_user_profile();
+DROP TRIGGER IF EXISTS bank_accounts_profile_del ON bank_accounts;
+CREATE TRIGGER bank_accounts_profile_del AFTER DELETE ON bank_accounts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_user_profile();
+
+DROP TRIGGER IF EXISTS user_likes_profile_ins ON user_likes;
+CREATE TRIGGER user_likes_profile_ins AFTER INSERT ON user_likes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_user_profile();
+DROP TRIGGER IF EXISTS user_likes_profile_del ON user_likes;
+CREATE TRIGGER user_likes_profile_del AFTER DELETE ON user_likes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_user_profile();
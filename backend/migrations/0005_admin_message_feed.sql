@@ -0,0 +1,16 @@
+-- ============================================
+-- 0005 后台消息动态: 个人消息 + 全员广播
+-- 全员消息只写 broadcasts 一行 (见 database_schema.sql 第 20 节)，后台 Messages History
+-- 读取这个视图，与个人消息一起按时间倒序分页和计数。
+-- 广播没有逐条的已读记录 (每个用户只有一个 read_until 水位)，因此广播行的 read 为 NULL
+-- ============================================
+
+CREATE OR REPLACE VIEW admin_message_feed AS
+SELECT m.id, m.user_id, u.phone AS user_phone, m.title, m.content, m.reward_amount,
+       m.read, m.date, FALSE AS is_broadcast
+FROM messages m
+JOIN users u ON u.id = m.user_id
+UNION ALL
+SELECT b.id, NULL::UUID, NULL::VARCHAR, b.title, b.content, b.reward_amount,
+       NULL::BOOLEAN, b.date, TRUE
+FROM broadcasts b;
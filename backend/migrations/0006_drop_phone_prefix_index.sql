@@ -0,0 +1,7 @@
+-- ============================================
+-- 0006 删除手机号前缀索引
+-- 后台用户搜索不再单独走手机号前缀查询 (会漏掉 email / 推荐码中含相同数字的用户)，
+-- 手机号样式的输入与其它输入一样使用 pg_trgm 子串匹配，idx_users_phone_prefix 已无查询使用
+-- migrate: no-transaction
+-- ============================================
+DROP INDEX CONCURRENTLY IF EXISTS idx_users_phone_prefix;
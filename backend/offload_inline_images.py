@@ -0,0 +1,94 @@
+"""
+外置历史数据中的内联 base64 图片
+
+platforms.logo_url、activities.image_url 以及领取任务时复制过去的 user_tasks.logo_url
+中若是 data:image/...;base64 内联数据，按内容哈希上传到 Storage (media_bucket) 并把这些行改写为公开 URL。
+相同内容只上传一次；可重复运行，已是 URL 的行不会再处理。
+格式不正确的 data URL 会被跳过并列出。
+运行后应用内的目录缓存和初始数据快照会在各自的 TTL 内自动刷新。
+
+需要先创建 public bucket (migrations/0002_media_bucket.sql，python migrate.py)。
+
+使用方法:
+    cd backend
+    python offload_inline_images.py             # 外置并改写
+    python offload_inline_images.py --dry-run   # 只统计内联图片的行数和大小
+"""
+
+import argparse
+import asyncio
+import hashlib
+import sys
+from collections import defaultdict
+
+from database import get_async_supabase_client
+from media import offload_image
+
+# (表, 列, Storage 目录)；user_tasks 中的 logo 来自 platforms，放在同一目录以便按内容去重
+TARGETS = [
+    ("platforms", "logo_url", "platforms"),
+    ("activities", "image_url", "activities"),
+    ("user_tasks", "logo_url", "platforms"),
+]
+
+# 每批读取的行数 (内联图片单行可能有数百 KB)
+BATCH_SIZE = 100
+
+
+async def offload_table(db, table: str, column: str, folder: str, dry_run: bool, uploaded: dict) -> dict:
+    """按 id 顺序分批处理一张表，返回统计"""
+    stats = {"rows": 0, "bytes": 0, "rewritten": 0, "invalid": []}
+    last_id = None
+    while True:
+        query = db.table(table).select(f"id, {column}").like(column, "data:image%").order("id").limit(BATCH_SIZE)
+        if last_id:
+            query = query.gt("id", last_id)
+        rows = (await query.execute()).data or []
+        if not rows:
+            return stats
+        last_id = rows[-1]["id"]
+
+        # 新 URL -> 行 id，同一图片的行一次更新
+        targets = defaultdict(list)
+        for row in rows:
+            value = row[column]
+            stats["rows"] += 1
+            stats["bytes"] += len(value)
+            if dry_run:
+                continue
+            key = (folder, hashlib.sha256(value.encode()).digest())
+            if key not in uploaded:
+                try:
+                    uploaded[key] = await offload_image(db, value, folder)
+                except ValueError as e:
+                    stats["invalid"].append((row["id"], str(e)))
+                    continue
+            targets[uploaded[key]].append(row["id"])
+
+        for url, ids in targets.items():
+            # 只改写仍是内联数据的行，不覆盖期间被后台改成 URL 的值
+            await db.table(table).update({column: url}).in_("id", ids).like(column, "data:image%").execute()
+            stats["rewritten"] += len(ids)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="外置内联 base64 图片")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不上传也不改写")
+    args = parser.parse_args()
+
+    db = await get_async_supabase_client()
+    uploaded: dict = {}
+    for table, column, folder in TARGETS:
+        stats = await offload_table(db, table, column, folder, args.dry_run, uploaded)
+        print(f"{table}.{column}: {stats['rows']} inline images, {stats['bytes'] / 1024:.1f} KB"
+              + ("" if args.dry_run else f", {stats['rewritten']} rows rewritten"))
+        for row_id, error in stats["invalid"]:
+            print(f"  skipped {row_id}: {error}")
+
+    if not args.dry_run:
+        print(f"Uploaded {len(uploaded)} distinct image(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,56 @@
+"""
+游标分页 (keyset pagination)
+按 (排序列, id) 倒序翻页: 游标记录上一页最后一行的排序值和 id，
+下一页只取 "排在它之后" 的行，沿复合索引直接定位，不再 OFFSET 扫描并丢弃前面的行
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(sort_value: str, row_id: str) -> str:
+    """(排序值, id) -> 不透明的 URL 安全游标"""
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """
+    游标 -> (排序值, id)；格式错误时返回 400
+    排序值必须是 ISO 时间、id 必须是 UUID (两者会拼进 PostgREST 过滤表达式)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        datetime.fromisoformat(sort_value)
+        return sort_value, str(uuid.UUID(row_id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(query, column: str, cursor: str):
+    """
+    在 PostgREST 查询上追加 "(column, id) < 游标" 条件 (配合 column DESC, id DESC 排序)
+    额外的 column <= v 让数据库把它作为复合索引的范围条件，OR 子句只用于排除同一时间戳中已返回的行
+    """
+    sort_value, row_id = decode_cursor(cursor)
+    return query.lte(column, sort_value).or_(
+        f'{column}.lt."{sort_value}",and({column}.eq."{sort_value}",id.lt.{row_id})'
+    )
+
+
+def keyset_page(rows: list[dict], per_page: int, column: str) -> tuple[list[dict], Optional[str]]:
+    """
+    查询时多取一行 (per_page + 1) 判断是否还有下一页
+    返回 (当前页, 下一页游标)，没有下一页时游标为 None
+    """
+    if len(rows) <= per_page:
+        return rows, None
+    page = rows[:per_page]
+    last = page[-1]
+    return page, encode_cursor(last[column], last["id"])
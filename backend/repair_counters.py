@@ -0,0 +1,33 @@
+"""
+回填/修复 users 表的计数列 (unread_msg_count, tx_count, ongoing_task_count, invited_count)
+
+计数列由数据库触发器维护。首次上线 (已有历史数据) 或怀疑计数漂移时运行本脚本，
+它会调用数据库函数 refresh_user_counters 按真实行数重算，只改写不一致的用户。
+处理全部用户时同时调用 refresh_platform_likes，按 user_likes 重算 platforms.likes
+(点赞缓冲所在的进程被回收时未写回的增量会丢失)；可由定时任务 (cron) 定期运行。
+
+使用方法:
+    cd backend
+    python repair_counters.py              # 全部用户
+    python repair_counters.py <用户UUID>   # 单个用户
+"""
+
+import sys
+
+from database import get_supabase_client
+
+
+def repair_counters(user_id=None):
+    db = get_supabase_client()
+    res = db.rpc("refresh_user_counters", {"p_user_id": user_id}).execute()
+    fixed = res.data or 0
+    target = user_id or "all users"
+    print(f"Counters refreshed for {target}. Rows corrected: {fixed}")
+    if user_id is None:
+        likes = db.rpc("refresh_platform_likes", {}).execute().data or 0
+        print(f"Platform likes refreshed. Rows corrected: {likes}")
+    return fixed
+
+
+if __name__ == "__main__":
+    repair_counters(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -4,12 +4,13 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from supabase import Client
+from supabase import AsyncClient
 from pydantic import BaseModel
 from typing import Optional, List
 
 from database import get_db
 from schemas import Activity
+from media import offload_image
 
 router = APIRouter(prefix="/activities", tags=["活动"])
 
@@ -52,20 +53,30 @@ def convert_db_activity(a: dict, slim: bool = False) -> dict:
         })
     return res
 
+async def _refresh_initial_data(db: AsyncClient) -> None:
+    """活动变更后重建初始数据快照 (延迟导入，避免与 config 路由循环引用)"""
+    from .config import refresh_initial_data
+    await refresh_initial_data(db)
+
 @router.get("", response_model=List[Activity], response_model_by_alias=True)
-async def get_activities(db: Client = Depends(get_db)):
+async def get_activities(db: AsyncClient = Depends(get_db)):
     """获取所有活动列表"""
     # Admin 需要看到所有活动，不仅仅是 active 的
-    result = db.table("activities").select("*").order("created_at", desc=True).execute()
+    result = await db.table("activities").select("*").order("created_at", desc=True).execute()
     return [convert_db_activity(a) for a in (result.data or [])]
 
 @router.post("", response_model=Activity, response_model_by_alias=True)
-async def create_activity(activity: ActivityCreate, db: Client = Depends(get_db)):
-    """创建新活动"""
+async def create_activity(activity: ActivityCreate, db: AsyncClient = Depends(get_db)):
+    """创建新活动 (内联 base64 图片先外置到 Storage)"""
+    try:
+        image_url = await offload_image(db, activity.imageUrl, "activities")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     new_activity = {
         "title": activity.title,
         "title_color": activity.titleColor,
-        "image_url": activity.imageUrl,
+        "image_url": image_url,
         "content": activity.content,
         "link": activity.link,
         "active": activity.active,
@@ -73,20 +84,26 @@ async def create_activity(activity: ActivityCreate, db: Client = Depends(get_db)
         "target_countries": activity.targetCountries
     }
     
-    result = db.table("activities").insert(new_activity).execute()
+    result = await db.table("activities").insert(new_activity).execute()
     
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create activity")
     
+    await _refresh_initial_data(db)
+
     return convert_db_activity(result.data[0])
 
 @router.patch("/{activity_id}", response_model=Activity, response_model_by_alias=True)
-async def update_activity(activity_id: str, activity: ActivityUpdate, db: Client = Depends(get_db)):
-    """更新活动"""
+async def update_activity(activity_id: str, activity: ActivityUpdate, db: AsyncClient = Depends(get_db)):
+    """更新活动 (内联 base64 图片先外置到 Storage)"""
     updates = {}
     if activity.title is not None: updates["title"] = activity.title
     if activity.titleColor is not None: updates["title_color"] = activity.titleColor
-    if activity.imageUrl is not None: updates["image_url"] = activity.imageUrl
+    if activity.imageUrl is not None:
+        try:
+            updates["image_url"] = await offload_image(db, activity.imageUrl, "activities")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     if activity.content is not None: updates["content"] = activity.content
     if activity.link is not None: updates["link"] = activity.link
     if activity.active is not None: updates["active"] = activity.active
@@ -96,19 +113,23 @@ async def update_activity(activity_id: str, activity: ActivityUpdate, db: Client
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = db.table("activities").update(updates).eq("id", activity_id).execute()
+    result = await db.table("activities").update(updates).eq("id", activity_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Activity not found")
         
+    await _refresh_initial_data(db)
+
     return convert_db_activity(result.data[0])
 
 @router.delete("/{activity_id}")
-async def delete_activity(activity_id: str, db: Client = Depends(get_db)):
+async def delete_activity(activity_id: str, db: AsyncClient = Depends(get_db)):
     """删除活动"""
-    result = db.table("activities").delete().eq("id", activity_id).execute()
+    result = await db.table("activities").delete().eq("id", activity_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Activity not found or already deleted")
         
+    await _refresh_initial_data(db)
+
     return {"message": "Activity deleted successfully"}
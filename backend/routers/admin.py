@@ -3,18 +3,25 @@
 处理后台管理员登录、列表等操作
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-import uuid
-from supabase import Client
+from fastapi import APIRouter, HTTPException, Depends, Query
+from supabase import AsyncClient
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime, date, timedelta, timezone
-from typing import Optional, List, Dict
+from typing import Any, Callable, Optional, List
+from datetime import datetime, timedelta, timezone
+import uuid
+import numpy as np
 
+import analytics
 from database import get_db
 from utils import verify_password, get_password_hash # Integrated security utils
-from schemas import UserResponse
+from schemas import PaginatedMessagesResponse
+from cache import TTLCache, cache_stats
+from config import get_settings
+from jobs import job_runner, job_to_response
+from search import normalize_term, search_users
+from counting import count_strategy, fetch_page
 from .fb_tracker import send_fb_event
+from .auth import invalidate_user_profile, profile_cache
 
 
 router = APIRouter(prefix="/admin", tags=["管理员"])
@@ -53,13 +60,13 @@ class AdminLoginResponse(BaseModel):
 
 
 @router.post("/login", response_model=AdminLoginResponse)
-async def admin_login(credentials: AdminLoginRequest, db: Client = Depends(get_db)):
+async def admin_login(credentials: AdminLoginRequest, db: AsyncClient = Depends(get_db)):
     """
     管理员登录
     验证用户名和密码
     """
     # 查找管理员
-    result = db.table("admins").select("*").eq("username", credentials.username).execute()
+    result = await db.table("admins").select("*").eq("username", credentials.username).execute()
     
     if not result.data:
         raise HTTPException(status_code=401, detail="Invalid username or password")
@@ -80,12 +87,12 @@ async def admin_login(credentials: AdminLoginRequest, db: Client = Depends(get_d
 
 
 @router.get("/list")
-async def get_admins(db: Client = Depends(get_db)):
+async def get_admins(db: AsyncClient = Depends(get_db)):
     """
     获取所有管理员列表
     NOTE: 仅返回必要信息，不返回密码
     """
-    result = db.table("admins").select("id, username, role").execute()
+    result = await db.table("admins").select("id, username, role").execute()
     
     admins = [
         {
@@ -107,13 +114,13 @@ class AdminCreateRequest(BaseModel):
 
 
 @router.post("/create", response_model=AdminResponse)
-async def create_admin(admin_data: AdminCreateRequest, db: Client = Depends(get_db)):
+async def create_admin(admin_data: AdminCreateRequest, db: AsyncClient = Depends(get_db)):
     """
     创建新管理员
     只有 super_admin 可以调用此接口（前端控制）
     """
     # 检查用户名是否已存在
-    existing = db.table("admins").select("id").eq("username", admin_data.username).execute()
+    existing = await db.table("admins").select("id").eq("username", admin_data.username).execute()
     if existing.data:
         raise HTTPException(status_code=400, detail="Username already exists")
     
@@ -125,7 +132,7 @@ async def create_admin(admin_data: AdminCreateRequest, db: Client = Depends(get_
     hashed_password = get_password_hash(admin_data.password)
 
     # 创建管理员
-    result = db.table("admins").insert({
+    result = await db.table("admins").insert({
         "username": admin_data.username,
         "password": hashed_password, # 存储哈希密码
         "role": admin_data.role
@@ -151,133 +158,130 @@ class DashboardStats(BaseModel):
     todayRegistrations: int
 
 
+# 仪表盘统计缓存: 多个后台标签页轮询时在 TTL 内共用一次聚合结果
+dashboard_stats_cache = TTLCache("dashboard_stats", maxsize=1, ttl=get_settings().dashboard_stats_ttl)
+
+
 @router.get("/dashboard-stats", response_model=DashboardStats)
-async def get_dashboard_stats(db: Client = Depends(get_db)):
+async def get_dashboard_stats(db: AsyncClient = Depends(get_db)):
     """
     获取仪表盘统计数据 (服务端聚合)
+    五项指标由数据库函数 admin_dashboard_stats 一次聚合返回，结果短暂缓存
     """
-    today = datetime.now(timezone(timedelta(hours=7))).date().isoformat()
-    
-    # 使用 simpler queries for basic stats
-    users_res = db.table("users").select("id", count="exact").execute()
-    total_users = users_res.count if hasattr(users_res, 'count') and users_res.count else 0
-    
-    balance_res = db.table("users").select("balance").execute()
-    total_balance = sum(u.get("balance", 0) for u in (balance_res.data or []))
-    
-    pending_wd_res = db.table("transactions").select("id", count="exact").eq("type", "withdraw").eq("status", "pending").execute()
-    pending_withdrawals = pending_wd_res.count if hasattr(pending_wd_res, 'count') and pending_wd_res.count else 0
-    
-    pending_tasks_res = db.table("user_tasks").select("id", count="exact").eq("status", "reviewing").execute()
-    pending_tasks = pending_tasks_res.count if hasattr(pending_tasks_res, 'count') and pending_tasks_res.count else 0
-    
-    today_reg_res = db.table("users").select("id", count="exact").gte("created_at", today).execute()
-    today_registrations = today_reg_res.count if hasattr(today_reg_res, 'count') and today_reg_res.count else 0
-    
-    return DashboardStats(
-        totalUsers=total_users,
-        totalBalance=total_balance,
-        pendingWithdrawals=pending_withdrawals,
-        pendingTasks=pending_tasks,
-        todayRegistrations=today_registrations
+    stats = dashboard_stats_cache.get("stats")
+    if stats is not None:
+        return stats
+    
+    result = await db.rpc("admin_dashboard_stats", {}).execute()
+    row = result.data or {}
+    
+    stats = DashboardStats(
+        totalUsers=row.get("total_users", 0),
+        totalBalance=float(row.get("total_balance", 0)),
+        pendingWithdrawals=row.get("pending_withdrawals", 0),
+        pendingTasks=row.get("pending_tasks", 0),
+        todayRegistrations=row.get("today_registrations", 0)
     )
+    dashboard_stats_cache.set("stats", stats)
+    return stats
+
+
+# daily_metrics 汇总表的日期口径 (固定 UTC+7，无夏令时)
+ROLLUP_TZ = "Asia/Jakarta"
+ROLLUP_OFFSET = np.timedelta64(7, "h")
+# 拉取原始行时每页的行数 (PostgREST 默认单次最多返回 1000 行)
+RAW_PAGE_SIZE = 1000
+
+
+async def _fetch_all(build_query) -> list:
+    """分页拉取查询的全部行，build_query 每次返回一个新的查询构造器"""
+    rows, start = [], 0
+    while True:
+        page = (await build_query().range(start, start + RAW_PAGE_SIZE - 1).execute()).data or []
+        rows.extend(page)
+        if len(page) < RAW_PAGE_SIZE:
+            return rows
+        start += RAW_PAGE_SIZE
+
+
+async def _metrics_from_rollup(db: AsyncClient, buckets: analytics.Buckets, today: analytics.Buckets) -> tuple:
+    """按天/周粒度且使用汇总口径时区时: 读取 daily_metrics 汇总行再合并到桶"""
+    first_day = (buckets.start + ROLLUP_OFFSET).astype("datetime64[D]")
+    last_day = (today.start + ROLLUP_OFFSET).astype("datetime64[D]")
+    result = await db.table("daily_metrics").select("*").gte("day", str(first_day)).lte("day", str(last_day)).execute()
+    rows = result.data or []
+    
+    # 汇总行的日期 -> 该日本地零点对应的 UTC 时间
+    days = np.array([r["day"] for r in rows], dtype="datetime64[D]").astype("datetime64[us]") - ROLLUP_OFFSET
+    columns = {
+        "registrations": np.array([r["registrations"] for r in rows], dtype=float),
+        "tasksClaimed": np.array([r["tasks_claimed"] for r in rows], dtype=float),
+        "tasksCompleted": np.array([r["tasks_completed"] for r in rows], dtype=float),
+        "withdrawAmount": np.array([float(r["withdraw_amount"]) for r in rows], dtype=float),
+    }
+    chart = {name: analytics.bucket_counts(days, buckets, values) for name, values in columns.items()}
+    summary = {name: analytics.bucket_counts(days, today, values) for name, values in columns.items()}
+    for name in ("registrations", "tasksClaimed", "tasksCompleted"):
+        chart[name] = chart[name].astype(np.int64)
+        summary[name] = summary[name].astype(np.int64)
+    return chart, summary
+
+
+async def _metrics_from_raw(db: AsyncClient, buckets: analytics.Buckets, today: analytics.Buckets) -> tuple:
+    """任意粒度/时区: 拉取范围内的原始时间戳列，用 NumPy 一次分桶"""
+    since = str(min(buckets.start, today.start)) + "+00:00"
+    
+    users = await _fetch_all(lambda: db.table("users").select("created_at").gte("created_at", since).order("created_at"))
+    claimed = await _fetch_all(lambda: db.table("user_tasks").select("start_time").gte("start_time", since).order("start_time"))
+    completed = await _fetch_all(lambda: db.table("user_tasks").select("submission_time").eq("status", "completed").gte("submission_time", since).order("submission_time"))
+    withdrawals = await _fetch_all(lambda: db.table("transactions").select("amount, created_at").eq("type", "withdraw").eq("status", "success").gte("created_at", since).order("created_at"))
+    
+    columns = {
+        "registrations": (analytics.parse_timestamps([r["created_at"] for r in users]), None),
+        "tasksClaimed": (analytics.parse_timestamps([r["start_time"] for r in claimed]), None),
+        "tasksCompleted": (analytics.parse_timestamps([r["submission_time"] for r in completed]), None),
+        "withdrawAmount": (
+            analytics.parse_timestamps([r["created_at"] for r in withdrawals]),
+            np.abs(np.array([float(r["amount"]) for r in withdrawals], dtype=float)),
+        ),
+    }
+    chart = {name: analytics.bucket_counts(ts, buckets, w) for name, (ts, w) in columns.items()}
+    summary = {name: analytics.bucket_counts(ts, today, w) for name, (ts, w) in columns.items()}
+    return chart, summary
 
 
 @router.get("/analytics")
-async def get_analytics(db: Client = Depends(get_db)):
-    """
-    获取详细分析数据 (当日指标 + 30天趋势)
-    时区: UTC+7
-    """
-    tz_plus_7 = timezone(timedelta(hours=7))
-    now = datetime.now(tz_plus_7)
-    today_date = now.date()
-    start_date = today_date - timedelta(days=29) # 包含今天在内的前30天
-    
-    # 转换为 UTC ISO 格式用于查询
-    start_iso = datetime.combine(start_date, datetime.min.time(), tzinfo=tz_plus_7).astimezone(timezone.utc).isoformat()
-    today_iso = datetime.combine(today_date, datetime.min.time(), tzinfo=tz_plus_7).astimezone(timezone.utc).isoformat()
-
-    # 1. 获取所有相关数据 (近30天)
-    # 注册数据
-    users = db.table("users").select("created_at").gte("created_at", start_iso).execute()
-    # 领取任务量 (ongoing + reviewed)
-    claimed = db.table("user_tasks").select("start_time").gte("start_time", start_iso).execute()
-    # 完成任务量
-    completed = db.table("user_tasks").select("submission_time").eq("status", "completed").gte("submission_time", start_iso).execute()
-    # 提款总额 (status='success')
-    withdrawals = db.table("transactions").select("amount, created_at").eq("type", "withdraw").eq("status", "success").gte("created_at", start_iso).execute()
-
-    # 2. 初始化趋势数据字典
-    trends = {}
-    for i in range(30):
-        d = (start_date + timedelta(days=i)).isoformat()
-        trends[d] = {
-            "date": d,
-            "registrations": 0,
-            "tasksClaimed": 0,
-            "tasksCompleted": 0,
-            "withdrawAmount": 0
-        }
-
-    # 3. 填充数据并计算当日 Summary
-    summary = {
-        "registrations": 0,
-        "tasksClaimed": 0,
-        "tasksCompleted": 0,
-        "withdrawAmount": 0
-    }
+async def get_analytics(
+    range_: str = Query("30d", alias="range"),
+    granularity: str = "day",
+    tz: str = analytics.DEFAULT_TZ,
+    db: AsyncClient = Depends(get_db)
+):
+    """
+    获取详细分析数据 (当日指标 + 趋势)
+    range: 时间范围，如 24h / 30d / 12w；granularity: hour / day / week；tz: IANA 时区名
+    默认 (30 天、按天、UTC+7) 以及按周且时区为 UTC+7 时读取 daily_metrics 汇总表，
+    其它组合拉取原始时间戳后用 NumPy 分桶
+    """
+    try:
+        zone = analytics.parse_tz(tz)
+        now = datetime.now(timezone.utc)
+        buckets = analytics.make_buckets(now, analytics.parse_range(range_), granularity, zone)
+        today = analytics.make_buckets(now, timedelta(days=1), "day", zone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if tz == ROLLUP_TZ and granularity in ("day", "week"):
+        chart, summary = await _metrics_from_rollup(db, buckets, today)
+    else:
+        chart, summary = await _metrics_from_raw(db, buckets, today)
 
-    # 辅助函数: 转换 UTC 时间戳到 UTC+7 日期字符串
-    def to_7_date(iso_str):
-        if not iso_str: return None
-        # 处理可能没有时区信息的字符串
-        if iso_str.endswith('Z'): iso_str = iso_str[:-1] + '+00:00'
-        try:
-            dt = datetime.fromisoformat(iso_str).astimezone(tz_plus_7)
-            return dt.date().isoformat()
-        except:
-            return None
-
-    # 计算注册量
-    for u in (users.data or []):
-        day = to_7_date(u.get("created_at"))
-        if day in trends:
-            trends[day]["registrations"] += 1
-            if day == today_date.isoformat():
-                summary["registrations"] += 1
-
-    # 计算领取任务量
-    for t in (claimed.data or []):
-        day = to_7_date(t.get("start_time"))
-        if day in trends:
-            trends[day]["tasksClaimed"] += 1
-            if day == today_date.isoformat():
-                summary["tasksClaimed"] += 1
-
-    # 计算完成任务量
-    for t in (completed.data or []):
-        day = to_7_date(t.get("submission_time"))
-        if day in trends:
-            trends[day]["tasksCompleted"] += 1
-            if day == today_date.isoformat():
-                summary["tasksCompleted"] += 1
-
-    # 计算提款金额
-    for w in (withdrawals.data or []):
-        day = to_7_date(w.get("created_at"))
-        amount = abs(float(w.get("amount", 0)))
-        if day in trends:
-            trends[day]["withdrawAmount"] += amount
-            if day == today_date.isoformat():
-                summary["withdrawAmount"] += amount
-
-    # 4. 转换趋势数据为列表并排序
-    chart_data = sorted(trends.values(), key=lambda x: x["date"])
+    summary_row = analytics.series(today, **summary)[0]
+    summary_row.pop("date")
 
     return {
-        "summary": summary,
-        "chartData": chart_data
+        "summary": summary_row,
+        "chartData": analytics.series(buckets, **chart)
     }
 
 
@@ -287,6 +291,15 @@ class PaginatedUsersResponse(BaseModel):
     total: int
     page: int
     perPage: int
+    # total 为规划器估算值时为 True
+    totalApproximate: bool = False
+
+
+# 各后台分页列表的总数策略 (大结果集用估算值，小结果集用精确值，按过滤条件短时缓存)
+users_count = count_strategy("admin_users")
+audit_history_count = count_strategy("audit_history")
+withdrawals_count = count_strategy("withdrawals")
+messages_count = count_strategy("admin_messages")
 
 
 @router.get("/users", response_model=PaginatedUsersResponse)
@@ -295,7 +308,7 @@ async def get_all_users(
     per_page: int = 20,
     search: Optional[str] = None,
     limit: Optional[int] = None, # 兼容 limit 参数
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_db)
 ):
     # 如果传了 limit，优先使用
     if limit:
@@ -308,35 +321,20 @@ async def get_all_users(
     end = start + per_page - 1
     
     # Select essential user fields + bank accounts + total_earnings
-    query = db.table("users").select(
-        "id, email, phone, balance, referral_code, is_banned, vip_level, total_earnings, created_at, bank_accounts(*)",
-        count="exact"
-    )
-    
-    if search:
-        search_val = search.strip()
-        # id 是 UUID 类型，不支持 ilike 模糊查询。
-        # 只有当输入符合 UUID 格式时，才尝试精确匹配 id。
-        conditions = [
-            f"email.ilike.%{search_val}%",
-            f"phone.ilike.%{search_val}%",
-            f"referral_code.ilike.%{search_val}%"
-        ]
-        
-        try:
-            uuid.UUID(search_val)
-            conditions.append(f"id.eq.{search_val}")
-        except ValueError:
-            pass # 不是有效的 UUID，跳过 ID 匹配
-            
-        query = query.or_(",".join(conditions))
+    select = "id, email, phone, balance, referral_code, is_banned, vip_level, total_earnings, created_at, bank_accounts(*)"
     
-    res = query.order("created_at", desc=True).range(start, end).execute()
-    total = res.count if hasattr(res, 'count') and res.count else 0
+    if search and search.strip():
+        # 搜索子系统: 手机号前缀快速路径 + trigram 索引子串匹配 + 结果页缓存
+        fetch = lambda count: search_users(db, search, select, start, end, count=count)
+    else:
+        fetch = lambda count: fetch_page(
+            db.table("users").select(select, count=count).order("created_at", desc=True), start, end
+        )
+    rows, total, approximate = await users_count.page((search or "").strip(), fetch, start, per_page)
     
     # Transform to frontend field names (camelCase)
     transformed_users = []
-    for u in (res.data or []):
+    for u in rows:
         transformed_users.append({
             "id": u.get("id"),
             "email": u.get("email"),
@@ -361,18 +359,19 @@ async def get_all_users(
         users=transformed_users,
         total=total,
         page=page,
-        perPage=per_page
+        perPage=per_page,
+        totalApproximate=approximate
     )
 
 
 @router.get("/pending-tasks")
-async def get_pending_tasks(db: Client = Depends(get_db)):
+async def get_pending_tasks(db: AsyncClient = Depends(get_db)):
     """
     获取待审核任务列表 (status='reviewing')
     返回包含用户信息的任务列表
     """
     # Get all reviewing tasks with user info
-    tasks_res = db.table("user_tasks").select(
+    tasks_res = await db.table("user_tasks").select(
         "*, users(id, email, phone, referral_code)"
     ).eq("status", "reviewing").order("submission_time", desc=True).execute()
     
@@ -395,7 +394,7 @@ async def get_pending_tasks(db: Client = Depends(get_db)):
 async def get_audit_history(
     page: int = 1, 
     per_page: int = 20,
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_db)
 ):
     """
     获取已审核任务列表 (status='completed' or 'rejected')
@@ -405,18 +404,16 @@ async def get_audit_history(
     start = (page - 1) * per_page
     end = start + per_page - 1
 
-    # Get total count
-    count_res = db.table("user_tasks").select("id", count="exact").in_("status", ["completed", "rejected"]).execute()
-    total = count_res.count or 0
-
-    # Get tasks with user info
-    tasks_res = db.table("user_tasks").select(
-        "*, users(id, email, phone, referral_code)"
-    ).in_("status", ["completed", "rejected"]).order("updated_at", desc=True).range(start, end).execute()
+    # Get tasks with user info (总数由总数策略给出，与数据同一请求)
+    rows, total, approximate = await audit_history_count.page("", lambda count: fetch_page(
+        db.table("user_tasks").select("*, users(id, email, phone, referral_code)", count=count)
+        .in_("status", ["completed", "rejected"]).order("updated_at", desc=True),
+        start, end,
+    ), start, per_page)
     
     # Transform to include user info directly
     tasks = []
-    for t in (tasks_res.data or []):
+    for t in rows:
         user = t.pop("users", {}) or {}
         tasks.append({
             **t,
@@ -426,13 +423,13 @@ async def get_audit_history(
             "userReferralCode": user.get("referral_code")
         })
     
-    return {"tasks": tasks, "total": total}
+    return {"tasks": tasks, "total": total, "totalApproximate": approximate}
 
 @router.get("/pending-withdrawals")
 async def get_pending_withdrawals(
     page: int = 1,
     per_page: int = 20,
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_db)
 ):
     """
     获取所有提现记录 (按时间倒序)
@@ -441,18 +438,16 @@ async def get_pending_withdrawals(
     start = (page - 1) * per_page
     end = start + per_page - 1
 
-    # Get total count
-    count_res = db.table("transactions").select("id", count="exact").eq("type", "withdraw").execute()
-    total = count_res.count or 0
-
-    # Get withdrawal transactions with user and bank info
-    tx_res = db.table("transactions").select(
-        "*, users(id, email, phone, referral_code, bank_accounts(*))"
-    ).eq("type", "withdraw").order("created_at", desc=True).range(start, end).execute()
+    # Get withdrawal transactions with user and bank info (总数由总数策略给出，与数据同一请求)
+    rows, total, approximate = await withdrawals_count.page("", lambda count: fetch_page(
+        db.table("transactions").select("*, users(id, email, phone, referral_code, bank_accounts(*))", count=count)
+        .eq("type", "withdraw").order("created_at", desc=True),
+        start, end,
+    ), start, per_page)
     
     # Transform to include user info directly
     withdrawals = []
-    for tx in (tx_res.data or []):
+    for tx in rows:
         user = tx.pop("users", {}) or {}
         bank_accounts = user.pop("bank_accounts", []) or []
         withdrawals.append({
@@ -464,166 +459,222 @@ async def get_pending_withdrawals(
             "bankAccounts": bank_accounts
         })
     
-    return {"withdrawals": withdrawals, "total": total}
+    return {"withdrawals": withdrawals, "total": total, "totalApproximate": approximate}
 
 class AuditTaskRequest(BaseModel):
     userId: str
     taskId: str
     status: str # completed, rejected
 
-@router.post("/audit-task")
-async def audit_task(req: AuditTaskRequest, db: Client = Depends(get_db)):
-    """审核任务 (批准/拒绝)"""
-    # 更新 user_tasks 表
-    # 注意：我们保留现有的 submission_time，它是用户提交凭证的时间
-    result = db.table("user_tasks").update({
-        "status": req.status,
-    }).eq("id", req.taskId).eq("user_id", req.userId).execute()
-    
-    if req.status == 'completed':
-        # 如果批准，发放奖励
-        # 1. 获取任务信息
-        task_res = db.table("user_tasks").select("reward_amount").eq("id", req.taskId).execute()
-        if task_res.data:
-            amount = task_res.data[0]["reward_amount"]
-            
-            # 2. 更新用户余额
-            # 获取当前余额
-            user_res = db.table("users").select("id, email, phone, balance, total_earnings, referrer_id").eq("id", req.userId).execute()
-            if user_res.data:
-                user = user_res.data[0]
-                new_balance = float(user["balance"]) + float(amount)
-                new_earnings = float(user["total_earnings"]) + float(amount)
-                
-                db.table("users").update({
-                    "balance": new_balance, 
-                    "total_earnings": new_earnings
-                }).eq("id", req.userId).execute()
-                
-                # 3. 创建交易记录
-                db.table("transactions").insert({
-                    "user_id": req.userId,
-                    "type": "task_reward",
-                    "amount": amount,
-                    "description": "Task Reward",
-                    "status": "success"
-                }).execute()
-
-                # --- Meta Pixel/CAPI: Purchase Event ---
-                try:
-                    import asyncio
-                    # Fetch task name for tracking
-                    task_info = db.table("user_tasks").select("platform_name").eq("id", req.taskId).execute()
-                    task_name = task_info.data[0].get("platform_name", "Task Reward") if task_info.data else "Task Reward"
-                    
-                    # Background task to not block API response
-                    asyncio.create_task(send_fb_event(
-                        event_name="Purchase",
-                        user_email=user.get("email"),
-                        user_phone=user.get("phone"),
-                        user_id=req.userId,
-                        value=float(amount),
-                        currency="IDR",
-                        event_id=req.taskId, # MUST match frontend event_id
-                        content_ids=[req.taskId],
-                        content_name=task_name
-                    ))
-                except Exception as fb_err:
-                    import logging
-                    logging.getLogger(__name__).error(f"Failed to trigger FB CAPI: {fb_err}")
-
-                # --- NEW: 3-Level Referral Commission ---
-                referrer_id = user.get("referrer_id")
-                # Level ratios: 1 (20%), 2 (10%), 3 (5%)
-                commission_rates = [0.20, 0.10, 0.05]
-                current_downline_email = user.get("email") or req.userId
-
-                for i, rate in enumerate(commission_rates):
-                    if not referrer_id:
-                        break
-                    
-                    # Fetch current referrer
-                    ref_res = db.table("users").select("id, balance, total_earnings, referrer_id").eq("id", referrer_id).execute()
-                    if not ref_res.data:
-                        break
-                    
-                    referrer = ref_res.data[0]
-                    commission = float(amount) * rate
-                    
-                    if commission > 0:
-                        # Update balance
-                        new_ref_balance = float(referrer["balance"]) + commission
-                        new_ref_earnings = float(referrer["total_earnings"]) + commission
-                        db.table("users").update({
-                            "balance": new_ref_balance,
-                            "total_earnings": new_ref_earnings
-                        }).eq("id", referrer["id"]).execute()
-                        
-                        # Log transaction
-                        level = i + 1
-                        db.table("transactions").insert({
-                            "user_id": referrer["id"],
-                            "type": "referral_bonus",
-                            "amount": commission,
-                            "description": f"Komisi Level {level} dari {current_downline_email}",
-                            "status": "success"
-                        }).execute()
-                    
-                    # Move to next parent
-                    referrer_id = referrer.get("referrer_id")
+# 三级推荐佣金比例: 1 级 20%，2 级 10%，3 级 5%
+COMMISSION_RATES = [0.20, 0.10, 0.05]
+
+
+def _track_task_purchase(outcome: dict, user_id: str, task_id: str) -> None:
+    """Meta Pixel/CAPI: Purchase 事件 (后台发送，不阻塞响应)"""
+    try:
+        import asyncio
+        asyncio.create_task(send_fb_event(
+            event_name="Purchase",
+            user_email=outcome.get("email"),
+            user_phone=outcome.get("phone"),
+            user_id=user_id,
+            value=float(outcome["amount"]),
+            currency="IDR",
+            event_id=task_id, # MUST match frontend event_id
+            content_ids=[task_id],
+            content_name=outcome.get("platform_name") or "Task Reward"
+        ))
+    except Exception as fb_err:
+        import logging
+        logging.getLogger(__name__).error(f"Failed to trigger FB CAPI: {fb_err}")
+
+
+class AuditTaskBatchRequest(BaseModel):
+    items: List[AuditTaskRequest]
+
+
+# 单次批量审核的最大条数
+MAX_AUDIT_BATCH = 500
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _merge_invalid(items: list, results: list, is_valid: Callable[[Any], bool], invalid: Callable[[Any], dict]) -> list:
+    """
+    批量审核函数在 UUID 转换失败时会让整批报错，因此 id 格式不正确的项不传给数据库；
+    这里把数据库返回的逐项结果 (与传入顺序一致) 和这些项的 invalid_id 结果按原顺序合并
+    """
+    remaining = iter(results)
+    return [next(remaining) if is_valid(item) else invalid(item) for item in items]
+
+
+async def _audit_tasks(db: AsyncClient, items: List[AuditTaskRequest]) -> list:
+    """
+    调用数据库函数 audit_tasks 批量审核，返回逐项结果
+    奖励、佣金和流水在一个事务内按用户汇总写入；之后失效缓存并发送 FB 事件
+    """
+    is_valid = lambda i: _is_uuid(i.taskId) and _is_uuid(i.userId)
+    valid = [i for i in items if is_valid(i)]
+    outcome = {}
+    if valid:
+        result = await db.rpc("audit_tasks", {
+            "p_items": [{"task_id": i.taskId, "user_id": i.userId, "status": i.status} for i in valid],
+            "p_rates": COMMISSION_RATES,
+        }).execute()
+        outcome = result.data or {}
+    results = _merge_invalid(
+        items, outcome.get("results", []), is_valid,
+        lambda i: {"task_id": i.taskId, "user_id": i.userId, "status": "invalid_id"},
+    )
+    
+    invalidate_user_profile(*outcome.get("credited_user_ids", []))
+    invalidate_user_profile(*{r["user_id"] for r in results if r["status"] == "rejected"})
+    # 已审核列表的总数已变化
+    audit_history_count.clear()
+    for r in results:
+        if r["status"] == "completed":
+            _track_task_purchase(r, r["user_id"], r["task_id"])
     
+    return results
+
+
+@router.post("/audit-task")
+async def audit_task(req: AuditTaskRequest, db: AsyncClient = Depends(get_db)):
+    """
+    审核任务 (批准/拒绝)
+    与批量审核共用 audit_tasks，一次数据库往返
+    """
+    if not (_is_uuid(req.taskId) and _is_uuid(req.userId)):
+        raise HTTPException(status_code=400, detail="Invalid task or user id")
+    if req.status not in ('completed', 'rejected'):
+        # 其它状态 (如退回 reviewing) 直接更新
+        # 注意：我们保留现有的 submission_time，它是用户提交凭证的时间
+        await db.table("user_tasks").update({
+            "status": req.status,
+        }).eq("id", req.taskId).eq("user_id", req.userId).execute()
+        invalidate_user_profile(req.userId)
+        return {"message": "Audit processed"}
+    
+    await _audit_tasks(db, [req])
     return {"message": "Audit processed"}
 
 
+@router.post("/audit-tasks/batch")
+async def audit_tasks_batch(req: AuditTaskBatchRequest, db: AsyncClient = Depends(get_db)):
+    """
+    批量审核任务
+    每项 {taskId, userId, status}，status 为 completed 或 rejected；
+    返回逐项结果 (completed / rejected / already_completed / not_found / invalid_status / invalid_id)
+    """
+    if not req.items:
+        return {"processed": 0, "results": []}
+    if len(req.items) > MAX_AUDIT_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AUDIT_BATCH} items per batch")
+    
+    results = await _audit_tasks(db, req.items)
+    return {
+        "processed": sum(1 for r in results if r["status"] in ("completed", "rejected")),
+        "results": [
+            {
+                "taskId": r["task_id"],
+                "userId": r["user_id"],
+                "status": r["status"],
+                "amount": float(r["amount"]) if r.get("amount") is not None else None,
+            }
+            for r in results
+        ],
+    }
+
+
 class SendMessageRequest(BaseModel):
     userId: str # 'all' or specific UUID
     title: str
     content: str
     amount: float = 0
 
+# 广播赠送金额每发放一批: 这批用户的余额已变化
+job_runner.on_chunk("broadcast", lambda job: profile_cache.clear())
+
+
 @router.post("/send-message")
-async def send_message(req: SendMessageRequest, db: Client = Depends(get_db)):
-    """发送系统消息"""
-    recipient_ids = []
-    
+async def send_message(req: SendMessageRequest, db: AsyncClient = Depends(get_db)):
+    """
+    发送系统消息
+    userId 为 'all' 时只写入一行 broadcasts (读取时合并到各用户消息)；
+    带金额时另建后台任务分批发放，返回 jobId，进度通过 /admin/jobs/{jobId} 查询
+    """
     if req.userId == 'all':
-        users = db.table("users").select("id").execute()
-        recipient_ids = [u['id'] for u in users.data or []]
-    else:
-        recipient_ids = [req.userId]
-        
-    for uid in recipient_ids:
-        # 发送消息
-        db.table("messages").insert({
-            "user_id": uid,
+        broadcast = (await db.table("broadcasts").insert({
             "title": req.title,
             "content": req.content,
             "reward_amount": req.amount
-        }).execute()
+        }).execute()).data[0]
+        # 所有用户的未读数已变化
+        profile_cache.clear()
         
-        # 如果有金额，增加余额
-        if req.amount > 0:
-             user_res = db.table("users").select("balance").eq("id", uid).execute()
-             if user_res.data:
-                 new_balance = float(user_res.data[0]["balance"]) + req.amount
-                 db.table("users").update({"balance": new_balance}).eq("id", uid).execute()
-                 
-                 db.table("transactions").insert({
-                    "user_id": uid,
-                    "type": "admin_gift",
-                    "amount": req.amount,
-                    "description": req.title,
-                    "status": "success"
-                }).execute()
+        if req.amount <= 0:
+            return {"message": "Broadcast sent", "broadcastId": broadcast["id"]}
+        
+        job = await job_runner.submit(db, "broadcast", {
+            "title": req.title,
+            "content": req.content,
+            "amount": req.amount,
+            "broadcast_id": broadcast["id"],
+        })
+        return {"message": "Broadcast sent, rewards queued", "broadcastId": broadcast["id"], "jobId": job["id"]}
+    
+    uid = req.userId
+    # 发送消息
+    await db.table("messages").insert({
+        "user_id": uid,
+        "title": req.title,
+        "content": req.content,
+        "reward_amount": req.amount
+    }).execute()
+    
+    # 如果有金额，增加余额
+    if req.amount > 0:
+         user_res = await db.table("users").select("balance").eq("id", uid).execute()
+         if user_res.data:
+             new_balance = float(user_res.data[0]["balance"]) + req.amount
+             await db.table("users").update({"balance": new_balance}).eq("id", uid).execute()
+             
+             await db.table("transactions").insert({
+                "user_id": uid,
+                "type": "admin_gift",
+                "amount": req.amount,
+                "description": req.title,
+                "status": "success"
+            }).execute()
+
+    # 未读计数/余额已变化
+    invalidate_user_profile(uid)
                  
-    return {"message": f"Message sent to {len(recipient_ids)} users"}
+    return {"message": "Message sent to 1 users"}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, db: AsyncClient = Depends(get_db)):
+    """查询后台任务进度 (没有协程在执行时顺带推进一批，前端轮询即驱动任务)"""
+    job = await job_runner.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = await job_runner.advance(db, job)
+    return job_to_response(job)
 
 
 @router.post("/users/{user_id}/adjust-balance")
-async def adjust_user_balance(user_id: str, req: AdjustBalanceRequest, db: Client = Depends(get_db)):
+async def adjust_user_balance(user_id: str, req: AdjustBalanceRequest, db: AsyncClient = Depends(get_db)):
     """人工调整用户余额"""
     # 1. 查找用户
-    user_res = db.table("users").select("balance, total_earnings").eq("id", user_id).execute()
+    user_res = await db.table("users").select("balance, total_earnings").eq("id", user_id).execute()
     if not user_res.data:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -632,26 +683,28 @@ async def adjust_user_balance(user_id: str, req: AdjustBalanceRequest, db: Clien
     new_balance = old_balance + req.amount
     
     # 2. 更新余额
-    db.table("users").update({
+    await db.table("users").update({
         "balance": new_balance
     }).eq("id", user_id).execute()
     
     # 3. 记录交易流水
-    db.table("transactions").insert({
+    await db.table("transactions").insert({
         "user_id": user_id,
         "type": "manual_adjustment",
         "amount": req.amount,
         "description": req.description or "Manual Adjustment",
         "status": "success"
     }).execute()
+    invalidate_user_profile(user_id)
     
     return {"message": "Balance adjusted successfully", "newBalance": new_balance}
 
 
 @router.patch("/users/{user_id}/ban")
-async def ban_user(user_id: str, is_banned: bool = True, db: Client = Depends(get_db)):
+async def ban_user(user_id: str, is_banned: bool = True, db: AsyncClient = Depends(get_db)):
     """封禁/解封用户"""
-    db.table("users").update({"is_banned": is_banned}).eq("id", user_id).execute()
+    await db.table("users").update({"is_banned": is_banned}).eq("id", user_id).execute()
+    invalidate_user_profile(user_id)
     return {"message": "User status updated"}
 
 
@@ -659,18 +712,18 @@ class ResetPasswordRequest(BaseModel):
     newPassword: str
 
 @router.patch("/users/{user_id}/password")
-async def reset_user_password(user_id: str, req: ResetPasswordRequest, db: Client = Depends(get_db)):
+async def reset_user_password(user_id: str, req: ResetPasswordRequest, db: AsyncClient = Depends(get_db)):
     """重置用户密码"""
     hashed = get_password_hash(req.newPassword)
-    db.table("users").update({"password": hashed}).eq("id", user_id).execute()
+    await db.table("users").update({"password": hashed}).eq("id", user_id).execute()
     return {"message": "Password updated"}
 
 
 @router.patch("/password")
-async def change_admin_password(req: AdminChangePasswordRequest, db: Client = Depends(get_db)):
+async def change_admin_password(req: AdminChangePasswordRequest, db: AsyncClient = Depends(get_db)):
     """管理员修改自己的密码"""
     # 查找管理员
-    result = db.table("admins").select("*").eq("id", req.adminId).execute()
+    result = await db.table("admins").select("*").eq("id", req.adminId).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Admin not found")
@@ -685,7 +738,7 @@ async def change_admin_password(req: AdminChangePasswordRequest, db: Client = De
     hashed_password = get_password_hash(req.newPassword)
     
     # 执行更新
-    db.table("admins").update({"password": hashed_password}).eq("id", req.adminId).execute()
+    await db.table("admins").update({"password": hashed_password}).eq("id", req.adminId).execute()
     
     return {"message": "Password updated successfully"}
 
@@ -695,14 +748,14 @@ async def get_user_transactions(
     user_id: str, 
     page: int = 1, 
     per_page: int = 20, 
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_db)
 ):
     """获取指定用户的交易流水"""
     start = (page - 1) * per_page
     end = start + per_page - 1
     
     # 查询交易记录，按 created_at 倒序
-    result = db.table("transactions") \
+    result = await db.table("transactions") \
         .select("*") \
         .eq("user_id", user_id) \
         .order("created_at", desc=True) \
@@ -710,7 +763,7 @@ async def get_user_transactions(
         .execute()
         
     # 获取总数以支持分页
-    count_res = db.table("transactions") \
+    count_res = await db.table("transactions") \
         .select("id", count="exact") \
         .eq("user_id", user_id) \
         .execute()
@@ -731,98 +784,139 @@ class AuditWithdrawalRequest(BaseModel):
     transactionId: str
     status: str # success, failed (rejected)
 
-from schemas import UserResponse, PaginatedMessagesResponse
-
 
 @router.get("/messages", response_model=PaginatedMessagesResponse)
 async def get_paginated_messages(
     page: int = 1, 
     pageSize: int = 20, 
     search: Optional[str] = None, 
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_db)
 ):
-    """分页获取所有用户的系统消息动态"""
+    """
+    分页获取系统消息动态
+    个人消息和全员广播由视图 admin_message_feed 合并 (migrations/0005)，一起按时间倒序分页和计数
+    """
     # 1. 计算范围
     start = (page - 1) * pageSize
     end = start + pageSize - 1
 
-    # 2. 构建查询
-    query = db.table("messages").select("*, users!inner(phone)", count="exact").order("date", desc=True)
-
-    # 3. 搜索逻辑 (如果存在 search 参数)
-    if search:
-        # 搜索标题、内容、或者关联用户的手机号、ID
-        # 注意：Supabase 的 or 语法较为特殊，特别是跨表查询
-        # 这里先实现基础的标题和内容搜索，以及用户 ID 搜索
-        search_filter = f"title.ilike.%{search}%,content.ilike.%{search}%,user_id.eq.{search}"
-        
-        # 如果搜索内容看起来像手机号，也尝试搜索手机号
-        # 由于 messages 表和 users 表有外键关联，我们可以使用 users!inner(phone) 后的过滤
-        query = query.or_(search_filter)
+    # 2. 搜索逻辑: 标题、内容、用户手机号，搜索内容是 UUID 时再匹配用户 ID
+    term = normalize_term(search or "")
+    search_filter = None
+    if term:
+        conditions = [f"title.ilike.%{term}%", f"content.ilike.%{term}%", f"user_phone.ilike.%{term}%"]
+        if _is_uuid(term):
+            conditions.append(f"user_id.eq.{term}")
+        search_filter = ",".join(conditions)
+
+    # 3. 构建查询 (count 由总数策略决定: 估算 / 精确 / 命中缓存时不计数)
+    def build_query(count: Optional[str]):
+        query = db.table("admin_message_feed").select("*", count=count).order("date", desc=True).order("id", desc=True)
+        if search_filter:
+            query = query.or_(search_filter)
+        return query
 
     # 4. 执行分页查询
-    result = query.range(start, end).execute()
+    rows, total, approximate = await messages_count.page(
+        term, lambda count: fetch_page(build_query(count), start, end), start, pageSize
+    )
     
     # 5. 格式化数据
     messages = []
-    for m in (result.data or []):
+    for m in rows:
         messages.append({
             "id": m["id"],
             "title": m["title"],
             "content": m["content"],
             "rewardAmount": m.get("reward_amount"),
             "date": m["date"],
-            "read": m.get("read", False),
+            # 广播只有每个用户的已读水位，没有逐条已读状态
+            "read": bool(m.get("read")),
             "userId": m["user_id"],
-            "userPhone": m.get("users", {}).get("phone") # 从 inner join 中提取 phone
+            "userPhone": m.get("user_phone"),
+            "isBroadcast": m["is_broadcast"]
         })
 
     return {
         "messages": messages,
-        "total": result.count or 0
+        "total": total,
+        "totalApproximate": approximate
     }
 
 
+class AuditWithdrawalBatchRequest(BaseModel):
+    items: List[AuditWithdrawalRequest]
+
+
+async def _audit_withdrawals(db: AsyncClient, items: List[AuditWithdrawalRequest]) -> list:
+    """
+    调用数据库函数 audit_withdrawals 批量审核提现，返回逐项结果
+    只处理仍为 pending 的提现；拒绝的提现在同一事务内退款并写入 withdraw_refund 流水
+    """
+    is_valid = lambda i: _is_uuid(i.transactionId)
+    valid = [i for i in items if is_valid(i)]
+    outcome = {}
+    if valid:
+        result = await db.rpc("audit_withdrawals", {
+            "p_items": [{"transaction_id": i.transactionId, "status": i.status} for i in valid],
+        }).execute()
+        outcome = result.data or {}
+    invalidate_user_profile(*outcome.get("refunded_user_ids", []))
+    return _merge_invalid(
+        items, outcome.get("results", []), is_valid,
+        lambda i: {"transaction_id": i.transactionId, "status": "invalid_id"},
+    )
+
+
 @router.post("/audit-withdrawal")
-async def audit_withdrawal(req: AuditWithdrawalRequest, db: Client = Depends(get_db)):
-    """审核提现 (批准/拒绝)"""
-    # 1. 获取交易并检查状态
-    tx_res = db.table("transactions").select("*").eq("id", req.transactionId).execute()
-    if not tx_res.data:
+async def audit_withdrawal(req: AuditWithdrawalRequest, db: AsyncClient = Depends(get_db)):
+    """审核提现 (批准/拒绝)，与批量审核共用 audit_withdrawals"""
+    outcome = (await _audit_withdrawals(db, [req]))[0]
+    status = outcome["status"]
+    
+    if status == "invalid_id":
+        raise HTTPException(status_code=400, detail="Invalid transaction id")
+    if status == "not_found":
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    tx = tx_res.data[0]
+    if status == "invalid_status":
+        raise HTTPException(status_code=400, detail="Status must be success or failed")
     
     # 重要：防止重复通过或拒绝 (幂等性判断)
-    if tx["status"] != "pending":
-        return {"message": f"Transaction already processed as {tx['status']}"}
-    
-    # 2. 更新原交易状态
-    db.table("transactions").update({
-        "status": req.status
-    }).eq("id", req.transactionId).execute()
-    
-    # 3. 如果拒绝 (failed)，需要退还余额并记录一笔正向账变
-    if req.status == 'failed':
-        user_res = db.table("users").select("balance").eq("id", tx["user_id"]).execute()
-        if user_res.data:
-            current_balance = float(user_res.data[0]["balance"])
-            refund_amount = abs(float(tx["amount"])) # 提现金额的原值
-            
-            # 退款到余额
-            new_balance = current_balance + refund_amount
-            db.table("users").update({"balance": new_balance}).eq("id", tx["user_id"]).execute()
-            
-            # 创建一条新的「退款」交易记录，让用户能看到 +XXXX 的流水
-            db.table("transactions").insert({
-                "user_id": tx["user_id"],
-                "type": "withdraw_refund",
-                "amount": refund_amount,
-                "description": f"Refund: Withdraw Rejected ({req.transactionId})",
-                "status": "success"
-            }).execute()
-            
+    if status.startswith("already_"):
+        return {"message": f"Transaction already processed as {status.removeprefix('already_')}"}
+    
     return {"message": "Withdrawal audited successfully"}
 
 
+@router.post("/audit-withdrawals/batch")
+async def audit_withdrawals_batch(req: AuditWithdrawalBatchRequest, db: AsyncClient = Depends(get_db)):
+    """
+    批量审核提现
+    每项 {transactionId, status}，status 为 success 或 failed；
+    返回逐项结果 (success / failed / already_success / already_failed / not_found / invalid_status / invalid_id)
+    """
+    if not req.items:
+        return {"processed": 0, "refunded": 0, "results": []}
+    if len(req.items) > MAX_AUDIT_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AUDIT_BATCH} items per batch")
+    
+    results = await _audit_withdrawals(db, req.items)
+    return {
+        "processed": sum(1 for r in results if r["status"] in ("success", "failed")),
+        "refunded": sum(1 for r in results if r["status"] == "failed"),
+        "results": [
+            {
+                "transactionId": r["transaction_id"],
+                "userId": r.get("user_id"),
+                "status": r["status"],
+                "amount": float(r["amount"]) if r.get("amount") is not None else None,
+            }
+            for r in results
+        ],
+    }
+
 
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """进程内缓存命中统计 (用于评估缓存容量和 TTL)"""
+    return {"caches": cache_stats()}
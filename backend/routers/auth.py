@@ -4,19 +4,20 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from supabase import Client
+from supabase import AsyncClient
 from datetime import datetime
+from typing import Optional
 import random
 import string
 import asyncio
 from .fb_tracker import send_fb_event
 
 from database import get_db
-from schemas import (
-    UserCreate, UserLogin, UserResponse, AuthResponse, 
-    Transaction, TransactionType, TransactionStatus,
-    Message
-)
+from config import get_settings
+from cache import TTLCache
+from http_cache import Representation
+from system_config import config_registry
+from schemas import UserCreate, UserLogin, UserResponse, AuthResponse
 from utils import verify_password, get_password_hash  # Integrated security utils
 
 router = APIRouter(prefix="/auth", tags=["认证"])
@@ -27,15 +28,99 @@ def generate_referral_code(length: int = 6) -> str:
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
 
-def convert_db_user_to_response(user_data: dict, db: Client) -> UserResponse:
+# 用户资料查询: 用户行 + 内嵌银行账户和点赞关系，一次 PostgREST 往返完成
+# 未读消息/交易/进行中任务计数由数据库触发器维护在 users 表的计数列中，
+# 未读广播数由计算字段 unread_broadcast_count 在读取时得出
+USER_PROFILE_SELECT = "*, unread_broadcast_count, bank_accounts(*), user_likes(platform_id)"
+
+
+def user_profile_query(db: AsyncClient):
+    """
+    构造用户资料查询
+    调用方再追加 .eq("id", ...) 或 .eq("email", ...) 后执行
+    """
+    return db.table("users").select(USER_PROFILE_SELECT)
+
+
+async def fetch_user_profile(db: AsyncClient, user_id: str) -> Optional[dict]:
+    """按 ID 获取用户资料行 (含内嵌数据)，不存在时返回 None"""
+    result = await user_profile_query(db).eq("id", user_id).execute()
+    return result.data[0] if result.data else None
+
+
+# 已构建的用户资料缓存 (Representation，内含 UserResponse 及其序列化结果)，键为用户 ID
+# 所有会改变用户资料的写操作都必须调用 invalidate_user_profile
+# 缓存和失效都只在本进程内: 多 worker 部署时其他进程最多在 PROFILE_CACHE_TTL 秒内读到旧资料，
+# 因此该 TTL 需保持在秒级 (默认 30 秒)
+_settings = get_settings()
+profile_cache = TTLCache("user_profile", maxsize=_settings.profile_cache_size, ttl=_settings.profile_cache_ttl)
+
+
+def invalidate_user_profile(*user_ids: str) -> None:
+    """使指定用户的资料缓存失效"""
+    for user_id in user_ids:
+        if user_id:
+            profile_cache.invalidate(str(user_id))
+
+
+def profile_version(row: dict) -> Optional[str]:
+    """
+    用户资料的版本标识: 触发器维护的 profile_version + 读时计算的未读广播数
+    (资料中只有这两部分会变化)；profile_version 列不存在时返回 None，ETag 退回内容哈希
+    """
+    if row.get("profile_version") is None:
+        return None
+    return f'{row["id"]}:{row["profile_version"]}:{row.get("unread_broadcast_count") or 0}'
+
+
+async def fetch_profile_version(db: AsyncClient, user_id: str) -> Optional[str]:
+    """只查询资料的版本标识 (不含内嵌数据)，用户不存在或无版本号时返回 None"""
+    result = await db.table("users").select("id, profile_version, unread_broadcast_count").eq("id", user_id).execute()
+    return profile_version(result.data[0]) if result.data else None
+
+
+def user_representation(row: dict) -> Representation:
+    """由 user_profile_query 的结果行构建可缓存的资料表示"""
+    return Representation(convert_db_user_to_response(row), UserResponse, profile_version(row))
+
+
+async def load_user_representation(db: AsyncClient, user_id: str) -> Optional[Representation]:
+    """
+    获取用户资料 (优先读缓存)
+    未命中时查询数据库并写入缓存，用户不存在时返回 None
+    """
+    cached = profile_cache.get(user_id)
+    if cached is not None:
+        return cached
+    return await fetch_user_representation(db, user_id)
+
+
+async def fetch_user_representation(db: AsyncClient, user_id: str) -> Optional[Representation]:
+    """
+    查询数据库构建用户资料并写入缓存 (不读缓存)，用户不存在时返回 None
+    供已确认缓存未命中的调用方使用，避免重复读缓存使命中统计翻倍
+    """
+    profile = await fetch_user_profile(db, user_id)
+    if not profile:
+        return None
+
+    rep = user_representation(profile)
+    profile_cache.set(user_id, rep)
+    return rep
+
+
+async def load_user_response(db: AsyncClient, user_id: str) -> Optional[UserResponse]:
+    """获取用户资料响应模型 (优先读缓存)"""
+    rep = await load_user_representation(db, user_id)
+    return rep.data if rep else None
+
+
+def convert_db_user_to_response(user_data: dict) -> UserResponse:
     """
     将数据库用户数据转换为 API 响应格式 (Slim 模式)
     不再默认返回全量历史记录，仅返回计数
+    user_data 需来自 user_profile_query，以包含银行账户、点赞关系和计数
     """
-    user_id = user_data["id"]
-    
-    # 获取用户的银行账户 (核心数据，保留)
-    bank_accounts_result = db.table("bank_accounts").select("*").eq("user_id", user_id).execute()
     bank_accounts = [
         {
             "id": ba["id"],
@@ -44,21 +129,9 @@ def convert_db_user_to_response(user_data: dict, db: Client) -> UserResponse:
             "accountNumber": ba["account_number"],
             "type": ba["type"]
         }
-        for ba in (bank_accounts_result.data or [])
+        for ba in (user_data.get("bank_accounts") or [])
     ]
     
-    # 计数替代全量列表
-    unread_msg_res = db.table("messages").select("id", count="exact").eq("user_id", user_id).eq("read", False).execute()
-    unread_msg_count = unread_msg_res.count if hasattr(unread_msg_res, 'count') else 0
-    
-    # 交易记录计数 (用于前端红点提醒)
-    tx_count_res = db.table("transactions").select("id", count="exact").eq("user_id", user_id).execute()
-    tx_total = tx_count_res.count if hasattr(tx_count_res, 'count') else 0
-    
-    # 进行中的任务计数
-    ongoing_tasks_res = db.table("user_tasks").select("id", count="exact").eq("user_id", user_id).eq("status", "ongoing").execute()
-    ongoing_count = ongoing_tasks_res.count if hasattr(ongoing_tasks_res, 'count') else 0
-    
     return UserResponse(
         id=user_data["id"],
         email=user_data["email"],
@@ -71,28 +144,29 @@ def convert_db_user_to_response(user_data: dict, db: Client) -> UserResponse:
         referrerId=user_data.get("referrer_id"),
         invitedCount=user_data["invited_count"],
         myTasks=[], # Slim mode: empty
-        likedTaskIds=user_data.get("liked_task_ids") or [],
+        likedTaskIds=[like["platform_id"] for like in (user_data.get("user_likes") or [])],
         registrationDate=user_data["registration_date"],
         bankAccounts=bank_accounts,
         role=user_data["role"],
         messages=[], # Slim mode: empty
         transactions=[], # Slim mode: empty
-        unreadMsgCount=unread_msg_count,
-        unreadTxCount=tx_total,
-        ongoingTaskCount=ongoing_count,
+        # 计数替代全量列表 (触发器维护的计数列)
+        unreadMsgCount=(user_data.get("unread_msg_count") or 0) + (user_data.get("unread_broadcast_count") or 0),
+        unreadTxCount=user_data.get("tx_count") or 0,
+        ongoingTaskCount=user_data.get("ongoing_task_count") or 0,
         theme=user_data.get("theme", "gold"),
         isBanned=user_data.get("is_banned", False)
     )
 
 
 @router.post("/login", response_model=AuthResponse, response_model_by_alias=True)
-async def login(credentials: UserLogin, db: Client = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncClient = Depends(get_db)):
     """
     用户登录
     验证邮箱和密码
     """
     # 查找用户
-    result = db.table("users").select("*").eq("email", credentials.email).execute()
+    result = await user_profile_query(db).eq("email", credentials.email).execute()
     
     if not result.data:
         raise HTTPException(status_code=401, detail="Invalid email or password")
@@ -107,33 +181,31 @@ async def login(credentials: UserLogin, db: Client = Depends(get_db)):
     if user.get("is_banned"):
         raise HTTPException(status_code=403, detail="Account is banned")
     
-    user_response = convert_db_user_to_response(user, db)
+    rep = user_representation(user)
+    profile_cache.set(user["id"], rep)
     
-    return AuthResponse(user=user_response)
+    return AuthResponse(user=rep.data)
 
 
 @router.post("/register", response_model=AuthResponse, response_model_by_alias=True)
-async def register(user_data: UserCreate, db: Client = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncClient = Depends(get_db)):
     """
     用户注册
     创建新用户并处理邀请码
     """
     # 检查邮箱是否已存在
-    existing = db.table("users").select("id").eq("email", user_data.email).execute()
+    existing = await db.table("users").select("id").eq("email", user_data.email).execute()
     if existing.data:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # 获取系统配置（初始余额）
-    config_result = db.table("system_config").select("value").eq("key", "initial_balance").execute()
-    initial_balance = 0
-    if config_result.data:
-        balance_config = config_result.data[0]["value"]
-        initial_balance = balance_config.get("id", 0)
+    # 获取系统配置（初始余额、欢迎消息）
+    system_config = await config_registry.get(db)
+    initial_balance = system_config.initial_balance
     
     # 生成唯一推荐码
     referral_code = generate_referral_code()
     while True:
-        check = db.table("users").select("id").eq("referral_code", referral_code).execute()
+        check = await db.table("users").select("id").eq("referral_code", referral_code).execute()
         if not check.data:
             break
         referral_code = generate_referral_code()
@@ -141,11 +213,10 @@ async def register(user_data: UserCreate, db: Client = Depends(get_db)):
     # 处理邀请码
     referrer_id = None
     if user_data.invite_code:
-        referrer_result = db.table("users").select("id").eq("referral_code", user_data.invite_code).execute()
+        referrer_result = await db.table("users").select("id").eq("referral_code", user_data.invite_code).execute()
         if referrer_result.data:
             referrer_id = referrer_result.data[0]["id"]
-            # 更新推荐人的邀请计数
-            db.table("users").update({"invited_count": db.table("users").select("invited_count").eq("id", referrer_id).execute().data[0]["invited_count"] + 1}).eq("id", referrer_id).execute()
+            # 推荐人的 invited_count 由 users 插入触发器原子累加 (migrations/0003)
     
     # 哈希密码
     hashed_password = get_password_hash(user_data.password)
@@ -161,39 +232,33 @@ async def register(user_data: UserCreate, db: Client = Depends(get_db)):
         "referral_code": referral_code,
         "referrer_id": referrer_id,
         "invited_count": 0,
-        "liked_task_ids": [],
         "role": "user",
         "theme": "gold",
         "is_banned": False,
         "registration_date": datetime.now().isoformat()
     }
     
-    result = db.table("users").insert(new_user_data).execute()
+    result = await db.table("users").insert(new_user_data).execute()
     
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create user")
     
     new_user = result.data[0]
     user_id = new_user["id"]
+    invalidate_user_profile(referrer_id)
     
-    # 获取欢迎消息配置
-    welcome_msg = "Welcome to RuangGamer. Bind your phone number in profile to secure your account."
-    welcome_config = db.table("system_config").select("value").eq("key", "welcome_message").execute()
-    if welcome_config.data and welcome_config.data[0]["value"]:
-        welcome_msg = welcome_config.data[0]["value"]
-
     # 创建欢迎消息
-    db.table("messages").insert({
+    await db.table("messages").insert({
         "user_id": user_id,
         "title": "Welcome!",
-        "content": welcome_msg,
+        "content": system_config.welcome_message,
         "read": False,
         "date": datetime.now().isoformat()
     }).execute()
     
     # 如果有初始余额，创建交易记录
     if initial_balance > 0:
-        db.table("transactions").insert({
+        await db.table("transactions").insert({
             "user_id": user_id,
             "type": "system_bonus",
             "amount": initial_balance,
@@ -216,6 +281,8 @@ async def register(user_data: UserCreate, db: Client = Depends(get_db)):
         import logging
         logging.getLogger(__name__).error(f"Failed to trigger FB CAPI registration: {fb_err}")
     
-    user_response = convert_db_user_to_response(new_user, db)
+    # 欢迎消息和注册奖励已写入，重新加载资料以得到准确的计数
+    profile = await fetch_user_profile(db, user_id)
+    user_response = convert_db_user_to_response(profile)
     
     return AuthResponse(user=user_response)
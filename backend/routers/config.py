@@ -3,11 +3,14 @@
 处理系统配置和活动列表
 """
 
-from fastapi import APIRouter, Depends
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Request
+from supabase import AsyncClient
 
 from database import get_db
 from schemas import SystemConfig, Activity, InitialDataResponse
+from config import get_settings
+from http_cache import Snapshot, conditional_response
+from system_config import config_registry
 from .activities import convert_db_activity
 
 router = APIRouter(tags=["配置"])
@@ -16,61 +19,17 @@ router = APIRouter(tags=["配置"])
 
 
 @router.get("/config", response_model=SystemConfig, response_model_by_alias=True)
-async def get_config(db: Client = Depends(get_db)):
+async def get_config(request: Request, db: AsyncClient = Depends(get_db)):
     """
     获取系统配置 (精简版，不含大数据块)
+    读取配置注册表，支持 If-None-Match，配置未变化时返回 304
     """
-    result = db.table("system_config").select("*").execute()
-    
-    config = {
-        "initialBalance": {},
-        "minWithdrawAmount": {},
-        "telegramLinks": {},
-        "customerServiceLinks": {},
-        "hypeLevel": 5,
-        "helpContent": "",
-        "aboutContent": "",
-        "vipConfig": {},
-        "misiExampleImage": {},
-        "welcomeMessage": "",
-        "promoVideoUrl": ""
-    }
-    
-    for item in (result.data or []):
-        key = item["key"]
-        value = item["value"]
-        
-        if key == "initial_balance":
-            config["initialBalance"] = value
-        elif key in ["min_withdraw_amount", "min_withdrawal"]:
-            if key == "min_withdrawal" or "minWithdrawAmount" not in config or not config["minWithdrawAmount"]:
-                config["minWithdrawAmount"] = value
-        elif key == "telegram_links":
-            config["telegramLinks"] = value
-        elif key == "customer_service_links":
-            config["customerServiceLinks"] = value
-        elif key == "hype_level":
-            config["hypeLevel"] = int(value) if isinstance(value, (int, str)) else 5
-        elif key == "vip_config":
-            config["vipConfig"] = value
-        elif key == "misi_example_image":
-            config["misiExampleImage"] = value
-        elif key == "welcome_message":
-            config["welcomeMessage"] = value if isinstance(value, str) else str(value).strip('"')
-        elif key in ["promo_video_url", "promoVideoUrl"]:
-            # Robust extraction: ensure it's a string and not JSON-encoded string
-            raw_val = value if isinstance(value, str) else str(value)
-            config["promoVideoUrl"] = raw_val.strip('"').strip()
-        elif key == "help_content":
-            config["helpContent"] = value
-        elif key == "about_content":
-            config["aboutContent"] = value
-    
-    return config
+    snapshot = await config_registry.get(db)
+    return conditional_response(request, snapshot.representation)
 
 
 @router.get("/config/{key}", response_model=dict)
-async def get_config_item(key: str, db: Client = Depends(get_db)):
+async def get_config_item(key: str, db: AsyncClient = Depends(get_db)):
     """获取单个配置项 (用于拉取大数据块如 help_content)"""
     # 映射前端 key 为数据库 key
     key_map = {
@@ -79,37 +38,36 @@ async def get_config_item(key: str, db: Client = Depends(get_db)):
         "misiExampleImage": "misi_example_image"
     }
     db_key = key_map.get(key, key)
-    result = db.table("system_config").select("value").eq("key", db_key).execute()
-    if not result.data:
+    snapshot = await config_registry.get(db)
+    if db_key not in snapshot.raw:
         return {"key": key, "value": ""}
-    return {"key": key, "value": result.data[0]["value"]}
+    return {"key": key, "value": snapshot.raw[db_key]}
 
 
 @router.get("/activities", response_model=list[Activity], response_model_by_alias=True)
-async def get_activities(db: Client = Depends(get_db)):
+async def get_activities(db: AsyncClient = Depends(get_db)):
     """获取所有活动列表 (完整版)"""
-    result = db.table("activities").select("*").eq("active", True).execute()
+    result = await db.table("activities").select("*").eq("active", True).execute()
     return [convert_db_activity(a) for a in (result.data or [])]
 
 
 @router.get("/activities/{activity_id}", response_model=Activity, response_model_by_alias=True)
-async def get_activity_detail(activity_id: str, db: Client = Depends(get_db)):
+async def get_activity_detail(activity_id: str, db: AsyncClient = Depends(get_db)):
     """获取活动详情"""
-    result = db.table("activities").select("*").eq("id", activity_id).execute()
+    result = await db.table("activities").select("*").eq("id", activity_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Activity not found")
     return convert_db_activity(result.data[0])
 
 
-@router.get("/initial-data", response_model=InitialDataResponse, response_model_by_alias=True)
-async def get_initial_data(db: Client = Depends(get_db)):
+async def build_initial_data(db: AsyncClient) -> dict:
     """
-    获取初始数据 (精简版)
+    查询初始数据 (精简版平台列表 + 活动)
     """
     from .tasks import convert_db_platform
     
     # 获取平台 (精简版)
-    platforms_result = db.table("platforms").select("id, name, name_color, logo_url, description, desc_color, download_link, first_deposit_amount, reward_amount, is_hot, is_pinned, remaining_qty, total_qty, likes, status, type").eq("status", "online").order("is_pinned", desc=True).order("created_at", desc=True).execute()
+    platforms_result = await db.table("platforms").select("id, name, name_color, logo_url, description, desc_color, download_link, first_deposit_amount, reward_amount, is_hot, is_pinned, remaining_qty, total_qty, likes, status, type").eq("status", "online").order("is_pinned", desc=True).order("created_at", desc=True).execute()
     
     # 模拟 convert_db_platform 但不包含 steps 和 rules
     platforms = []
@@ -134,7 +92,7 @@ async def get_initial_data(db: Client = Depends(get_db)):
         })
     
     # 获取活动 (包含 content 字段以便前端展示详情)
-    activities_result = db.table("activities").select("*").eq("active", True).execute()
+    activities_result = await db.table("activities").select("*").eq("active", True).execute()
     activities = [convert_db_activity(a, slim=False) for a in (activities_result.data or [])]
     
     return {
@@ -143,8 +101,41 @@ async def get_initial_data(db: Client = Depends(get_db)):
     }
 
 
+# /api/initial-data 物化快照 (预序列化 + 预压缩)
+# 目录只在管理员编辑任务/活动时变化，由对应的增删改接口调用 refresh_initial_data 重建
+initial_data_snapshot = Snapshot(
+    "initial_data",
+    build_initial_data,
+    InitialDataResponse,
+    max_age=get_settings().initial_data_snapshot_max_age,
+)
+
+
+async def refresh_initial_data(db: AsyncClient) -> None:
+    """任务/活动变更后重建初始数据快照"""
+    await initial_data_snapshot.rebuild(db)
+
+
+def invalidate_initial_data() -> None:
+    """
+    标记初始数据快照过期，由下一次读取重建
+    用于用户领取任务 (剩余库存变化) 这类高频写操作，不在写请求中重建快照
+    """
+    initial_data_snapshot.invalidate()
+
+
+@router.get("/initial-data", response_model=InitialDataResponse, response_model_by_alias=True)
+async def get_initial_data(request: Request, db: AsyncClient = Depends(get_db)):
+    """
+    获取初始数据 (精简版)
+    读取内存中的快照，支持 If-None-Match 与 gzip
+    """
+    rep = await initial_data_snapshot.get(db)
+    return conditional_response(request, rep)
+
+
 @router.post("/config", response_model=SystemConfig, response_model_by_alias=True)
-async def update_config(config: SystemConfig, db: Client = Depends(get_db)):
+async def update_config(config: SystemConfig, db: AsyncClient = Depends(get_db)):
     """
     更新系统配置
     接收完整配置对象，更新对应的 key-value
@@ -168,9 +159,10 @@ async def update_config(config: SystemConfig, db: Client = Depends(get_db)):
         {"key": "promo_video_url", "value": config_dict.get("promoVideoUrl") or ""}
     ]
 
-    for item in updates:
-        # 使用 upsert 更新或插入配置项
-        db.table("system_config").upsert(item, on_conflict="key").execute()
-        
+    # 一次 RPC 批量 upsert 全部配置项并递增配置版本号 (同一事务，不会出现写了一半的配置)
+    await db.rpc("save_system_config", {"p_items": updates}).execute()
+
+    config_registry.invalidate()
+
     return config
 
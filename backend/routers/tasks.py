@@ -3,17 +3,27 @@
 处理平台任务的获取、开始、点赞等
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-from supabase import Client
+from supabase import AsyncClient
 from datetime import datetime
-import uuid
 import json
+import logging
 
+import httpx
+
+from config import get_settings
 from database import get_db
-from schemas import Platform, UserResponse, UserTask, TaskStep
-from routers.auth import convert_db_user_to_response
+from schemas import Platform, UserTask, TaskStep, LikeAck
+from http_cache import cached_representation, conditional_response, invalidate_catalog
+from like_buffer import like_buffer
+from media import offload_image
+from uploads import UploadTooLarge, UnsupportedUpload, get_uploader, store_upload
+from routers.config import invalidate_initial_data, refresh_initial_data
+from routers.auth import invalidate_user_profile
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/tasks", tags=["任务"])
 
@@ -110,131 +120,111 @@ def convert_db_platform(p: dict) -> dict:
     }
 
 
+async def build_task_list(db: AsyncClient) -> list[dict]:
+    """查询上线中的平台并转换为 API 格式"""
+    result = await db.table("platforms").select("*").eq("status", "online").order("is_pinned", desc=True).order("created_at", desc=True).execute()
+    
+    return [convert_db_platform(p) for p in (result.data or [])]
+
+
 @router.get("", response_model=list[Platform], response_model_by_alias=True)
-async def get_tasks(db: Client = Depends(get_db)):
+async def get_tasks(request: Request, db: AsyncClient = Depends(get_db)):
     """
     获取所有平台/任务列表
+    支持 If-None-Match，列表未变化时返回 304
     """
-    result = db.table("platforms").select("*").eq("status", "online").order("is_pinned", desc=True).order("created_at", desc=True).execute()
-    
-    return [convert_db_platform(p) for p in (result.data or [])]
+    rep = await cached_representation("tasks", lambda: build_task_list(db), list[Platform])
+    return conditional_response(request, rep)
 
 
 @router.get("/{platform_id}", response_model=Platform, response_model_by_alias=True)
-async def get_task_detail(platform_id: str, db: Client = Depends(get_db)):
+async def get_task_detail(platform_id: str, db: AsyncClient = Depends(get_db)):
     """获取平台/任务详情 (包含 steps 和 rules)"""
-    result = db.table("platforms").select("*").eq("id", platform_id).execute()
+    result = await db.table("platforms").select("*").eq("id", platform_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Platform not found")
     return convert_db_platform(result.data[0])
 
 
+# claim_task 返回的失败状态 -> (HTTP 状态码, 错误信息)
+CLAIM_ERRORS = {
+    "user_not_found": (404, "User not found"),
+    "platform_not_found": (404, "Platform not found"),
+    "sold_out": (400, "Task sold out"),
+    "already_taken": (400, "Task already taken"),
+}
+
+
 @router.post("/{platform_id}/start", response_model=UserTask, response_model_by_alias=True)
-async def start_task(platform_id: str, user_id: str, db: Client = Depends(get_db)):
+async def start_task(platform_id: str, user_id: str, db: AsyncClient = Depends(get_db)):
     """
     开始任务
     用户领取指定平台的任务
+    库存扣减和任务创建由数据库函数 claim_task 原子完成，并发领取不会超卖
     """
-    # 获取用户
-    user_result = db.table("users").select("*").eq("id", user_id).execute()
-    if not user_result.data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # 获取平台
-    platform_result = db.table("platforms").select("*").eq("id", platform_id).execute()
-    if not platform_result.data:
-        raise HTTPException(status_code=404, detail="Platform not found")
+    result = await db.rpc("claim_task", {"p_user_id": user_id, "p_platform_id": platform_id}).execute()
+    outcome = result.data or {}
+    status = outcome.get("status")
     
-    platform = platform_result.data[0]
+    if status in CLAIM_ERRORS:
+        code, detail = CLAIM_ERRORS[status]
+        raise HTTPException(status_code=code, detail=detail)
     
-    # 检查剩余数量
-    if platform.get("remaining_qty", 0) <= 0:
-        raise HTTPException(status_code=400, detail="Task sold out")
+    if status != "ok":
+        raise HTTPException(status_code=500, detail="Failed to create task")
     
-    # 检查是否已领取
-    existing_task = db.table("user_tasks").select("id").eq("user_id", user_id).eq("platform_id", platform_id).execute()
-    if existing_task.data:
-        raise HTTPException(status_code=400, detail="Task already taken")
+    # 进行中任务计数已变化
+    invalidate_user_profile(user_id)
+    # 剩余库存 (remainingQty) 已变化: 任务目录失效，初始数据快照标记过期 (由下一次读取重建)
+    invalidate_catalog("tasks")
+    invalidate_initial_data()
     
-    # 创建用户任务
-    new_task = {
-        "user_id": user_id,
-        "platform_id": platform_id,
-        "platform_name": platform["name"],
-        "logo_url": platform["logo_url"],
-        "reward_amount": platform["reward_amount"],
-        "status": "ongoing",
-        "start_time": datetime.now().isoformat()
+    t = outcome["task"]
+    return {
+        "id": t["id"],
+        "platformId": t["platform_id"],
+        "platformName": t["platform_name"],
+        "logoUrl": t["logo_url"],
+        "rewardAmount": float(t["reward_amount"]),
+        "status": t["status"],
+        "startTime": t["start_time"]
     }
-    
-    task_result = db.table("user_tasks").insert(new_task).execute()
-    
-    # 减少剩余数量
-    new_qty = platform.get("remaining_qty", 0) - 1
-    db.table("platforms").update({"remaining_qty": new_qty}).eq("id", platform_id).execute()
-    
-    if task_result.data:
-        t = task_result.data[0]
-        return {
-            "id": t["id"],
-            "platformId": t["platform_id"],
-            "platformName": t["platform_name"],
-            "logoUrl": t["logo_url"],
-            "rewardAmount": float(t["reward_amount"]),
-            "status": t["status"],
-            "startTime": t["start_time"]
-        }
-    
-    raise HTTPException(status_code=500, detail="Failed to create task")
 
 
-@router.post("/{platform_id}/like", response_model=UserResponse, response_model_by_alias=True)
-async def like_task(platform_id: str, user_id: str, db: Client = Depends(get_db)):
+@router.post("/{platform_id}/like", response_model=LikeAck, response_model_by_alias=True)
+async def like_task(platform_id: str, user_id: str, db: AsyncClient = Depends(get_db)):
     """
     点赞任务
-    每个用户每个任务只能点赞一次
+    每个用户每个任务只能点赞一次 (user_likes 主键保证)
+    平台点赞数进入内存缓冲，定期批量写回 (缓冲未启动时直接写入)
     """
-    # 获取用户
-    user_result = db.table("users").select("*").eq("id", user_id).execute()
-    if not user_result.data:
+    result = await db.rpc("like_platform", {"p_user_id": user_id, "p_platform_id": platform_id}).execute()
+    status = result.data
+
+    if status == "user_not_found":
         raise HTTPException(status_code=404, detail="User not found")
-    
-    user = user_result.data[0]
-    
-    # 获取平台
-    platform_result = db.table("platforms").select("*").eq("id", platform_id).execute()
-    if not platform_result.data:
+    if status == "platform_not_found":
         raise HTTPException(status_code=404, detail="Platform not found")
-    
-    platform = platform_result.data[0]
-    
-    # 检查是否已点赞
-    liked_ids = user.get("liked_task_ids") or []
-    if platform_id in liked_ids:
-        # 已点赞，直接返回用户数据
-        return convert_db_user_to_response(user, db)
-    
-    # 添加点赞
-    liked_ids.append(platform_id)
-    db.table("users").update({"liked_task_ids": liked_ids}).eq("id", user_id).execute()
-    
-    # 增加平台点赞数
-    new_likes = (platform.get("likes") or 0) + 1
-    db.table("platforms").update({"likes": new_likes}).eq("id", platform_id).execute()
-    
-    # 返回更新后的用户数据
-    updated_user = db.table("users").select("*").eq("id", user_id).execute().data[0]
-    
-    return convert_db_user_to_response(updated_user, db)
+
+    if status == "liked":
+        await like_buffer.record(db, platform_id)
+        invalidate_user_profile(user_id)
+
+    return LikeAck(platformId=platform_id, liked=True, alreadyLiked=status == "already_liked")
 
 
 @router.post("", response_model=Platform, response_model_by_alias=True)
-async def create_task(task: TaskCreate, db: Client = Depends(get_db)):
-    """创建新任务"""
+async def create_task(task: TaskCreate, db: AsyncClient = Depends(get_db)):
+    """创建新任务 (内联 base64 logo 先外置到 Storage)"""
+    try:
+        logo_url = await offload_image(db, task.logoUrl, "platforms")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     new_task = {
         "name": task.name,
         "name_color": task.nameColor,
-        "logo_url": task.logoUrl,
+        "logo_url": logo_url,
         "description": task.description,
         "desc_color": task.descColor,
         "download_link": task.downloadLink,
@@ -251,21 +241,28 @@ async def create_task(task: TaskCreate, db: Client = Depends(get_db)):
         "likes": 0
     }
     
-    result = db.table("platforms").insert(new_task).execute()
+    result = await db.table("platforms").insert(new_task).execute()
     
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create task")
         
+    invalidate_catalog("tasks")
+    await refresh_initial_data(db)
+
     return convert_db_platform(result.data[0])
 
 
 @router.patch("/{task_id}", response_model=Platform, response_model_by_alias=True)
-async def update_task(task_id: str, task: TaskUpdate, db: Client = Depends(get_db)):
-    """更新任务"""
+async def update_task(task_id: str, task: TaskUpdate, db: AsyncClient = Depends(get_db)):
+    """更新任务 (内联 base64 logo 先外置到 Storage)"""
     updates = {}
     if task.name is not None: updates["name"] = task.name
     if task.nameColor is not None: updates["name_color"] = task.nameColor
-    if task.logoUrl is not None: updates["logo_url"] = task.logoUrl
+    if task.logoUrl is not None:
+        try:
+            updates["logo_url"] = await offload_image(db, task.logoUrl, "platforms")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     if task.description is not None: updates["description"] = task.description
     if task.descColor is not None: updates["desc_color"] = task.descColor
     if task.downloadLink is not None: updates["download_link"] = task.downloadLink
@@ -284,77 +281,75 @@ async def update_task(task_id: str, task: TaskUpdate, db: Client = Depends(get_d
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = db.table("platforms").update(updates).eq("id", task_id).execute()
+    result = await db.table("platforms").update(updates).eq("id", task_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Task not found")
         
+    invalidate_catalog("tasks")
+    await refresh_initial_data(db)
+
     return convert_db_platform(result.data[0])
 
 
 @router.delete("/{task_id}")
-async def delete_task(task_id: str, db: Client = Depends(get_db)):
+async def delete_task(task_id: str, db: AsyncClient = Depends(get_db)):
     """删除任务"""
-    result = db.table("platforms").delete().eq("id", task_id).execute()
+    result = await db.table("platforms").delete().eq("id", task_id).execute()
     
     if not result.data:
         # 可能是 Supabase 的 delete 返回空 data，或者未找到
         # 先检查是否存在
-        exists = db.table("platforms").select("id").eq("id", task_id).execute()
+        exists = await db.table("platforms").select("id").eq("id", task_id).execute()
         if exists.data:
              raise HTTPException(status_code=500, detail="Failed to delete task")
         else:
              raise HTTPException(status_code=404, detail="Task already deleted or not found")
         
+    invalidate_catalog("tasks")
+    await refresh_initial_data(db)
+
     return {"message": "Task deleted successfully"}
 
+# 上传失败类型 -> HTTP 状态码
+UPLOAD_ERRORS = {
+    UploadTooLarge: 413,
+    UnsupportedUpload: 415,
+}
+
+
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db)):
+async def upload_file(file: UploadFile = File(...)):
     """
-    上传文件到 Supabase Storage
+    上传凭证图片到 Supabase Storage 'proofs' bucket
+    按块流式检查 (文件头识别类型、字节上限) 和上传，不把整个文件读进内存；
+    相同内容的图片只存一份 (按 sha256 命名)，重复上传直接返回已有 URL
     """
     try:
-        # 生成唯一文件名
-        file_ext = file.filename.split(".")[-1]
-        file_name = f"{uuid.uuid4()}.{file_ext}"
-        
-        # 读取文件内容
-        file_content = await file.read()
-        
-        # 上传到 Supabase Storage 'proofs' bucket
-        # 注意：需要确保 'proofs' bucket 存在且 allow public inserts
-        # 如果 bucket 不存在，这里会失败 (可以尝试创建但一般是手动)
-        
-        # 使用 storage.from_().upload()
-        res = db.storage.from_("proofs").upload(
-            file_name,
-            file_content,
-            {"content-type": file.content_type}
-        )
-        
-       
-        # 获取公开 URL
-        public_url = db.storage.from_("proofs").get_public_url(file_name)
-        
-        return {"url": public_url}
-        
-    except Exception as e:
-        print(f"Upload failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+        url, _ = await store_upload(file, get_uploader(), "proofs", get_settings().upload_max_bytes)
+    except (UploadTooLarge, UnsupportedUpload) as e:
+        raise HTTPException(status_code=UPLOAD_ERRORS[type(e)], detail=str(e))
+    except httpx.HTTPError as e:
+        logger.error(f"Upload failed: {e}")
+        raise HTTPException(status_code=502, detail="Upload failed")
+    finally:
+        await file.close()
+
+    return {"url": url}
 
 @router.post("/submit-proof")
-async def submit_proof(req: SubmitProofRequest, db: Client = Depends(get_db)):
+async def submit_proof(req: SubmitProofRequest, db: AsyncClient = Depends(get_db)):
     """
     提交任务凭证，更新状态为待审核
     支持初次提交（ongoing）和被拒绝后重新提交（rejected）
     """
     try:
         # 首先查询当前任务状态
-        task_query = db.table("user_tasks").select("*").eq("user_id", req.user_id).eq("id", req.task_id).execute()
+        task_query = await db.table("user_tasks").select("*").eq("user_id", req.user_id).eq("id", req.task_id).execute()
         
         if not task_query.data:
             # 尝试通过 platform_id 查找 (兼容逻辑)
-            task_query = db.table("user_tasks").select("*").eq("user_id", req.user_id).eq("platform_id", req.task_id).execute()
+            task_query = await db.table("user_tasks").select("*").eq("user_id", req.user_id).eq("platform_id", req.task_id).execute()
         
         if not task_query.data:
             raise HTTPException(status_code=404, detail="Task record not found")
@@ -374,10 +369,12 @@ async def submit_proof(req: SubmitProofRequest, db: Client = Depends(get_db)):
             "reject_reason": None  # 清除之前的拒绝原因
         }
         
-        result = db.table("user_tasks").update(update_data).eq("id", current_task["id"]).execute()
+        result = await db.table("user_tasks").update(update_data).eq("id", current_task["id"]).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to update task")
+        
+        invalidate_user_profile(req.user_id)
             
         return {"message": "Proof submitted successfully", "data": result.data[0]}
         
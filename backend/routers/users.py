@@ -3,64 +3,79 @@
 处理用户信息、绑定手机/银行、提现等
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from supabase import Client
-from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from supabase import AsyncClient
 
 from database import get_db
 from schemas import (
-    UserResponse, BankAccountCreate, BindPhoneRequest, WithdrawRequest,
+    UserResponse, BankAccountCreate, BindPhoneRequest, WithdrawRequest, WithdrawResponse,
     UserTransactionResponse, UserTaskResponse, PaginatedMessagesResponse
 )
-from routers.auth import convert_db_user_to_response
+from routers.auth import (
+    load_user_response, fetch_user_representation, invalidate_user_profile,
+    profile_cache, fetch_profile_version
+)
+from http_cache import conditional_response, etag_matches, not_modified, version_etag
+from pagination import after_cursor, decode_cursor, keyset_page
+from system_config import config_registry
 
 router = APIRouter(prefix="/users", tags=["用户"])
 
 
 @router.get("/{user_id}", response_model=UserResponse, response_model_by_alias=True)
-async def get_user(user_id: str, db: Client = Depends(get_db)):
+async def get_user(user_id: str, request: Request, db: AsyncClient = Depends(get_db)):
     """
     获取用户信息
+    支持 If-None-Match，资料未变化时返回 304
+    ETag 来自资料版本号: 缓存未命中时先只查版本号，匹配则不再查询完整资料和序列化
     """
-    result = db.table("users").select("*").eq("id", user_id).execute()
+    rep = profile_cache.get(user_id)
+    if rep is None:
+        if request.headers.get("if-none-match"):
+            version = await fetch_profile_version(db, user_id)
+            if version is not None and etag_matches(request, version_etag(version)):
+                return not_modified(version_etag(version))
+        rep = await fetch_user_representation(db, user_id)
     
-    if not result.data:
+    if not rep:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return convert_db_user_to_response(result.data[0], db)
+    return conditional_response(request, rep)
 
 
 @router.post("/{user_id}/bind-phone", response_model=UserResponse, response_model_by_alias=True)
-async def bind_phone(user_id: str, request: BindPhoneRequest, db: Client = Depends(get_db)):
+async def bind_phone(user_id: str, request: BindPhoneRequest, db: AsyncClient = Depends(get_db)):
     """
     绑定手机号码
     """
     # 检查用户是否存在
-    user_result = db.table("users").select("*").eq("id", user_id).execute()
+    user_result = await db.table("users").select("id").eq("id", user_id).execute()
     if not user_result.data:
         raise HTTPException(status_code=404, detail="User not found")
     
     # 检查手机号是否已被使用
-    phone_check = db.table("users").select("id").eq("phone", request.phone).neq("id", user_id).execute()
+    phone_check = await db.table("users").select("id").eq("phone", request.phone).neq("id", user_id).execute()
     if phone_check.data:
         raise HTTPException(status_code=400, detail="Phone number already used by another account")
     
     # 更新手机号
-    db.table("users").update({"phone": request.phone}).eq("id", user_id).execute()
+    await db.table("users").update({"phone": request.phone}).eq("id", user_id).execute()
     
-    # 重新获取用户数据
-    updated_user = db.table("users").select("*").eq("id", user_id).execute().data[0]
+    # 失效缓存并重新获取用户数据
+    invalidate_user_profile(user_id)
     
-    return convert_db_user_to_response(updated_user, db)
+    return await load_user_response(db, user_id)
 
 
 @router.post("/{user_id}/bind-bank", response_model=UserResponse, response_model_by_alias=True)
-async def bind_bank(user_id: str, account: BankAccountCreate, db: Client = Depends(get_db)):
+async def bind_bank(user_id: str, account: BankAccountCreate, db: AsyncClient = Depends(get_db)):
     """
     绑定银行/电子钱包账户
     """
     # 检查用户是否存在
-    user_result = db.table("users").select("*").eq("id", user_id).execute()
+    user_result = await db.table("users").select("id").eq("id", user_id).execute()
     if not user_result.data:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -73,39 +88,78 @@ async def bind_bank(user_id: str, account: BankAccountCreate, db: Client = Depen
         "type": account.type.value
     }
     
-    db.table("bank_accounts").insert(new_account).execute()
+    await db.table("bank_accounts").insert(new_account).execute()
     
-    # 返回更新后的用户数据
-    user = db.table("users").select("*").eq("id", user_id).execute().data[0]
+    # 失效缓存并返回更新后的用户数据
+    invalidate_user_profile(user_id)
     
-    return convert_db_user_to_response(user, db)
+    return await load_user_response(db, user_id)
 
 
 @router.patch("/{user_id}/messages/read")
-async def mark_messages_as_read(user_id: str, db: Client = Depends(get_db)):
-    """将用户的所有未读消息标记为已读"""
-    db.table("messages").update({"read": True}).eq("user_id", user_id).eq("read", False).execute()
+async def mark_messages_as_read(user_id: str, db: AsyncClient = Depends(get_db)):
+    """将用户的所有未读消息 (含广播) 标记为已读"""
+    await db.rpc("mark_inbox_read", {"p_user_id": user_id}).execute()
+    invalidate_user_profile(user_id)
     return {"message": "All messages marked as read"}
 
 
+def _with_total(cursor: Optional[str], with_total: Optional[bool]) -> bool:
+    """未显式指定时只在第一页返回总数 (后续翻页不再重复计数)"""
+    return cursor is None if with_total is None else with_total
+
+
+async def _history_page(query, column: str, page: int, per_page: int, cursor: Optional[str]):
+    """
+    用户历史记录翻页，返回 (当前页, 下一页游标, 总数)
+    传 cursor 时按 (column, id) 游标取下一页；未传时按 page 偏移 (兼容旧客户端，第一页即 OFFSET 0)
+    总数与数据在同一请求中返回 (未请求总数时为 None)
+    """
+    query = query.order(column, desc=True).order("id", desc=True)
+    if cursor:
+        query = after_cursor(query, column, cursor).limit(per_page + 1)
+    else:
+        start = (page - 1) * per_page
+        query = query.range(start, start + per_page)
+    result = await query.execute()
+    rows, next_cursor = keyset_page(result.data or [], per_page, column)
+    return rows, next_cursor, result.count
+
+
 @router.get("/{user_id}/transactions", response_model=UserTransactionResponse, response_model_by_alias=True)
-async def get_user_transactions(user_id: str, page: int = 1, per_page: int = 20, db: Client = Depends(get_db)):
-    """获取用户交易记录 (分页)"""
-    start = (page - 1) * per_page
-    end = start + per_page - 1
-    result = db.table("transactions").select("*").eq("user_id", user_id).order("date", desc=True).range(start, end).execute()
-    count_res = db.table("transactions").select("id", count="exact").eq("user_id", user_id).execute()
-    total = count_res.count if hasattr(count_res, 'count') else 0
-    return {"transactions": result.data, "total": total, "page": page, "perPage": per_page}
+async def get_user_transactions(
+    user_id: str,
+    page: int = 1,
+    per_page: int = 20,
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    db: AsyncClient = Depends(get_db),
+):
+    """获取用户交易记录 (游标分页，nextCursor 为空表示没有更多)"""
+    count = "exact" if _with_total(cursor, with_total) else None
+    query = db.table("transactions").select("*", count=count).eq("user_id", user_id)
+    rows, next_cursor, total = await _history_page(query, "date", page, per_page, cursor)
+    return {
+        "transactions": rows,
+        "total": total,
+        "page": None if cursor else page,
+        "perPage": per_page,
+        "nextCursor": next_cursor,
+    }
 
 @router.get("/{user_id}/tasks", response_model=UserTaskResponse, response_model_by_alias=True)
-async def get_user_tasks(user_id: str, page: int = 1, per_page: int = 20, db: Client = Depends(get_db)):
-    """获取用户任务记录 (分页)"""
-    start = (page - 1) * per_page
-    end = start + per_page - 1
-    result = db.table("user_tasks").select("*").eq("user_id", user_id).order("start_time", desc=True).range(start, end).execute()
-    count_res = db.table("user_tasks").select("id", count="exact").eq("user_id", user_id).execute()
-    total = count_res.count if hasattr(count_res, 'count') else 0
+async def get_user_tasks(
+    user_id: str,
+    page: int = 1,
+    per_page: int = 20,
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    db: AsyncClient = Depends(get_db),
+):
+    """获取用户任务记录 (游标分页，nextCursor 为空表示没有更多)"""
+    count = "exact" if _with_total(cursor, with_total) else None
+    query = db.table("user_tasks").select("*", count=count).eq("user_id", user_id)
+    rows, next_cursor, total = await _history_page(query, "start_time", page, per_page, cursor)
     
     tasks = [
         {
@@ -120,18 +174,41 @@ async def get_user_tasks(user_id: str, page: int = 1, per_page: int = 20, db: Cl
             "proofImageUrl": t.get("proof_image_url"),
             "rejectReason": t.get("reject_reason")
         }
-        for t in (result.data or [])
+        for t in rows
     ]
-    return {"tasks": tasks, "total": total, "page": page, "perPage": per_page}
+    return {
+        "tasks": tasks,
+        "total": total,
+        "page": None if cursor else page,
+        "perPage": per_page,
+        "nextCursor": next_cursor,
+    }
 
 @router.get("/{user_id}/messages", response_model=PaginatedMessagesResponse, response_model_by_alias=True)
-async def get_user_messages(user_id: str, page: int = 1, per_page: int = 20, db: Client = Depends(get_db)):
-    """获取用户消息 (分页)"""
-    start = (page - 1) * per_page
-    end = start + per_page - 1
-    result = db.table("messages").select("*").eq("user_id", user_id).order("date", desc=True).range(start, end).execute()
-    count_res = db.table("messages").select("id", count="exact").eq("user_id", user_id).execute()
-    total = count_res.count if hasattr(count_res, 'count') else 0
+async def get_user_messages(
+    user_id: str,
+    page: int = 1,
+    per_page: int = 20,
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    db: AsyncClient = Depends(get_db),
+):
+    """
+    获取用户消息 (游标分页)
+    个人消息与全员广播由数据库函数 user_inbox 合并排序，按 (date, id) 游标一次往返返回当前页 (和总数)
+    """
+    params = {
+        "p_user_id": user_id,
+        "p_limit": per_page + 1,
+        "p_with_total": _with_total(cursor, with_total),
+    }
+    if cursor:
+        params["p_before_date"], params["p_before_id"] = decode_cursor(cursor)
+    else:
+        params["p_offset"] = (page - 1) * per_page
+    result = await db.rpc("user_inbox", params).execute()
+    inbox = result.data or {}
+    page_rows, next_cursor = keyset_page(inbox.get("messages", []), per_page, "date")
     
     messages = [
         {
@@ -143,73 +220,61 @@ async def get_user_messages(user_id: str, page: int = 1, per_page: int = 20, db:
             "read": m["read"],
             "rewardAmount": m.get("reward_amount")
         }
-        for m in (result.data or [])
+        for m in page_rows
     ]
-    return {"messages": messages, "total": total}
+    return {"messages": messages, "total": inbox.get("total"), "nextCursor": next_cursor}
 
-@router.post("/{user_id}/withdraw", response_model=UserResponse, response_model_by_alias=True)
-async def withdraw(user_id: str, request: WithdrawRequest, db: Client = Depends(get_db)):
+# request_withdrawal 返回的失败状态 -> HTTP 错误
+WITHDRAW_ERRORS = {
+    "user_not_found": (404, "User not found"),
+    "phone_required": (400, "Please bind phone number first"),
+    "invalid_account": (400, "Invalid bank account selected"),
+    "insufficient_balance": (400, "Insufficient balance"),
+}
+
+
+@router.post("/{user_id}/withdraw", response_model=WithdrawResponse, response_model_by_alias=True)
+async def withdraw(user_id: str, request: WithdrawRequest, db: AsyncClient = Depends(get_db)):
     """
     提现申请
+    余额校验、扣款和提现流水由数据库函数 request_withdrawal 原子完成；
+    携带相同 idempotencyKey 的重试不会重复扣款
     """
-    # 获取用户
-    user_result = db.table("users").select("*").eq("id", user_id).execute()
-    if not user_result.data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user = user_result.data[0]
-    
-    # 获取最低提现金额配置
-    # 优先检查用户提到的 min_withdrawal，兼容旧的 min_withdraw_amount
-    config_result = db.table("system_config").select("key, value").in_("key", ["min_withdrawal", "min_withdraw_amount"]).execute()
-    
-    min_withdraw = 50000  # 默认值
-    if config_result.data:
-        # 按照优先级查找
-        configs = {item["key"]: item["value"] for item in config_result.data}
-        val_obj = configs.get("min_withdrawal") or configs.get("min_withdraw_amount")
-        if val_obj:
-            # 兼容 {"id": 100000} 这种奇怪的格式，或者直接是数字
-            if isinstance(val_obj, dict):
-                min_withdraw = val_obj.get("id") or val_obj.get("value") or 50000
-            else:
-                try:
-                    min_withdraw = float(val_obj)
-                except:
-                    min_withdraw = 50000
+    # 获取最低提现金额配置 (配置注册表，无需查询数据库)
+    min_withdraw = (await config_registry.get(db)).min_withdrawal
     
     # 验证最低提现金额
     if request.amount < min_withdraw:
         raise HTTPException(status_code=400, detail=f"Minimum withdrawal is {min_withdraw}")
     
-    if float(user["balance"]) < request.amount:
-        raise HTTPException(status_code=400, detail="Insufficient balance")
-    
-    if not user.get("phone"):
-        raise HTTPException(status_code=400, detail="Please bind phone number first")
-    
-    # 验证银行账户
-    account_result = db.table("bank_accounts").select("*").eq("id", request.account_id).eq("user_id", user_id).execute()
-    if not account_result.data:
-        raise HTTPException(status_code=400, detail="Invalid bank account selected")
-    
-    bank_account = account_result.data[0]
-    
-    # 扣除余额
-    new_balance = float(user["balance"]) - request.amount
-    db.table("users").update({"balance": new_balance}).eq("id", user_id).execute()
-    
-    # 创建提现交易记录
-    db.table("transactions").insert({
-        "user_id": user_id,
-        "type": "withdraw",
-        "amount": -request.amount,
-        "description": f"Withdraw to {bank_account['bank_name']} ({bank_account['account_number']})",
-        "status": "pending",
-        "date": datetime.now().isoformat()
+    result = await db.rpc("request_withdrawal", {
+        "p_user_id": user_id,
+        "p_account_id": request.account_id,
+        "p_amount": request.amount,
+        "p_idempotency_key": request.idempotency_key,
     }).execute()
+    outcome = result.data or {}
+    
+    status = outcome.get("status")
+    if status in WITHDRAW_ERRORS:
+        code, detail = WITHDRAW_ERRORS[status]
+        raise HTTPException(status_code=code, detail=detail)
+    if status != "ok":
+        raise HTTPException(status_code=500, detail="Withdrawal failed")
     
-    # 返回更新后的用户数据
-    updated_user = db.table("users").select("*").eq("id", user_id).execute().data[0]
+    if not outcome.get("replayed"):
+        invalidate_user_profile(user_id)
     
-    return convert_db_user_to_response(updated_user, db)
+    tx = outcome["transaction"]
+    return WithdrawResponse(
+        balance=float(outcome["balance"]),
+        transaction={
+            "id": tx["id"],
+            "type": tx["type"],
+            "amount": float(tx["amount"]),
+            "description": tx["description"],
+            "status": tx["status"],
+            "date": tx["date"],
+        },
+        replayed=outcome.get("replayed", False),
+    )
@@ -0,0 +1,25 @@
+"""
+执行所有未完成的后台任务 (jobs 表中 pending/running 的行) 直到结束
+
+serverless 部署中没有常驻进程执行任务；没有人轮询进度时，由定时任务 (cron) 运行本脚本推进。
+多个实例同时推进同一任务是安全的 (每批由数据库行锁串行化)。
+
+使用方法:
+    cd backend
+    python run_jobs.py
+"""
+
+import asyncio
+
+from jobs import job_runner
+
+
+async def run_jobs():
+    count = await job_runner.resume()
+    await job_runner.drain()
+    print(f"Background jobs processed: {count}")
+    return count
+
+
+if __name__ == "__main__":
+    asyncio.run(run_jobs())
@@ -25,6 +25,7 @@ class TransactionType(str, Enum):
     TASK_REWARD = "task_reward"
     REFERRAL_BONUS = "referral_bonus"
     WITHDRAW = "withdraw"
+    WITHDRAW_REFUND = "withdraw_refund"
     SYSTEM_BONUS = "system_bonus"
     ADMIN_GIFT = "admin_gift"
     VIP_BONUS = "vip_bonus"
@@ -356,6 +357,17 @@ class InitialDataResponse(BaseModel):
     activities: list[Activity]
 
 
+class LikeAck(BaseModel):
+    """点赞结果 (轻量确认，不返回完整用户资料)"""
+    platform_id: str = Field(..., alias="platformId")
+    liked: bool = True
+    already_liked: bool = Field(False, alias="alreadyLiked")
+
+    model_config = ConfigDict(
+        populate_by_name=True
+    )
+
+
 class ConfigItemResponse(BaseModel):
     """用于动态获取单个配置项内容"""
     key: str
@@ -369,15 +381,26 @@ class BindPhoneRequest(BaseModel):
 class WithdrawRequest(BaseModel):
     amount: float
     account_id: str = Field(..., alias="accountId")
+    # 客户端生成的幂等键，重试同一次提现时保持不变
+    idempotency_key: Optional[str] = Field(None, alias="idempotencyKey", max_length=64)
 
     model_config = ConfigDict(
         populate_by_name=True
     )
 
 
+class WithdrawResponse(BaseModel):
+    """提现结果: 扣款后的余额和生成的提现流水"""
+    balance: float
+    transaction: Transaction
+    replayed: bool = False
+
+
 class AdminMessageResponse(Message):
-    user_id: str = Field(..., alias="userId")
+    # 全员广播没有接收用户
+    user_id: Optional[str] = Field(None, alias="userId")
     user_phone: Optional[str] = Field(None, alias="userPhone")
+    is_broadcast: bool = Field(False, alias="isBroadcast")
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -387,19 +410,25 @@ class AdminMessageResponse(Message):
 
 class PaginatedMessagesResponse(BaseModel):
     messages: list[AdminMessageResponse]
-    total: int
+    # 游标分页时只有第一页 (或显式 with_total=true) 返回总数
+    total: Optional[int] = None
+    # 后台列表的 total 为规划器估算值时为 True
+    total_approximate: bool = Field(False, alias="totalApproximate")
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
 
 class UserTransactionResponse(BaseModel):
     transactions: list[Transaction]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int = Field(..., alias="perPage")
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
 
 class UserTaskResponse(BaseModel):
     tasks: list[UserTask]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int = Field(..., alias="perPage")
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
 
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,75 @@
+"""
+后台用户搜索
+- 对 email / phone / referral_code 做 ILIKE 子串匹配 (pg_trgm GIN 索引)；
+  手机号前缀匹配的结果是其子集，因此手机号样式的输入也走同一查询，不会漏掉 email / 推荐码中含这些数字的用户
+- UUID 输入额外精确匹配 id
+- 最近的结果页短暂缓存，翻页/重复搜索不重复查询
+"""
+
+import re
+import uuid
+from typing import Any, Optional
+
+from cache import TTLCache
+from config import get_settings
+
+
+# PostgREST or 过滤语法中的保留字符，以及 LIKE 通配符
+_RESERVED = re.compile(r'[,()"\\%_*]')
+
+search_cache = TTLCache("user_search", maxsize=256, ttl=get_settings().user_search_cache_ttl)
+
+
+def normalize_term(term: str) -> str:
+    """去掉首尾空白和会破坏过滤语法/充当通配符的字符"""
+    return _RESERVED.sub("", term.strip())
+
+
+def _is_uuid(term: str) -> bool:
+    try:
+        uuid.UUID(term)
+        return True
+    except ValueError:
+        return False
+
+
+def substring_filter(term: str) -> str:
+    """email / phone / referral_code 子串匹配 (UUID 时加上 id 精确匹配) 的 or 过滤表达式"""
+    conditions = [
+        f"email.ilike.%{term}%",
+        f"phone.ilike.%{term}%",
+        f"referral_code.ilike.%{term}%",
+    ]
+    # id 是 UUID 类型，不支持 ilike 模糊查询
+    if _is_uuid(term):
+        conditions.append(f"id.eq.{term}")
+    return ",".join(conditions)
+
+
+async def search_users(
+    db: Any,
+    term: str,
+    select: str,
+    start: int,
+    end: int,
+    count: Optional[str] = "exact",
+) -> tuple[list, int]:
+    """
+    搜索用户，返回 (当前页行, 总数)
+    count 为 PostgREST 计数方式 (exact / planned / None)，由调用方的总数策略决定
+    结果按 created_at 倒序；(term, select, start, end, count) 相同的请求在缓存 TTL 内直接返回
+    """
+    term = normalize_term(term)
+    key = (term, select, start, end, count)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    query = db.table("users").select(select, count=count)
+    if term:
+        query = query.or_(substring_filter(term))
+    result = await query.order("created_at", desc=True).range(start, end).execute()
+
+    page = (result.data or [], result.count or 0)
+    search_cache.set(key, page)
+    return page
@@ -0,0 +1,176 @@
+"""
+系统配置注册表
+一次加载全部 system_config 行，解析为带类型的值并缓存在进程内，
+热路径 (提现、注册、/api/config) 不再单独查询配置表；写入配置后调用 invalidate
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Optional
+
+from config import get_settings
+from http_cache import Representation
+from schemas import SystemConfig
+
+
+DEFAULT_INITIAL_BALANCE = 0
+DEFAULT_MIN_WITHDRAWAL = 50000
+DEFAULT_HYPE_LEVEL = 5
+DEFAULT_WELCOME_MESSAGE = "Welcome to RuangGamer. Bind your phone number in profile to secure your account."
+
+# 由数据库函数 save_system_config 在每次保存时递增
+CONFIG_VERSION_KEY = "config_version"
+
+
+def parse_number(value: Any, default: float) -> float:
+    """
+    解析数值型配置
+    兼容 {"id": 100000} / {"value": 100000} 这类包装格式，或者直接是数字/字符串
+    """
+    if isinstance(value, dict):
+        value = value["id"] if value.get("id") is not None else value.get("value")
+    if value is None or value == "":
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    # 整数金额保持为 int (错误提示与流水中不出现 ".0")
+    return int(number) if number.is_integer() else number
+
+
+def parse_text(value: Any) -> str:
+    """解析文本型配置，去掉被 JSON 编码后残留的引号"""
+    if value is None:
+        return ""
+    raw = value if isinstance(value, str) else str(value)
+    return raw.strip('"').strip()
+
+
+@dataclass
+class ConfigSnapshot:
+    """某一版本的完整配置"""
+    version: int
+    raw: dict[str, Any] = field(default_factory=dict)   # 数据库 key -> 原始 JSON 值
+    public: dict = field(default_factory=dict)           # 前端 SystemConfig 结构 (驼峰字段)
+    initial_balance: float = DEFAULT_INITIAL_BALANCE
+    min_withdrawal: float = DEFAULT_MIN_WITHDRAWAL
+    welcome_message: str = DEFAULT_WELCOME_MESSAGE
+
+    @cached_property
+    def representation(self) -> Representation:
+        """/api/config 的预序列化响应"""
+        return Representation(self.public, SystemConfig)
+
+
+# 原样透传给前端的配置项: 数据库 key -> 前端字段
+PASSTHROUGH_KEYS = {
+    "initial_balance": "initialBalance",
+    "telegram_links": "telegramLinks",
+    "customer_service_links": "customerServiceLinks",
+    "vip_config": "vipConfig",
+    "misi_example_image": "misiExampleImage",
+    "help_content": "helpContent",
+    "about_content": "aboutContent",
+}
+
+
+def parse_config(rows: list[dict]) -> ConfigSnapshot:
+    """将 system_config 行解析为配置快照"""
+    raw = {item["key"]: item["value"] for item in rows}
+    version = int(parse_number(raw.get(CONFIG_VERSION_KEY), 0))
+
+    public = {
+        "initialBalance": {},
+        "minWithdrawAmount": {},
+        "telegramLinks": {},
+        "customerServiceLinks": {},
+        "hypeLevel": DEFAULT_HYPE_LEVEL,
+        "helpContent": "",
+        "aboutContent": "",
+        "vipConfig": {},
+        "misiExampleImage": {},
+        "welcomeMessage": "",
+        "promoVideoUrl": ""
+    }
+
+    for key, field_name in PASSTHROUGH_KEYS.items():
+        if key in raw:
+            public[field_name] = raw[key]
+
+    # 优先使用 min_withdrawal，兼容旧的 min_withdraw_amount (配置为 0 表示不限最低金额)
+    min_withdraw_raw = raw.get("min_withdrawal")
+    if min_withdraw_raw is None:
+        min_withdraw_raw = raw.get("min_withdraw_amount")
+    if min_withdraw_raw is not None:
+        public["minWithdrawAmount"] = min_withdraw_raw
+
+    if "hype_level" in raw:
+        try:
+            public["hypeLevel"] = int(raw["hype_level"])
+        except (TypeError, ValueError):
+            public["hypeLevel"] = DEFAULT_HYPE_LEVEL
+
+    if "welcome_message" in raw:
+        public["welcomeMessage"] = parse_text(raw["welcome_message"])
+
+    promo = raw.get("promo_video_url", raw.get("promoVideoUrl"))
+    if promo is not None:
+        public["promoVideoUrl"] = parse_text(promo)
+
+    return ConfigSnapshot(
+        version=version,
+        raw=raw,
+        public=public,
+        initial_balance=parse_number(raw.get("initial_balance"), DEFAULT_INITIAL_BALANCE),
+        min_withdrawal=parse_number(min_withdraw_raw, DEFAULT_MIN_WITHDRAWAL),
+        welcome_message=public["welcomeMessage"] or DEFAULT_WELCOME_MESSAGE,
+    )
+
+
+class ConfigRegistry:
+    """
+    进程内配置注册表
+    首次使用时加载全部配置；invalidate 后下次读取重新加载。
+    ttl 为兜底检查周期 (多 worker 部署时其它 worker 的配置写入无法通知本进程):
+    到期后只查询数据库中的 config_version，与快照版本相同时继续使用快照，不同时才重新加载全部配置
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def get(self, db: Any) -> ConfigSnapshot:
+        """读取当前配置快照"""
+        if self._fresh():
+            return self._snapshot
+
+        async with self._lock:
+            if self._fresh():
+                return self._snapshot
+            if self._snapshot is not None and await self._stored_version(db) == self._snapshot.version:
+                self._loaded_at = time.monotonic()
+                return self._snapshot
+            result = await db.table("system_config").select("key, value").execute()
+            self._snapshot = parse_config(result.data or [])
+            self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    async def _stored_version(self, db: Any) -> int:
+        """数据库中当前的 config_version"""
+        result = await db.table("system_config").select("value").eq("key", CONFIG_VERSION_KEY).execute()
+        return int(parse_number(result.data[0]["value"], 0)) if result.data else 0
+
+    def invalidate(self) -> None:
+        """配置写入后调用，下次读取时重新加载"""
+        self._snapshot = None
+
+
+config_registry = ConfigRegistry(ttl=get_settings().config_registry_ttl)
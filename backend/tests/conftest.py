@@ -0,0 +1,14 @@
+"""
+pytest 配置
+后端模块以 backend/ 为根目录导入 (与 uvicorn main:app 的运行方式一致)
+
+使用方法 (pytest 只用于开发，不在 requirements.txt 中):
+    pip install pytest
+    cd backend
+    python -m pytest -q
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,108 @@
+"""分析统计: 时间戳解析与分桶"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from analytics import (
+    MAX_BUCKETS, bucket_counts, make_buckets, parse_range, parse_timestamps, parse_tz, series,
+)
+
+
+JAKARTA = parse_tz("Asia/Jakarta")
+
+
+def test_parse_range():
+    assert parse_range("24h") == timedelta(hours=24)
+    assert parse_range(" 30D ") == timedelta(days=30)
+    assert parse_range("12w") == timedelta(weeks=12)
+    for bad in ("0d", "30", "d", "3m", "-1d"):
+        with pytest.raises(ValueError):
+            parse_range(bad)
+
+
+def test_parse_tz_rejects_unknown_names():
+    assert parse_tz("UTC").key == "UTC"
+    with pytest.raises(ValueError):
+        parse_tz("Mars/Base")
+
+
+def test_parse_timestamps_matches_fromisoformat():
+    values = [
+        "2024-02-29T23:59:59.123456+00:00",
+        "1999-12-31 00:00:00+00:00",
+        "2025-03-01T12:30:05",
+        None,
+    ]
+    parsed = parse_timestamps(values)
+    for value, got in zip(values[:3], parsed[:3]):
+        expected = datetime.fromisoformat(value).replace(tzinfo=None, microsecond=0)
+        assert got == np.datetime64(expected, "us")
+    assert np.isnat(parsed[3])
+
+
+def test_parse_timestamps_rejects_other_formats():
+    assert parse_timestamps([]).size == 0
+    with pytest.raises(ValueError):
+        parse_timestamps(["03/01/2025 12:00"])
+
+
+def test_day_buckets_align_to_local_midnight():
+    end = datetime(2025, 3, 10, 18, 0, tzinfo=timezone.utc)  # 雅加达 3 月 11 日 01:00
+    buckets = make_buckets(end, timedelta(days=3), "day", JAKARTA)
+    assert buckets.labels == ["2025-03-09", "2025-03-10", "2025-03-11"]
+    # 雅加达零点 = 前一天 17:00 UTC
+    assert buckets.start == np.datetime64("2025-03-08T17:00:00", "us")
+    assert buckets.end == np.datetime64("2025-03-11T17:00:00", "us")
+
+
+def test_week_buckets_start_on_monday():
+    end = datetime(2025, 3, 13, 5, 0, tzinfo=timezone.utc)  # 周四
+    buckets = make_buckets(end, timedelta(weeks=2), "week", parse_tz("UTC"))
+    assert buckets.labels == ["2025-03-03", "2025-03-10"]
+
+
+def test_hour_buckets_across_dst_change():
+    # 纽约 2025-03-09 02:00 跳到 03:00: 本地整点不重复也不缺失，每个桶都是一小时
+    end = datetime(2025, 3, 9, 8, 30, tzinfo=timezone.utc)
+    buckets = make_buckets(end, timedelta(hours=4), "hour", parse_tz("America/New_York"))
+    assert buckets.labels == ["2025-03-09T00:00", "2025-03-09T01:00", "2025-03-09T03:00", "2025-03-09T04:00"]
+    assert (np.diff(buckets.edges) == np.timedelta64(1, "h")).all()
+
+
+def test_make_buckets_limits():
+    end = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert len(make_buckets(end, timedelta(hours=36), "day", JAKARTA)) == 2
+    with pytest.raises(ValueError):
+        make_buckets(end, timedelta(days=3), "month", JAKARTA)
+    with pytest.raises(ValueError):
+        make_buckets(end, timedelta(hours=MAX_BUCKETS + 1), "hour", JAKARTA)
+
+
+def test_bucket_counts_and_sums():
+    end = datetime(2025, 3, 10, 12, 0, tzinfo=timezone.utc)
+    buckets = make_buckets(end, timedelta(days=2), "day", parse_tz("UTC"))
+    timestamps = parse_timestamps([
+        "2025-03-08T23:59:59+00:00",  # 早于第一个桶
+        "2025-03-09T00:00:00+00:00",
+        "2025-03-09T10:00:00+00:00",
+        "2025-03-10T23:59:59+00:00",
+        "2025-03-11T00:00:00+00:00",  # 结束边界之外
+        None,
+    ])
+    assert bucket_counts(timestamps, buckets).tolist() == [2, 1]
+    amounts = np.array([1, 10, 20, 30, 40, 50])
+    assert bucket_counts(timestamps, buckets, amounts).tolist() == [30.0, 30.0]
+    assert bucket_counts(parse_timestamps([]), buckets).tolist() == [0, 0]
+
+
+def test_series_uses_python_numbers():
+    end = datetime(2025, 3, 10, 12, 0, tzinfo=timezone.utc)
+    buckets = make_buckets(end, timedelta(days=2), "day", parse_tz("UTC"))
+    rows = series(buckets, users=np.array([1, 2]), amount=np.array([0.5, 1.5]))
+    assert rows == [
+        {"date": "2025-03-09", "users": 1, "amount": 0.5},
+        {"date": "2025-03-10", "users": 2, "amount": 1.5},
+    ]
+    assert type(rows[0]["users"]) is int and type(rows[0]["amount"]) is float
@@ -0,0 +1,80 @@
+"""进程内 LRU + TTL 缓存"""
+
+import cache
+from cache import TTLCache, cache_stats
+
+
+class Clock:
+    """可控的 time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(monkeypatch, **kwargs) -> tuple[TTLCache, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return TTLCache("test", **kwargs), clock
+
+
+def test_get_returns_default_on_miss(monkeypatch):
+    c, _ = make_cache(monkeypatch)
+    assert c.get("missing") is None
+    assert c.get("missing", 0) == 0
+    assert c.misses == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    c, clock = make_cache(monkeypatch, ttl=30)
+    c.set("a", 1)
+    clock.now += 29
+    assert c.get("a") == 1
+    clock.now += 2
+    assert c.get("a") is None
+    assert c.stats()["size"] == 0
+
+
+def test_per_entry_ttl(monkeypatch):
+    c, clock = make_cache(monkeypatch, ttl=30)
+    c.set("short", 1, ttl=5)
+    c.set("long", 2)
+    clock.now += 10
+    assert c.get("short") is None
+    assert c.get("long") == 2
+
+
+def test_evicts_least_recently_used(monkeypatch):
+    c, _ = make_cache(monkeypatch, maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")  # a 变为最近使用
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.get("c") == 3
+    assert c.evictions == 1
+
+
+def test_invalidate_and_clear(monkeypatch):
+    c, _ = make_cache(monkeypatch)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.invalidate("a")
+    c.invalidate("unknown")
+    assert c.get("a") is None
+    assert c.get("b") == 2
+    c.clear()
+    assert c.get("b") is None
+
+
+def test_stats_and_registry(monkeypatch):
+    c, _ = make_cache(monkeypatch)
+    c.set("a", 1)
+    c.get("a")
+    c.get("b")
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["hitRate"]) == (1, 1, 0.5)
+    assert any(s["name"] == "test" for s in cache_stats())
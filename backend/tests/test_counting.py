@@ -0,0 +1,95 @@
+"""分页总数策略"""
+
+import asyncio
+
+from counting import CountStrategy
+
+
+class FakeList:
+    """模拟 PostgREST 分页查询: planned 返回估算值，exact 返回真实总数，None 不计数"""
+
+    def __init__(self, size: int, estimate: int):
+        self.size = size
+        self.estimate = estimate
+        self.calls: list = []
+
+    def fetch(self, start: int, per_page: int):
+        async def run(count):
+            self.calls.append(count)
+            rows = list(range(start, min(start + per_page, self.size)))
+            total = {"planned": self.estimate, "exact": self.size, None: None}[count]
+            return rows, total
+        return run
+
+
+def page(strategy: CountStrategy, data: FakeList, start: int, per_page: int = 20, key: str = ""):
+    return asyncio.run(strategy.page(key, data.fetch(start, per_page), start, per_page))
+
+
+def test_short_first_page_needs_no_count():
+    data = FakeList(size=5, estimate=900)
+    rows, total, approximate = page(CountStrategy("t1", 1000, 60), data, 0)
+    assert (len(rows), total, approximate) == (5, 5, False)
+    assert data.calls == ["planned"]
+
+
+def test_large_estimate_is_returned_as_approximate():
+    data = FakeList(size=50000, estimate=48000)
+    _, total, approximate = page(CountStrategy("t2", 1000, 60), data, 0)
+    assert (total, approximate) == (48000, True)
+    assert data.calls == ["planned"]
+
+
+def test_small_estimate_falls_back_to_exact_count():
+    data = FakeList(size=300, estimate=120)
+    _, total, approximate = page(CountStrategy("t3", 1000, 60), data, 0)
+    assert (total, approximate) == (300, False)
+    assert data.calls == ["planned", "exact"]
+
+
+def test_cached_total_skips_counting():
+    strategy = CountStrategy("t4", 1000, 60)
+    data = FakeList(size=300, estimate=120)
+    page(strategy, data, 0)
+    data.calls.clear()
+    _, total, _ = page(strategy, data, 20)
+    assert total == 300
+    assert data.calls == [None]
+
+
+def test_cache_is_per_key_and_cleared():
+    strategy = CountStrategy("t5", 1000, 60)
+    data = FakeList(size=300, estimate=120)
+    page(strategy, data, 0, key="a")
+    data.calls.clear()
+    page(strategy, data, 0, key="b")
+    assert data.calls == ["planned", "exact"]
+
+    strategy.clear()
+    data.calls.clear()
+    page(strategy, data, 0, key="a")
+    assert data.calls == ["planned", "exact"]
+
+
+def test_short_page_corrects_cached_total():
+    strategy = CountStrategy("t6", 1000, 60)
+    data = FakeList(size=300, estimate=120)
+    page(strategy, data, 0)
+    data.size = 250  # 缓存期间删除了数据
+    rows, total, approximate = page(strategy, data, 240)
+    assert (len(rows), total, approximate) == (10, 250, False)
+
+
+def test_approximate_total_is_at_least_rows_seen():
+    strategy = CountStrategy("t7", 1000, 60)
+    data = FakeList(size=50000, estimate=2000)
+    _, total, approximate = page(strategy, data, 4000)
+    assert (total, approximate) == (4020, True)
+
+
+def test_empty_page_past_the_end_is_not_an_exact_total():
+    data = FakeList(size=100, estimate=100)
+    rows, total, approximate = page(CountStrategy("t8", 1000, 60), data, 200)
+    assert rows == []
+    assert (total, approximate) == (100, False)
+    assert data.calls == ["planned", "exact"]
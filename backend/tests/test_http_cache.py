@@ -0,0 +1,93 @@
+"""预序列化响应与 ETag 条件请求"""
+
+import asyncio
+import gzip
+import json
+from typing import Optional
+
+from fastapi import Request
+from pydantic import BaseModel, ConfigDict, Field
+
+from http_cache import Representation, Snapshot, conditional_response, etag_matches, version_etag
+
+
+class Item(BaseModel):
+    item_id: str = Field(..., alias="itemId")
+    note: Optional[str] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+def make_request(**headers: str) -> Request:
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_body_uses_model_aliases():
+    rep = Representation({"item_id": "a1"}, Item)
+    assert json.loads(rep.body) == {"itemId": "a1", "note": None}
+
+
+def test_body_without_model_is_compact_json():
+    assert Representation({"a": [1, 2]}).body == b'{"a":[1,2]}'
+
+
+def test_content_etag_depends_only_on_body():
+    assert Representation({"a": 1}).etag == Representation({"a": 1}).etag
+    assert Representation({"a": 1}).etag != Representation({"a": 2}).etag
+
+
+def test_version_etag_does_not_serialize_body():
+    rep = Representation({"item_id": "a1"}, Item, version="u1:3:0")
+    assert rep.etag == version_etag("u1:3:0")
+    assert "body" not in rep.__dict__
+    assert version_etag("u1:3:0") != version_etag("u1:4:0")
+
+
+def test_etag_matches_weak_lists_and_wildcard():
+    etag = Representation({"a": 1}).etag
+    assert etag_matches(make_request(if_none_match=etag), etag)
+    assert etag_matches(make_request(if_none_match=f'"other", W/{etag}'), etag)
+    assert etag_matches(make_request(if_none_match="*"), etag)
+    assert not etag_matches(make_request(if_none_match='"other"'), etag)
+    assert not etag_matches(make_request(), etag)
+
+
+def test_conditional_response_returns_304_on_match():
+    rep = Representation({"a": 1})
+    response = conditional_response(make_request(if_none_match=rep.etag), rep)
+    assert response.status_code == 304
+    assert response.headers["etag"] == rep.etag
+    assert response.body == b""
+
+
+def test_conditional_response_gzips_large_bodies():
+    rep = Representation({"text": "x" * 4096})
+    response = conditional_response(make_request(accept_encoding="gzip, br"), rep)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == rep.body
+
+    plain = conditional_response(make_request(), rep)
+    assert "content-encoding" not in plain.headers
+    assert plain.body == rep.body
+
+
+def test_snapshot_invalidate_defers_rebuild_to_next_get():
+    builds = []
+
+    async def build(db):
+        builds.append(db)
+        return {"n": len(builds)}
+
+    snapshot = Snapshot("test", build, max_age=60)
+
+    async def scenario():
+        first = await snapshot.get("db")
+        assert await snapshot.get("db") is first
+        snapshot.invalidate()
+        assert len(builds) == 1
+        second = await snapshot.get("db")
+        assert json.loads(second.body) == {"n": 2}
+
+    asyncio.run(scenario())
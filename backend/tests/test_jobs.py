@@ -0,0 +1,63 @@
+"""后台任务: 进度查询推进停滞的任务"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from jobs import STALL_AFTER, JobRunner
+
+
+class FakeDb:
+    def __init__(self, job: dict):
+        self.job = job
+        self.calls: list = []
+
+    def rpc(self, name: str, params: dict) -> "FakeDb":
+        self.calls.append((name, params))
+        return self
+
+    async def execute(self):
+        processed = self.job["processed"] + 2
+        self.job = {**self.job, "status": "completed" if processed >= self.job["total"] else "running",
+                    "processed": processed, "updated_at": datetime.now(timezone.utc).isoformat()}
+        return SimpleNamespace(data=self.job)
+
+
+def make_job(age: float, status: str = "running") -> dict:
+    updated = datetime.now(timezone.utc) - timedelta(seconds=age)
+    return {"id": "j1", "kind": "broadcast", "status": status, "processed": 0, "total": 4,
+            "updated_at": updated.isoformat()}
+
+
+def test_advance_runs_one_chunk_for_stalled_job():
+    runner = JobRunner(chunk_size=2)
+    chunks: list = []
+    runner.on_chunk("broadcast", chunks.append)
+    db = FakeDb(make_job(STALL_AFTER + 5))
+
+    job = asyncio.run(runner.advance(db, db.job))
+
+    assert db.calls == [("run_broadcast_chunk", {"p_job_id": "j1", "p_chunk_size": 2})]
+    assert job["processed"] == 2 and job["status"] == "running"
+    assert chunks == [job]
+
+
+def test_advance_skips_recently_updated_and_finished_jobs():
+    runner = JobRunner(chunk_size=2)
+    fresh = FakeDb(make_job(0))
+    done = FakeDb(make_job(STALL_AFTER + 5, status="completed"))
+
+    assert asyncio.run(runner.advance(fresh, fresh.job)) is fresh.job
+    assert asyncio.run(runner.advance(done, done.job)) is done.job
+    assert fresh.calls == [] and done.calls == []
+
+
+def test_advance_keeps_job_when_chunk_fails():
+    class FailingDb(FakeDb):
+        async def execute(self):
+            raise RuntimeError("timeout")
+
+    runner = JobRunner(chunk_size=2)
+    db = FailingDb(make_job(STALL_AFTER + 5))
+    job = asyncio.run(runner.advance(db, db.job))
+    assert job is db.job
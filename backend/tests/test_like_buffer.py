@@ -0,0 +1,51 @@
+"""点赞数写缓冲"""
+
+import asyncio
+
+from like_buffer import LikeBuffer
+
+
+class FakeDb:
+    def __init__(self):
+        self.calls: list = []
+
+    def rpc(self, name: str, params: dict) -> "FakeDb":
+        self.calls.append((name, params))
+        return self
+
+    async def execute(self):
+        return None
+
+
+def test_writes_directly_when_not_started():
+    buffer = LikeBuffer(interval=60, max_pending=100)
+    db = FakeDb()
+    asyncio.run(buffer.record(db, "p1"))
+    assert db.calls == [("apply_like_increments", {"p_items": [{"platform_id": "p1", "delta": 1}]})]
+    assert buffer.pending() == 0
+
+
+def test_buffers_and_flushes_once_started():
+    buffer = LikeBuffer(interval=60, max_pending=100)
+    db = FakeDb()
+
+    async def get_db():
+        return db
+
+    async def scenario():
+        buffer.start(get_db)
+        await buffer.record(db, "p1")
+        await buffer.record(db, "p1")
+        await buffer.record(db, "p2")
+        assert db.calls == []
+        assert buffer.pending() == 3
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    name, params = db.calls[0]
+    assert name == "apply_like_increments"
+    assert sorted(params["p_items"], key=lambda i: i["platform_id"]) == [
+        {"platform_id": "p1", "delta": 2},
+        {"platform_id": "p2", "delta": 1},
+    ]
+    assert buffer.pending() == 0
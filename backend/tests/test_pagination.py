@@ -0,0 +1,70 @@
+"""游标分页"""
+
+import base64
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import after_cursor, decode_cursor, encode_cursor, keyset_page
+
+
+ROW_ID = str(uuid.uuid4())
+DATE = "2025-03-10T08:15:00.123456+00:00"
+
+
+def rows(n: int) -> list[dict]:
+    return [{"id": str(uuid.UUID(int=n - i)), "date": f"2025-03-{n - i:02d}T00:00:00+00:00"} for i in range(n)]
+
+
+def test_cursor_round_trip_is_url_safe():
+    cursor = encode_cursor(DATE, ROW_ID)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == (DATE, ROW_ID)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(json.dumps(["yesterday", ROW_ID]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([DATE, "1 OR 1=1"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([DATE]).encode()).decode(),
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_page_with_more_rows():
+    page, cursor = keyset_page(rows(4), 3, "date")
+    assert len(page) == 3
+    assert decode_cursor(cursor) == (page[-1]["date"], page[-1]["id"])
+
+
+def test_keyset_page_last_page_has_no_cursor():
+    data = rows(3)
+    assert keyset_page(data, 3, "date") == (data, None)
+    assert keyset_page([], 3, "date") == ([], None)
+
+
+class RecordingQuery:
+    def __init__(self):
+        self.calls = []
+
+    def lte(self, *args):
+        self.calls.append(("lte", *args))
+        return self
+
+    def or_(self, *args):
+        self.calls.append(("or", *args))
+        return self
+
+
+def test_after_cursor_filter():
+    query = after_cursor(RecordingQuery(), "date", encode_cursor(DATE, ROW_ID))
+    assert query.calls == [
+        ("lte", "date", DATE),
+        ("or", f'date.lt."{DATE}",and(date.eq."{DATE}",id.lt.{ROW_ID})'),
+    ]
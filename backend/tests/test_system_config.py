@@ -0,0 +1,129 @@
+"""系统配置解析与注册表刷新"""
+
+import asyncio
+
+import system_config
+from system_config import (
+    DEFAULT_HYPE_LEVEL, DEFAULT_MIN_WITHDRAWAL, DEFAULT_WELCOME_MESSAGE,
+    ConfigRegistry, parse_config, parse_number, parse_text,
+)
+
+
+def rows(**values) -> list[dict]:
+    return [{"key": k, "value": v} for k, v in values.items()]
+
+
+def test_parse_number_formats():
+    assert parse_number(100000, 0) == 100000
+    assert parse_number("2500", 0) == 2500
+    assert parse_number({"id": 75000}, 0) == 75000
+    assert parse_number({"value": "1.5"}, 0) == 1.5
+    assert parse_number(None, 7) == 7
+    assert parse_number("", 7) == 7
+    assert parse_number("abc", 7) == 7
+    assert isinstance(parse_number(100.0, 0), int)
+
+
+def test_parse_text_strips_json_quotes():
+    assert parse_text('"Hello"') == "Hello"
+    assert parse_text(None) == ""
+    assert parse_text(5) == "5"
+
+
+def test_defaults_for_empty_table():
+    snapshot = parse_config([])
+    assert snapshot.version == 0
+    assert snapshot.min_withdrawal == DEFAULT_MIN_WITHDRAWAL
+    assert snapshot.welcome_message == DEFAULT_WELCOME_MESSAGE
+    assert snapshot.public["hypeLevel"] == DEFAULT_HYPE_LEVEL
+
+
+def test_zero_min_withdrawal_is_kept():
+    assert parse_config(rows(min_withdrawal=0)).min_withdrawal == 0
+    assert parse_config(rows(min_withdrawal={"id": 0}, min_withdraw_amount=10000)).min_withdrawal == 0
+
+
+def test_min_withdrawal_prefers_new_key():
+    snapshot = parse_config(rows(min_withdrawal={"id": 60000}, min_withdraw_amount=10000))
+    assert snapshot.min_withdrawal == 60000
+    assert snapshot.public["minWithdrawAmount"] == {"id": 60000}
+    assert parse_config(rows(min_withdraw_amount="20000")).min_withdrawal == 20000
+
+
+def test_public_fields():
+    snapshot = parse_config(rows(
+        config_version=4,
+        initial_balance=5000,
+        telegram_links={"id": "https://t.me/x"},
+        hype_level="oops",
+        welcome_message='"Hi there"',
+        promoVideoUrl='"https://v"',
+    ))
+    assert snapshot.version == 4
+    assert snapshot.initial_balance == 5000
+    assert snapshot.public["initialBalance"] == 5000
+    assert snapshot.public["telegramLinks"] == {"id": "https://t.me/x"}
+    assert snapshot.public["hypeLevel"] == DEFAULT_HYPE_LEVEL
+    assert snapshot.welcome_message == snapshot.public["welcomeMessage"] == "Hi there"
+    assert snapshot.public["promoVideoUrl"] == "https://v"
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeDb", columns: str):
+        self.db = db
+        self.columns = columns
+        self.key = None
+
+    def eq(self, column: str, value: str) -> "FakeQuery":
+        self.key = value
+        return self
+
+    async def execute(self):
+        self.db.queries.append(self.columns)
+        data = [r for r in self.db.rows if self.key is None or r["key"] == self.key]
+        return type("Result", (), {"data": data})()
+
+
+class FakeDb:
+    """只支持 system_config 的 select / eq 查询"""
+
+    def __init__(self, **values):
+        self.rows = rows(**values)
+        self.queries: list[str] = []
+
+    def table(self, name: str):
+        return self
+
+    def select(self, columns: str) -> FakeQuery:
+        return FakeQuery(self, columns)
+
+
+def test_registry_keeps_snapshot_while_version_is_unchanged(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(system_config.time, "monotonic", lambda: clock[0])
+    registry = ConfigRegistry(ttl=60)
+    db = FakeDb(config_version=1, initial_balance=100)
+
+    async def scenario():
+        first = await registry.get(db)
+        assert await registry.get(db) is first
+        assert db.queries == ["key, value"]
+
+        # TTL 到期但版本未变: 只查询版本号
+        clock[0] += 61
+        assert await registry.get(db) is first
+        assert db.queries == ["key, value", "value"]
+
+        # 其它 worker 保存了配置: 版本号变化后重新加载
+        db.rows = rows(config_version=2, initial_balance=200)
+        clock[0] += 61
+        second = await registry.get(db)
+        assert second.initial_balance == 200
+        assert db.queries == ["key, value", "value", "value", "key, value"]
+
+        # 本进程写入配置后 invalidate: 直接重新加载
+        registry.invalidate()
+        await registry.get(db)
+        assert db.queries[-1] == "key, value"
+
+    asyncio.run(scenario())
@@ -0,0 +1,139 @@
+"""凭证上传: 类型识别、流式检查与按内容去重上传"""
+
+import asyncio
+import hashlib
+import io
+
+import httpx
+import pytest
+from starlette.datastructures import UploadFile
+
+from uploads import (
+    CHUNK_SIZE, StorageUploader, UnsupportedUpload, UploadTooLarge,
+    inspect_upload, sniff_image, store_upload,
+)
+
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+PNG = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+
+
+def upload(content: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename="proof")
+
+
+@pytest.mark.parametrize("head, mime", [
+    (JPEG, "image/jpeg"),
+    (PNG, "image/png"),
+    (b"GIF89a\x01\x00", "image/gif"),
+    (b"GIF87a\x01\x00", "image/gif"),
+    (b"RIFF\x24\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00", "image/heic"),
+    (b"\x00\x00\x00\x18ftypmif1\x00\x00", "image/heic"),
+    (b"\x00\x00\x00\x18ftypisom\x00\x00", None),
+    (b"%PDF-1.7", None),
+    (b"<svg xmlns=", None),
+])
+def test_sniff_image(head, mime):
+    assert sniff_image(head) == mime
+
+
+def test_inspect_upload_hashes_and_rewinds():
+    content = JPEG + b"x" * (CHUNK_SIZE * 2 + 5)
+    file = upload(content)
+    mime, digest, size = asyncio.run(inspect_upload(file, len(content)))
+    assert (mime, digest, size) == ("image/jpeg", hashlib.sha256(content).hexdigest(), len(content))
+    assert asyncio.run(file.read()) == content
+
+
+@pytest.mark.parametrize("content, error", [
+    (JPEG + b"x" * (CHUNK_SIZE * 3), UploadTooLarge),
+    (b"MZ\x90\x00" + b"x" * 100, UnsupportedUpload),
+    (b"", UnsupportedUpload),
+])
+def test_inspect_upload_rejects(content, error):
+    with pytest.raises(error):
+        asyncio.run(inspect_upload(upload(content), CHUNK_SIZE * 2))
+
+
+class FakeStorage(httpx.AsyncBaseTransport):
+    """进程内 Storage: HEAD 判断对象是否存在，POST 保存请求体；fail_next 让下一次上传失败"""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.posts: list[httpx.Request] = []
+        self.fail_next = False
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "HEAD":
+            return httpx.Response(200 if path in self.objects else 404)
+        body = b"".join([chunk async for chunk in request.stream])
+        self.posts.append(request)
+        await asyncio.sleep(0)
+        if self.fail_next:
+            self.fail_next = False
+            return httpx.Response(500)
+        self.objects[path] = body
+        return httpx.Response(200)
+
+
+def make_uploader(storage: FakeStorage) -> StorageUploader:
+    return StorageUploader("http://storage.test", "key", client=httpx.AsyncClient(transport=storage))
+
+
+def test_store_upload_sends_content_length_and_dedups():
+    storage = FakeStorage()
+    uploader = make_uploader(storage)
+    content = PNG + b"p" * 1000
+
+    async def scenario():
+        first = await store_upload(upload(content), uploader, "proofs", 10_000)
+        second = await store_upload(upload(content), uploader, "proofs", 10_000)
+        return first, second
+
+    (url, existed), (url2, existed2) = asyncio.run(scenario())
+    digest = hashlib.sha256(content).hexdigest()
+    assert url == url2 == f"http://storage.test/storage/v1/object/public/proofs/{digest}.png"
+    assert (existed, existed2) == (False, True)
+    assert len(storage.posts) == 1
+    request = storage.posts[0]
+    assert request.headers["content-length"] == str(len(content))
+    assert "transfer-encoding" not in request.headers
+    assert request.headers["content-type"] == "image/png"
+    assert storage.objects[f"/storage/v1/object/proofs/{digest}.png"] == content
+
+
+def test_concurrent_identical_uploads_upload_once():
+    storage = FakeStorage()
+    uploader = make_uploader(storage)
+    content = JPEG + b"j" * 5000
+
+    async def scenario():
+        return await asyncio.gather(*(store_upload(upload(content), uploader, "proofs", 10_000) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len({url for url, _ in results}) == 1
+    assert sorted(existed for _, existed in results) == [False, True, True, True, True]
+    assert len(storage.posts) == 1
+    assert uploader._inflight == {}
+
+
+def test_waiters_retry_when_the_inflight_upload_fails():
+    storage = FakeStorage()
+    storage.fail_next = True
+    uploader = make_uploader(storage)
+    content = JPEG + b"f" * 5000
+
+    async def scenario():
+        return await asyncio.gather(
+            *(store_upload(upload(content), uploader, "proofs", 10_000) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    failures = [r for r in results if isinstance(r, httpx.HTTPStatusError)]
+    assert len(failures) == 1
+    assert len(storage.objects) == 1
+    # 失败的上传只移除自己的登记，重试者的登记不被误删，最终全部清理
+    assert uploader._inflight == {}
@@ -0,0 +1,76 @@
+"""用户资料接口: 缓存统计与版本号 ETag"""
+
+import asyncio
+import uuid
+
+from fastapi import Request
+
+from http_cache import version_etag
+from routers.auth import profile_cache
+from routers.users import get_user
+
+
+USER_ID = str(uuid.uuid4())
+PROFILE = {
+    "id": USER_ID, "email": "a@example.com", "phone": None, "balance": 10, "currency": "Rp",
+    "total_earnings": 0, "vip_level": 1, "referral_code": "ABC123", "referrer_id": None,
+    "invited_count": 0, "registration_date": "2025-03-01T00:00:00+00:00", "role": "user",
+    "profile_version": 7, "unread_broadcast_count": 2, "bank_accounts": [], "user_likes": [],
+}
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeDb", columns: str):
+        self.db = db
+        self.columns = columns
+
+    def eq(self, column: str, value: str) -> "FakeQuery":
+        return self
+
+    async def execute(self):
+        self.db.selects.append(self.columns)
+        return type("Result", (), {"data": [PROFILE]})()
+
+
+class FakeDb:
+    def __init__(self):
+        self.selects: list[str] = []
+
+    def table(self, name: str) -> "FakeDb":
+        return self
+
+    def select(self, columns: str) -> FakeQuery:
+        return FakeQuery(self, columns)
+
+
+def make_request(**headers: str) -> Request:
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def setup_function():
+    profile_cache.clear()
+    profile_cache.hits = profile_cache.misses = 0
+
+
+def test_each_request_is_counted_once():
+    db = FakeDb()
+    first = asyncio.run(get_user(USER_ID, make_request(), db))
+    second = asyncio.run(get_user(USER_ID, make_request(), db))
+    assert first.status_code == second.status_code == 200
+    assert (profile_cache.misses, profile_cache.hits) == (1, 1)
+    assert len(db.selects) == 1
+
+
+def test_matching_version_returns_304_without_loading_profile():
+    db = FakeDb()
+    etag = version_etag(f"{USER_ID}:7:2")
+    response = asyncio.run(get_user(USER_ID, make_request(if_none_match=etag), db))
+    assert response.status_code == 304
+    assert db.selects == ["id, profile_version, unread_broadcast_count"]
+    assert (profile_cache.misses, profile_cache.hits) == (1, 0)
+
+    # 缓存命中时 ETag 相同
+    asyncio.run(get_user(USER_ID, make_request(), db))
+    cached = asyncio.run(get_user(USER_ID, make_request(if_none_match=etag), db))
+    assert cached.status_code == 304
@@ -0,0 +1,199 @@
+"""
+凭证图片上传管道
+- 按块读取上传文件 (multipart 解析时 Starlette 已把超过 1MB 的文件暂存到磁盘)，不把整个文件读进内存
+- 第一块即按文件头识别图片类型，非图片立即拒绝；累计字节数超过上限立即拒绝
+- 边读边算 sha256，Storage 中已有 (或本进程正在上传) 相同内容时直接返回 URL，不重复上传
+- 上传时以分块请求体直接流式发送到 Storage REST 接口，单个上传的内存占用只有一个块
+"""
+
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from config import get_settings
+
+
+CHUNK_SIZE = 256 * 1024
+
+# 文件头 -> MIME 类型
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+# ISO BMFF (HEIC/HEIF，手机相机常见格式) 的 ftyp 品牌
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1"}
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+}
+
+
+class UploadTooLarge(ValueError):
+    """上传超过字节上限"""
+
+
+class UnsupportedUpload(ValueError):
+    """上传内容不是支持的图片格式"""
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """按文件头识别图片类型，无法识别时返回 None"""
+    for signature, mime in _SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return "image/heic"
+    return None
+
+
+async def _chunks(file: Any, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """从文件当前位置按块读取到末尾"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def inspect_upload(file: Any, max_bytes: int) -> tuple[str, str, int]:
+    """
+    流式检查上传文件，返回 (MIME 类型, sha256, 字节数)，结束后把文件位置移回开头
+    类型不支持时抛出 UnsupportedUpload，超过 max_bytes 时抛出 UploadTooLarge (都不会读完文件)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    mime = None
+    async for chunk in _chunks(file):
+        if mime is None:
+            mime = sniff_image(chunk[:16])
+            if mime is None:
+                raise UnsupportedUpload("Only JPEG, PNG, GIF, WEBP or HEIC images are allowed")
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"File exceeds {max_bytes // (1024 * 1024)} MB limit")
+        digest.update(chunk)
+    if mime is None:
+        raise UnsupportedUpload("Empty file")
+    await file.seek(0)
+    return mime, digest.hexdigest(), size
+
+
+class StorageUploader:
+    """
+    Supabase Storage REST 客户端 (流式上传)
+    supabase-py 的 storage.upload 需要完整的 bytes，这里直接用 httpx 发送分块请求体
+    """
+
+    def __init__(self, base_url: str, service_key: str, client: Optional[httpx.AsyncClient] = None):
+        self.base_url = base_url.rstrip("/") + "/storage/v1"
+        self.headers = {"Authorization": f"Bearer {service_key}", "apikey": service_key}
+        self._client = client
+        # (bucket, path) -> 正在进行的上传，同内容的并发请求等待同一次上传
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+        return self._client
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return f"{self.base_url}/object/public/{bucket}/{path}"
+
+    async def exists(self, bucket: str, path: str) -> bool:
+        response = await self.client.head(f"{self.base_url}/object/{bucket}/{path}", headers=self.headers)
+        return response.status_code == 200
+
+    async def upload_stream(
+        self,
+        bucket: str,
+        path: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str,
+        size: Optional[int] = None,
+    ) -> None:
+        """
+        流式上传；同路径已存在时覆盖 (内容寻址路径下内容相同)
+        给出 size 时以 Content-Length 发送 (不用分块传输编码，Storage 可以预先按大小拒绝)
+        """
+        headers = {
+            **self.headers,
+            "Content-Type": content_type,
+            "Cache-Control": "max-age=31536000",
+            "x-upsert": "true",
+        }
+        if size is not None:
+            headers["Content-Length"] = str(size)
+        response = await self.client.post(f"{self.base_url}/object/{bucket}/{path}", content=chunks, headers=headers)
+        response.raise_for_status()
+
+    async def put_once(self, bucket: str, path: str, file: Any, content_type: str, size: Optional[int] = None) -> bool:
+        """
+        对象不存在时从 file 流式上传，返回是否已存在 (不需要上传)
+        本进程内同一路径的并发调用只上传一次，其余调用等待它完成 (它失败或被取消时自己上传)
+        """
+        key = (bucket, path)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if not pending.cancelled() and pending.exception() is None:
+                return True
+
+        async def ensure() -> bool:
+            if await self.exists(bucket, path):
+                return True
+            await self.upload_stream(bucket, path, _chunks(file), content_type, size)
+            return False
+
+        task = asyncio.ensure_future(ensure())
+        self._inflight[key] = task
+        try:
+            return await task
+        finally:
+            # 本次上传失败后，等待者可能已经登记了新的上传，只移除自己登记的那一个
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def store_upload(file: Any, uploader: StorageUploader, bucket: str, max_bytes: int) -> tuple[str, bool]:
+    """
+    检查并上传一个文件，返回 (公开 URL, 是否命中已有内容)
+    文件按内容命名 (sha256.扩展名)，相同的凭证图片只存一份
+    """
+    mime, digest, size = await inspect_upload(file, max_bytes)
+    path = f"{digest}.{EXTENSIONS[mime]}"
+    existed = await uploader.put_once(bucket, path, file, mime, size)
+    return uploader.public_url(bucket, path), existed
+
+
+_uploader: Optional[StorageUploader] = None
+
+
+def get_uploader() -> StorageUploader:
+    """进程内共享的上传客户端 (复用连接池)"""
+    global _uploader
+    if _uploader is None:
+        settings = get_settings()
+        _uploader = StorageUploader(settings.supabase_url, settings.supabase_service_role_key)
+    return _uploader
+
+
+async def close_uploader() -> None:
+    """关闭上传客户端的连接池 (应用关闭时调用)"""
+    if _uploader is not None:
+        await _uploader.aclose()
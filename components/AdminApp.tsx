@@ -37,6 +37,10 @@ const COUNTRIES = [
     { value: 'id', label: 'Indonesia' },
 ];
 
+// Large lists report a planner estimate instead of an exact count
+const formatTotal = (total: number, approximate: boolean) =>
+    approximate ? `~${total.toLocaleString()}` : total.toString();
+
 // --- ADMIN LOGIN ---
 const AdminLogin: React.FC<{ onLogin: (u: string, p: string) => void }> = ({ onLogin }) => {
     const [username, setUsername] = useState('');
@@ -101,6 +105,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
     // Paginated Users List State
     const [usersPage, setUsersPage] = useState(1);
     const [usersTotal, setUsersTotal] = useState(0);
+    const [usersTotalApprox, setUsersTotalApprox] = useState(false);
     const usersPerPage = 20;
     const [isLoadingUsers, setIsLoadingUsers] = useState(false);
     const [userSearch, setUserSearch] = useState(''); // 用户搜索关键词（邮箱/UID/手机号）
@@ -115,10 +120,12 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
     const [auditHistoryList, setAuditHistoryList] = useState<any[]>([]);
     const [auditHistoryPage, setAuditHistoryPage] = useState(1);
     const [auditHistoryTotal, setAuditHistoryTotal] = useState(0);
+    const [auditHistoryTotalApprox, setAuditHistoryTotalApprox] = useState(false);
     const auditHistoryPerPage = 20;
     const [withdrawalsList, setWithdrawalsList] = useState<any[]>([]);
     const [withdrawalsPage, setWithdrawalsPage] = useState(1);
     const [withdrawalsTotal, setWithdrawalsTotal] = useState(0);
+    const [withdrawalsTotalApprox, setWithdrawalsTotalApprox] = useState(false);
     const withdrawalsPerPage = 20;
     const [processingWds, setProcessingWds] = useState<Set<string>>(new Set());
 
@@ -162,6 +169,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
     const [msgSearch, setMsgSearch] = useState('');
     const [msgPage, setMsgPage] = useState(1);
     const [msgTotal, setMsgTotal] = useState(0);
+    const [msgTotalApprox, setMsgTotalApprox] = useState(false);
     const [adminMessages, setAdminMessages] = useState<any[]>([]);
     const msgPageSize = 20;
 
@@ -203,6 +211,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
             const res = await api.getPaginatedUsers(page, usersPerPage, search);
             setLocalUsers(res.users || []);
             setUsersTotal(res.total || 0);
+            setUsersTotalApprox(!!res.totalApproximate);
             setUsersPage(page);
         } catch (e) {
             console.error('Failed to load users', e);
@@ -227,6 +236,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
             const res = await api.getAuditHistory(page, auditHistoryPerPage);
             setAuditHistoryList(res.tasks || []);
             setAuditHistoryTotal(res.total || 0);
+            setAuditHistoryTotalApprox(!!res.totalApproximate);
             setAuditHistoryPage(page);
         } catch (e) {
             console.error('Failed to load audit history', e);
@@ -239,6 +249,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
             const res = await api.getPendingWithdrawals(page, withdrawalsPerPage);
             setWithdrawalsList(res.withdrawals || []);
             setWithdrawalsTotal(res.total || 0);
+            setWithdrawalsTotalApprox(!!res.totalApproximate);
             setWithdrawalsPage(page);
         } catch (e) {
             console.error('Failed to load withdrawals', e);
@@ -287,6 +298,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
                     const res = await api.getAdminMessages(msgPage, msgPageSize, msgSearch);
                     setAdminMessages(res.messages);
                     setMsgTotal(res.total);
+                    setMsgTotalApprox(!!res.totalApproximate);
                 } catch (e) {
                     console.error("Failed to fetch messages", e);
                 }
@@ -1153,7 +1165,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
                             {auditTab === 'history' && (
                                 <div className="p-4 bg-slate-50 border-t border-slate-200 flex justify-between items-center">
                                     <div className="text-xs text-slate-500">
-                                        Page {auditHistoryPage} of {Math.ceil(auditHistoryTotal / auditHistoryPerPage) || 1} (Total: {auditHistoryTotal})
+                                        Page {auditHistoryPage} of {Math.ceil(auditHistoryTotal / auditHistoryPerPage) || 1} (Total: {formatTotal(auditHistoryTotal, auditHistoryTotalApprox)})
                                     </div>
                                     <div className="flex gap-2">
                                         <button
@@ -1232,7 +1244,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
                         {/* Withdrawals Pagination Controls */}
                         <div className="p-4 bg-slate-50 border-t border-slate-200 flex justify-between items-center">
                             <div className="text-xs text-slate-500">
-                                Page {withdrawalsPage} of {Math.ceil(withdrawalsTotal / withdrawalsPerPage) || 1} (Total: {withdrawalsTotal})
+                                Page {withdrawalsPage} of {Math.ceil(withdrawalsTotal / withdrawalsPerPage) || 1} (Total: {formatTotal(withdrawalsTotal, withdrawalsTotalApprox)})
                             </div>
                             <div className="flex gap-2">
                                 <button
@@ -1278,7 +1290,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
 
                             {/* 用户计数 */}
                             <div className="text-xs text-slate-500">
-                                Showing {localUsers.length} users (Total: {usersTotal})
+                                Showing {localUsers.length} users (Total: {formatTotal(usersTotal, usersTotalApprox)})
                             </div>
                         </div>
                         <table className="w-full text-left">
@@ -1555,7 +1567,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
 
                         <div className="bg-white rounded-xl shadow-sm border border-slate-200 overflow-hidden">
                             <div className="p-4 border-b border-slate-100 bg-slate-50 flex justify-between items-center">
-                                <h3 className="font-bold text-slate-800">Messages History ({msgTotal})</h3>
+                                <h3 className="font-bold text-slate-800">Messages History ({formatTotal(msgTotal, msgTotalApprox)})</h3>
                                 <div className="flex items-center gap-2">
                                     <div className="relative">
                                         <input
@@ -1598,7 +1610,10 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
                                                         {msg.rewardAmount > 0 ? `+${msg.rewardAmount.toLocaleString()}` : '-'}
                                                     </td>
                                                     <td className="p-4">
-                                                        {msg.read ? (
+                                                        {msg.isBroadcast ? (
+                                                            // Broadcast reads are tracked as a per-user watermark, not per message
+                                                            <span className="bg-indigo-100 text-indigo-700 text-[10px] px-2 py-0.5 rounded-full font-bold">BROADCAST</span>
+                                                        ) : msg.read ? (
                                                             <span className="bg-green-100 text-green-700 text-[10px] px-2 py-0.5 rounded-full font-bold">READ</span>
                                                         ) : (
                                                             <span className="bg-slate-100 text-slate-500 text-[10px] px-2 py-0.5 rounded-full font-bold">UNREAD</span>
@@ -1614,7 +1629,7 @@ const AdminApp: React.FC<AdminAppProps> = (props) => {
                             {msgTotal > msgPageSize && (
                                 <div className="p-4 flex items-center justify-between bg-slate-50 border-t border-slate-100">
                                     <p className="text-xs text-slate-500">
-                                        Showing {((msgPage - 1) * msgPageSize) + 1} to {Math.min(msgPage * msgPageSize, msgTotal)} of {msgTotal}
+                                        Showing {((msgPage - 1) * msgPageSize) + 1} to {Math.min(msgPage * msgPageSize, msgTotal)} of {formatTotal(msgTotal, msgTotalApprox)}
                                     </p>
                                     <div className="flex gap-2">
                                         <button
@@ -1051,7 +1051,7 @@ export const ProfileView: React.FC<any> = ({ user, t, logout, lang, onBindCard,
         });
 
         // Fetch latest transaction for the sidebar/record view
-        api.getUserTransactions(user.id, 1, 1).then(res => {
+        api.getUserTransactions(user.id, 1, null, false).then(res => {
             if (res.transactions && res.transactions.length > 0) {
                 setLatestTx(res.transactions[0]);
             }
@@ -1,6 +1,6 @@
 import useSWR from 'swr';
 import useSWRInfinite from 'swr/infinite';
-import { api } from '../services/api';
+import { api, CursorPage } from '../services/api';
 import { Platform, Activity, User, Transaction, UserTask, Message } from '../types';
 
 // Generic fetcher that uses our existing API service
@@ -99,11 +99,11 @@ export const useActivityDetail = (id: string | undefined) => {
  */
 export const useTransactions = (userId: string | undefined, pageSize: number = 20) => {
     const { data, error, size, setSize, isValidating, mutate } = useSWRInfinite(
-        (index) => userId ? `users/${userId}/transactions?page=${index + 1}` : null,
-        async (key) => {
-            const page = parseInt(key.split('page=')[1]);
-            return api.getUserTransactions(userId!, page, pageSize);
+        (index, previous: CursorPage<{ transactions: any[] }> | null) => {
+            if (!userId || (previous && !previous.nextCursor)) return null;
+            return [`users/${userId}/transactions`, index === 0 ? null : previous!.nextCursor];
         },
+        ([, cursor]: [string, string | null]) => api.getUserTransactions(userId!, pageSize, cursor),
         {
             revalidateOnFocus: false,
             dedupingInterval: 30000,
@@ -111,10 +111,10 @@ export const useTransactions = (userId: string | undefined, pageSize: number = 2
     );
 
     const transactions = data ? data.flatMap(p => p.transactions) : [];
-    const total = data ? data[0]?.total : 0;
+    const total = data ? (data[0]?.total ?? 0) : 0;
     const isLoading = (!data && !error);
     const isLoadingMore = isLoading || (size > 0 && data && typeof data[size - 1] === "undefined");
-    const hasMore = transactions.length < total;
+    const hasMore = !!(data && data[data.length - 1]?.nextCursor);
 
     return {
         transactions,
@@ -135,11 +135,11 @@ export const useTransactions = (userId: string | undefined, pageSize: number = 2
  */
 export const useTasks = (userId: string | undefined, pageSize: number = 20) => {
     const { data, error, size, setSize, isValidating, mutate } = useSWRInfinite(
-        (index) => userId ? `users/${userId}/tasks?page=${index + 1}` : null,
-        async (key) => {
-            const page = parseInt(key.split('page=')[1]);
-            return api.getUserTasks(userId!, page, pageSize);
+        (index, previous: CursorPage<{ tasks: any[] }> | null) => {
+            if (!userId || (previous && !previous.nextCursor)) return null;
+            return [`users/${userId}/tasks`, index === 0 ? null : previous!.nextCursor];
         },
+        ([, cursor]: [string, string | null]) => api.getUserTasks(userId!, pageSize, cursor),
         {
             revalidateOnFocus: false,
             dedupingInterval: 30000,
@@ -147,10 +147,10 @@ export const useTasks = (userId: string | undefined, pageSize: number = 20) => {
     );
 
     const tasks = data ? data.flatMap(p => p.tasks) : [];
-    const total = data ? data[0]?.total : 0;
+    const total = data ? (data[0]?.total ?? 0) : 0;
     const isLoading = (!data && !error);
     const isLoadingMore = isLoading || (size > 0 && data && typeof data[size - 1] === "undefined");
-    const hasMore = tasks.length < total;
+    const hasMore = !!(data && data[data.length - 1]?.nextCursor);
 
     return {
         tasks,
@@ -171,11 +171,11 @@ export const useTasks = (userId: string | undefined, pageSize: number = 20) => {
  */
 export const useMessages = (userId: string | undefined, pageSize: number = 20) => {
     const { data, error, size, setSize, isValidating, mutate } = useSWRInfinite(
-        (index) => userId ? `users/${userId}/messages?page=${index + 1}` : null,
-        async (key) => {
-            const page = parseInt(key.split('page=')[1]);
-            return api.getUserMessages(userId!, page, pageSize);
+        (index, previous: CursorPage<{ messages: any[] }> | null) => {
+            if (!userId || (previous && !previous.nextCursor)) return null;
+            return [`users/${userId}/messages`, index === 0 ? null : previous!.nextCursor];
         },
+        ([, cursor]: [string, string | null]) => api.getUserMessages(userId!, pageSize, cursor),
         {
             revalidateOnFocus: false,
             dedupingInterval: 30000,
@@ -183,10 +183,10 @@ export const useMessages = (userId: string | undefined, pageSize: number = 20) =
     );
 
     const messages = data ? data.flatMap(p => p.messages) : [];
-    const total = data ? data[0]?.total : 0;
+    const total = data ? (data[0]?.total ?? 0) : 0;
     const isLoading = (!data && !error);
     const isLoadingMore = isLoading || (size > 0 && data && typeof data[size - 1] === "undefined");
-    const hasMore = messages.length < total;
+    const hasMore = !!(data && data[data.length - 1]?.nextCursor);
 
     return {
         messages,
@@ -1,5 +1,5 @@
 
-import { User, Platform, Activity, UserTask, SystemConfig, BankAccount } from '../types';
+import { User, Platform, Activity, UserTask, SystemConfig, BankAccount, Transaction } from '../types';
 
 // 后端 API 基础地址
 const API_BASE = window.location.hostname === 'localhost'
@@ -36,6 +36,21 @@ async function request<T>(
     return response.json();
 }
 
+/**
+ * 游标分页响应: nextCursor 为 null 表示没有更多；total 只在请求了总数时返回
+ */
+export type CursorPage<T> = T & { total: number | null, nextCursor: string | null };
+
+/**
+ * 游标分页查询参数 (未传 cursor 即第一页)
+ */
+function cursorParams(pageSize: number, cursor?: string | null, withTotal?: boolean): string {
+    const params = new URLSearchParams({ per_page: pageSize.toString() });
+    if (cursor) params.append('cursor', cursor);
+    if (withTotal !== undefined) params.append('with_total', String(withTotal));
+    return params.toString();
+}
+
 /**
  * RuangGamer API 客户端
  * 连接 FastAPI 后端
@@ -93,12 +108,13 @@ export const api = {
     /**
      * 提现申请
      */
-    async withdraw(userId: string, amount: number, accountId: string): Promise<User> {
-        return request<User>(`/users/${userId}/withdraw`, {
+    async withdraw(userId: string, amount: number, accountId: string, idempotencyKey?: string): Promise<{ balance: number; transaction: Transaction; replayed: boolean }> {
+        return request<{ balance: number; transaction: Transaction; replayed: boolean }>(`/users/${userId}/withdraw`, {
             method: 'POST',
             body: JSON.stringify({
                 amount,
-                accountId
+                accountId,
+                idempotencyKey
             }),
         });
     },
@@ -160,8 +176,8 @@ export const api = {
     /**
      * 点赞任务
      */
-    async likeTask(userId: string, platformId: string): Promise<User> {
-        return request<User>(`/tasks/${platformId}/like?user_id=${userId}`, {
+    async likeTask(userId: string, platformId: string): Promise<{ platformId: string; liked: boolean; alreadyLiked: boolean }> {
+        return request<{ platformId: string; liked: boolean; alreadyLiked: boolean }>(`/tasks/${platformId}/like?user_id=${userId}`, {
             method: 'POST',
         });
     },
@@ -297,6 +313,13 @@ export const api = {
         });
     },
 
+    async auditTasksBatch(items: { userId: string; taskId: string; status: 'completed' | 'rejected' }[]): Promise<{ processed: number; results: { taskId: string; userId: string; status: string; amount: number | null }[] }> {
+        return request<{ processed: number; results: { taskId: string; userId: string; status: string; amount: number | null }[] }>('/admin/audit-tasks/batch', {
+            method: 'POST',
+            body: JSON.stringify({ items }),
+        });
+    },
+
     async auditWithdrawal(transactionId: string, status: 'success' | 'failed'): Promise<void> {
         return request<void>('/admin/audit-withdrawal', {
             method: 'POST',
@@ -304,6 +327,13 @@ export const api = {
         });
     },
 
+    async auditWithdrawalsBatch(items: { transactionId: string; status: 'success' | 'failed' }[]): Promise<{ processed: number; refunded: number; results: { transactionId: string; userId: string | null; status: string; amount: number | null }[] }> {
+        return request<{ processed: number; refunded: number; results: { transactionId: string; userId: string | null; status: string; amount: number | null }[] }>('/admin/audit-withdrawals/batch', {
+            method: 'POST',
+            body: JSON.stringify({ items }),
+        });
+    },
+
 
     async sendMessage(userId: string, title: string, content: string, amount: number): Promise<void> {
         return request<void>('/admin/send-message', {
@@ -312,6 +342,10 @@ export const api = {
         });
     },
 
+    async getJob(jobId: string): Promise<{ id: string; kind: string; status: 'pending' | 'running' | 'completed' | 'failed'; processed: number; total: number | null; progress: number; error: string | null }> {
+        return request<{ id: string; kind: string; status: 'pending' | 'running' | 'completed' | 'failed'; processed: number; total: number | null; progress: number; error: string | null }>(`/admin/jobs/${jobId}`);
+    },
+
     async banUser(userId: string, isBanned: boolean): Promise<void> {
         return request<void>(`/admin/users/${userId}/ban?is_banned=${isBanned}`, {
             method: 'PATCH'
@@ -345,34 +379,34 @@ export const api = {
         });
     },
 
-    async getAdminMessages(page: number, pageSize: number, search?: string): Promise<{ messages: any[], total: number }> {
+    async getAdminMessages(page: number, pageSize: number, search?: string): Promise<{ messages: any[], total: number, totalApproximate?: boolean }> {
         const params = new URLSearchParams({
             page: page.toString(),
             pageSize: pageSize.toString(),
         });
         if (search) params.append('search', search);
-        return request<{ messages: any[], total: number }>(`/admin/messages?${params.toString()}`);
+        return request<{ messages: any[], total: number, totalApproximate?: boolean }>(`/admin/messages?${params.toString()}`);
     },
 
     /**
-     * 获取指定用户的交易流水 (分页)
+     * 获取指定用户的交易流水 (游标分页，nextCursor 为 null 表示没有更多；total 默认只在第一页返回)
      */
-    async getUserTransactions(userId: string, page: number, pageSize: number): Promise<{ transactions: any[], total: number }> {
-        return request<{ transactions: any[], total: number }>(`/users/${userId}/transactions?page=${page}&per_page=${pageSize}`);
+    async getUserTransactions(userId: string, pageSize: number, cursor?: string | null, withTotal?: boolean): Promise<CursorPage<{ transactions: any[] }>> {
+        return request<CursorPage<{ transactions: any[] }>>(`/users/${userId}/transactions?${cursorParams(pageSize, cursor, withTotal)}`);
     },
 
     /**
-     * 获取指定用户的任务记录 (分页)
+     * 获取指定用户的任务记录 (游标分页)
      */
-    async getUserTasks(userId: string, page: number, pageSize: number): Promise<{ tasks: any[], total: number }> {
-        return request<{ tasks: any[], total: number }>(`/users/${userId}/tasks?page=${page}&per_page=${pageSize}`);
+    async getUserTasks(userId: string, pageSize: number, cursor?: string | null, withTotal?: boolean): Promise<CursorPage<{ tasks: any[] }>> {
+        return request<CursorPage<{ tasks: any[] }>>(`/users/${userId}/tasks?${cursorParams(pageSize, cursor, withTotal)}`);
     },
 
     /**
-     * 获取指定用户的消息列表 (分页)
+     * 获取指定用户的消息列表 (游标分页)
      */
-    async getUserMessages(userId: string, page: number, pageSize: number): Promise<{ messages: any[], total: number }> {
-        return request<{ messages: any[], total: number }>(`/users/${userId}/messages?page=${page}&per_page=${pageSize}`);
+    async getUserMessages(userId: string, pageSize: number, cursor?: string | null, withTotal?: boolean): Promise<CursorPage<{ messages: any[] }>> {
+        return request<CursorPage<{ messages: any[] }>>(`/users/${userId}/messages?${cursorParams(pageSize, cursor, withTotal)}`);
     },
 
     /**
@@ -403,6 +437,7 @@ export const api = {
         total: number;
         page: number;
         perPage: number;
+        totalApproximate?: boolean;
     }> {
         const params = new URLSearchParams({ page: page.toString(), per_page: perPage.toString() });
         if (search) params.append('search', search);
@@ -419,14 +454,14 @@ export const api = {
     /**
      * 获取提现记录列表
      */
-    async getPendingWithdrawals(page: number = 1, perPage: number = 20): Promise<{ withdrawals: any[]; total: number }> {
+    async getPendingWithdrawals(page: number = 1, perPage: number = 20): Promise<{ withdrawals: any[]; total: number; totalApproximate?: boolean }> {
         return request(`/admin/pending-withdrawals?page=${page}&per_page=${perPage}`);
     },
 
     /**
      * 获取已审核任务历史记录
      */
-    async getAuditHistory(page: number = 1, perPage: number = 20): Promise<{ tasks: any[]; total: number }> {
+    async getAuditHistory(page: number = 1, perPage: number = 20): Promise<{ tasks: any[]; total: number; totalApproximate?: boolean }> {
         return request(`/admin/audit-history?page=${page}&per_page=${perPage}`);
     },
 
@@ -45,7 +45,7 @@ export interface UserTask {
 
 export interface Transaction {
   id: string;
-  type: 'task_reward' | 'referral_bonus' | 'withdraw' | 'system_bonus' | 'admin_gift' | 'vip_bonus';
+  type: 'task_reward' | 'referral_bonus' | 'withdraw' | 'withdraw_refund' | 'system_bonus' | 'admin_gift' | 'vip_bonus';
   amount: number;
   date: string;
   description: string;